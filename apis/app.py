@@ -1,15 +1,25 @@
 import os
+import sys
 from dotenv import load_dotenv
 from pinecone import Pinecone
 from langchain_community.embeddings import HuggingFaceEmbeddings
-from langchain_community.document_loaders import PyPDFLoader, Docx2txtLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-import google.generativeai as genai
 import streamlit as st
-import tempfile
 import re
 from typing import List, Dict, Tuple
 
+# Shared document pipeline lives with the RAG service
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend", "rag_service"))
+from loaders import SUPPORTED_EXTENSIONS, load_document, file_extension
+from text_normalize import normalize_documents
+from chunker import EMBEDDING_MODEL, CHUNK_TOKENS, CHUNK_OVERLAP_TOKENS, chunk_documents, load_tokenizer
+from llm_client import LLMClient
+from intent import QueryPlan, classify_query
+from conversation_memory import ConversationMemory
+from session_store import ChatSession
+from index_layout import (GLOBAL_NAMESPACE, delete_document, delete_ids, delete_legacy_vectors, document_id,
+                          document_vectors, get_manifest, stale_ids)
+from catalog import SERVING_ALIAS, AliasMovedError, DocumentCatalog, content_hash
+
 # -----------------------------
 # ENV
 # -----------------------------
@@ -18,30 +28,17 @@
 PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
 PINECONE_INDEX_NAME = os.getenv("PINECONE_INDEX_NAME")
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+GEMINI_MODEL = "gemini-2.5-flash-lite"
 
 # RAG Configuration
 TOP_K = 15  # Retrieve more chunks for wider context
 MIN_SIMILARITY = 0.30  # Lower threshold for more results
 EMBEDDING_DIM = 384  # all-MiniLM-L6-v2 dimension
-DEFAULT_CHUNK_SIZE = 400  # Default chunk size for ingestion
+DEFAULT_CHUNK_SIZE = CHUNK_TOKENS  # Default chunk size (embedding tokens) for ingestion
 
 # -----------------------------
 # HELPER FUNCTIONS
 # -----------------------------
-def sanitize_text(text: str) -> str:
-    """Sanitize text to remove problematic characters for Pinecone"""
-    if not text:
-        return ""
-    # Remove non-ASCII characters that cause encoding issues
-    text = text.encode('ascii', 'ignore').decode('ascii')
-    # Remove control characters except newlines
-    text = re.sub(r'[\x00-\x08\x0b\x0c\x0e-\x1f\x7f-\x9f]', '', text)
-    # Remove excessive whitespace
-    text = re.sub(r'\n{3,}', '\n\n', text)
-    text = re.sub(r' {2,}', ' ', text)
-    return text.strip()
-
-
 def compute_text_similarity(text1: str, text2: str) -> float:
     """Simple Jaccard similarity for deduplication"""
     words1 = set(text1.lower().split())
@@ -95,121 +92,76 @@ def clean_context(chunks: List[Dict]) -> str:
 @st.cache_resource
 def init_clients():
     pc = Pinecone(api_key=PINECONE_API_KEY)
+    catalog = DocumentCatalog()
+    # migrate_index.py may have switched serving to a re-embedded index
+    serving = catalog.resolve_alias(SERVING_ALIAS)
+    index_name = serving['target'] if serving else PINECONE_INDEX_NAME
+    model_name = serving['embedding_model'] if serving else EMBEDDING_MODEL
+    
+    embeddings = HuggingFaceEmbeddings(
+        model_name=model_name,
+        model_kwargs={"device": "cpu"},
+        encode_kwargs={"normalize_embeddings": True}
+    )
     
-    # Check if index exists, if not create it
+    # Check if index exists, if not create it (sized for the embedding model)
     try:
-        index = pc.Index(PINECONE_INDEX_NAME)
+        index = pc.Index(index_name)
     except Exception as e:
-        st.error(f"❌ Index '{PINECONE_INDEX_NAME}' not found. Creating it now...")
+        st.error(f"❌ Index '{index_name}' not found. Creating it now...")
         pc.create_index(
-            name=PINECONE_INDEX_NAME,
-            dimension=384,
+            name=index_name,
+            dimension=len(embeddings.embed_query("dimension probe")),
             metric="cosine"
         )
         import time
         time.sleep(2)
-        index = pc.Index(PINECONE_INDEX_NAME)
-        st.success(f"✅ Index '{PINECONE_INDEX_NAME}' created successfully!")
+        index = pc.Index(index_name)
+        st.success(f"✅ Index '{index_name}' created successfully!")
     
-    embeddings = HuggingFaceEmbeddings(
-        model_name="sentence-transformers/all-MiniLM-L6-v2",
-        model_kwargs={"device": "cpu"},
-        encode_kwargs={"normalize_embeddings": True}
-    )
-    
-    # Gemini init
-    genai.configure(api_key=GEMINI_API_KEY)
-    model = genai.GenerativeModel("gemini-2.5-flash-lite")
+    # Gemini init (cached with the other clients, shared by all sessions)
+    llm = LLMClient()
+    llm.configure(GEMINI_API_KEY)
+    llm.model(GEMINI_MODEL)
     
-    return index, embeddings, model
+    return index, embeddings, llm, catalog, model_name, index_name
 
 try:
-    index, embeddings, model = init_clients()
+    index, embeddings, llm, catalog, embedding_model, index_name = init_clients()
 except Exception as e:
     st.error(f"Failed to initialize clients: {str(e)}")
     st.stop()
 
 
-# -----------------------------
-# RAG RETRIEVAL FUNCTION
-# -----------------------------
-def is_summary_query(query: str) -> bool:
-    """Check if query is asking for summary/overview"""
-    summary_keywords = ['summary', 'summarize', 'summarise', 'overview', 'brief', 'main points', 'key points']
-    query_lower = query.lower()
-    return any(keyword in query_lower for keyword in summary_keywords)
-
-
-def is_vague_query(query: str) -> bool:
-    """Check if query is vague and needs context from conversation"""
-    vague_patterns = [
-        'more', 'explain', 'elaborate', 'detail', 'tell me more',
-        'what about', 'how about', 'and', 'also', 'continue',
-        'go on', 'keep going', 'yes', 'okay', 'sure'
-    ]
-    # Check for pronouns that reference earlier context
-    pronouns = ['it', 'this', 'that', 'these', 'those', 'them', 'they', 'its']
-    
-    query_lower = query.lower().strip()
-    words = query_lower.split()
-    
-    # Very short query (less than 5 words) with pronouns
-    if len(words) < 6 and any(p in words for p in pronouns):
-        return True
-    
-    # Contains vague patterns
-    if any(pattern in query_lower for pattern in vague_patterns):
-        return True
-    
-    return False
-
-
-def expand_query_with_context(query: str, conversation_history: List[Dict]) -> str:
+def check_serving_index():
     """
-    Expand a vague query using conversation history.
-    Combines current query with the last user question for better retrieval.
+    Call inside catalog.ingesting()/removing(): raises AliasMovedError if
+    migrate_index.py switched the serving alias since the clients were cached
+    (and drops that cache, so the next rerun connects to the new index).
     """
-    if not conversation_history or not is_vague_query(query):
-        return query
-    
-    # Find the last user message (not including current)
-    last_user_query = None
-    last_assistant_response = None
-    
-    for msg in reversed(conversation_history):
-        if msg['role'] == 'user' and last_user_query is None:
-            last_user_query = msg['content']
-        elif msg['role'] == 'assistant' and last_assistant_response is None:
-            last_assistant_response = msg['content']
-        if last_user_query and last_assistant_response:
-            break
-    
-    # Combine last question with current query for better retrieval
-    if last_user_query:
-        # Extract key terms from last exchange
-        expanded = f"{last_user_query} {query}"
-        return expanded
-    
-    return query
+    try:
+        catalog.check_alias(index_name, embedding_model)
+    except AliasMovedError:
+        init_clients.clear()
+        raise
 
 
-def retrieve_chunks(query: str, top_k: int = None) -> List[Dict]:
+# -----------------------------
+# RAG RETRIEVAL FUNCTION
+# -----------------------------
+def retrieve_chunks(query: str, plan: QueryPlan, memory: ConversationMemory) -> List[Dict]:
     """
     Retrieve relevant chunks from Pinecone.
-    For summary queries, retrieves ALL chunks.
+    For summary queries, retrieves ALL chunks. Follow-ups reuse or blend the
+    previous turn's vector, and chunks from recent turns get a score boost.
     """
     try:
-        query_vec = embeddings.embed_query(query)
-        
-        # For summary queries, fetch more chunks
-        if is_summary_query(query):
-            fetch_count = 100
-        else:
-            fetch_count = top_k if top_k else TOP_K
+        query_vec = memory.query_vector(query, plan, embeddings.embed_query)
         
+        # Summary queries fetch plan.top_k = SUMMARY_TOP_K chunks
         results = index.query(
             vector=query_vec,
-            top_k=fetch_count,
+            top_k=plan.top_k,
             include_metadata=True
         )
         
@@ -217,19 +169,19 @@ def retrieve_chunks(query: str, top_k: int = None) -> List[Dict]:
             return []
         
         # Extract chunks
-        filtered_chunks = []
+        candidates = []
         for match in results['matches']:
-            score = match.get('score', 0)
             metadata = match.get('metadata', {})
-            text = metadata.get('text', '')
-            
-            # For summary, include all; otherwise filter by score
-            if is_summary_query(query) or (score >= MIN_SIMILARITY and text):
-                filtered_chunks.append({'text': text, 'score': score})
+            candidates.append({'id': match.get('id'), 'text': metadata.get('text', ''), 'score': match.get('score', 0)})
+        memory.boost(candidates)
+        
+        # For summary, include all; otherwise filter by score
+        filtered_chunks = [c for c in candidates if plan.summary or (c['score'] >= MIN_SIMILARITY and c['text'])]
         
         # Sort by score descending
         filtered_chunks.sort(key=lambda x: x['score'], reverse=True)
         
+        memory.record(query, query_vec, [c['id'] for c in filtered_chunks])
         return filtered_chunks
         
     except Exception as e:
@@ -239,8 +191,8 @@ def retrieve_chunks(query: str, top_k: int = None) -> List[Dict]:
 # -----------------------------
 # BUILD FINAL ANSWER (Gemini)
 # -----------------------------
-def generate_answer(query: str, chunks: List[Dict], conversation_history: List[Dict] = None) -> str:
-    """Generate answer using Gemini with strict RAG prompt and conversation history"""
+def generate_answer(query: str, chunks: List[Dict], session: ChatSession = None) -> str:
+    """Generate answer using Gemini with strict RAG prompt and the session's summarized history"""
     
     if not chunks:
         return "The provided document does not contain this information. Please upload a relevant document first."
@@ -251,16 +203,8 @@ def generate_answer(query: str, chunks: List[Dict], conversation_history: List[D
     if not context.strip():
         return "The provided document does not contain this information."
     
-    # Build conversation history string
-    history_str = ""
-    if conversation_history and len(conversation_history) > 0:
-        # Include last 6 messages (3 exchanges) for context
-        recent_history = conversation_history[-6:]
-        history_parts = []
-        for msg in recent_history:
-            role = "User" if msg["role"] == "user" else "Assistant"
-            history_parts.append(f"{role}: {msg['content']}")
-        history_str = "\n".join(history_parts)
+    # Recent turns verbatim, older ones as a fixed-size summary
+    history_str = session.history_text() if session else ""
     
     # Strict RAG prompt with conversation history
     prompt = f"""You are a helpful assistant that answers questions ONLY from the provided context.
@@ -287,8 +231,7 @@ def generate_answer(query: str, chunks: List[Dict], conversation_history: List[D
 ANSWER:"""
 
     try:
-        response = model.generate_content(prompt)
-        return response.text.strip()
+        return llm.generate("generate_answer", prompt, model_name=GEMINI_MODEL).strip()
     except Exception as e:
         return f"Error generating response: {str(e)}"
 
@@ -300,87 +243,93 @@ def ingest_document(uploaded_file, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Tupl
     """Ingest PDF or DOCX file into Pinecone"""
     try:
         filename = uploaded_file.name
-        file_ext = filename.lower().split('.')[-1]
         
-        # Save uploaded file to temp location
-        with tempfile.NamedTemporaryFile(delete=False, suffix=f".{file_ext}") as tmp_file:
-            tmp_file.write(uploaded_file.read())
-            tmp_path = tmp_file.name
+        if file_extension(filename) not in SUPPORTED_EXTENSIONS:
+            st.error("Unsupported file type")
+            return False, 0
         
-        # Load document based on type
+        # Parse directly from the in-memory upload (no temp file round trip)
         with st.spinner("Loading document..."):
-            if file_ext == 'pdf':
-                loader = PyPDFLoader(tmp_path)
-            elif file_ext in ['docx', 'doc']:
-                loader = Docx2txtLoader(tmp_path)
-            else:
-                st.error("Unsupported file type")
-                return False, 0
-            
-            docs = loader.load()
+            docs = normalize_documents(load_document(uploaded_file, filename))
         
-        # Split into chunks with configurable size
-        chunk_overlap = int(chunk_size * 0.2)  # 20% overlap
-        with st.spinner(f"Splitting into chunks (size: {chunk_size})..."):
-            splitter = RecursiveCharacterTextSplitter(
-                chunk_size=chunk_size,
-                chunk_overlap=chunk_overlap,
-                separators=["\n\n", "\n", ". ", " "],
-                length_function=len
-            )
-            chunks = splitter.split_documents(docs)
+        # Same text at the same chunk size is already indexed
+        digest = content_hash(docs)
+        if catalog.is_current(filename, digest, chunk_tokens=chunk_size, embedding_model=embedding_model):
+            chunk_count = catalog.get(filename)['chunk_count']
+            st.info(f"'{filename}' is unchanged since it was last ingested ({chunk_count} chunks)")
+            return True, chunk_count
         
-        # Prepare texts for batch embedding
-        texts_to_embed = []
-        valid_chunks_data = []
+        # Split into token-bounded chunks with configurable size
+        chunk_overlap = min(CHUNK_OVERLAP_TOKENS, chunk_size // 4)
+        with st.spinner(f"Splitting into chunks (size: {chunk_size} tokens)..."):
+            chunks = chunk_documents(docs, tokenizer=load_tokenizer(embedding_model), max_tokens=chunk_size,
+                                     overlap_tokens=chunk_overlap)
         
-        for idx, doc in enumerate(chunks):
-            text = sanitize_text(doc.page_content)
-            if text:
-                texts_to_embed.append(text)
-                valid_chunks_data.append({'idx': idx, 'text': text})
+        # Skip empty chunks
+        valid_chunks = [doc for doc in chunks if doc.page_content.strip()]
         
-        if not valid_chunks_data:
+        if not valid_chunks:
             st.warning("No valid text found in document")
-            os.unlink(tmp_path)
             return False, 0
         
         # Batch embed using embed_documents
         with st.spinner("Generating embeddings..."):
-            all_embeddings = embeddings.embed_documents(texts_to_embed)
+            all_embeddings = embeddings.embed_documents([doc.page_content for doc in valid_chunks])
         
-        # Prepare vectors (only store text in metadata)
-        vectors_to_upsert = []
-        for i, chunk_data in enumerate(valid_chunks_data):
-            vector_id = f"{filename}-chunk-{chunk_data['idx']}"
-            vectors_to_upsert.append({
-                "id": vector_id,
-                "values": all_embeddings[i],
-                "metadata": {"text": chunk_data['text']}
-            })
+        # Per-document IDs ("<doc>#<i>") with source/chunk-count metadata, shared with the RAG service
+        vectors_to_upsert = document_vectors(filename, valid_chunks, all_embeddings)
+        size = sum(len(doc.page_content.encode('utf-8')) for doc in docs)
         
-        # Upsert in batches
-        with st.spinner("Uploading to database..."):
+        # Upsert in batches; a shorter re-upload's leftover chunks are deleted by ID.
+        # The catalog entry only becomes 'ready' once every batch is in.
+        with st.spinner("Uploading to database..."), \
+                catalog.ingesting(filename, document_id(filename), digest, len(vectors_to_upsert), size,
+                                  embedding_model=embedding_model, chunk_tokens=chunk_size) as previous:
+            check_serving_index()
+            if previous is None:
+                previous = get_manifest(index, filename)
+                delete_legacy_vectors(index, filename)  # "<file>-chunk-<n>" from before the catalog
             batch_size = 100
             for i in range(0, len(vectors_to_upsert), batch_size):
                 batch = vectors_to_upsert[i:i + batch_size]
-                index.upsert(vectors=batch)
-        
-        # Cleanup
-        os.unlink(tmp_path)
+                index.upsert(vectors=batch, namespace=GLOBAL_NAMESPACE)
+            leftover = stale_ids(previous, len(vectors_to_upsert))
+            if leftover:
+                delete_ids(index, leftover)
         
         st.success(f"✅ Ingested {len(vectors_to_upsert)} chunks from '{filename}'")
         return True, len(vectors_to_upsert)
         
+    except AliasMovedError as e:
+        st.warning(f"The serving index changed while uploading ({e}). Please upload '{filename}' again.")
+        return False, 0
     except Exception as e:
         st.error(f"Error: {str(e)}")
         return False, 0
 
 
+def remove_document(filename: str) -> bool:
+    """Delete one document's chunks by ID"""
+    try:
+        with catalog.removing(filename) as entry:
+            check_serving_index()
+            if entry is None:
+                return delete_document(index, filename) > 0
+            delete_ids(index, stale_ids(entry, 0))
+            return True
+    except AliasMovedError as e:
+        st.warning(f"The serving index changed ({e}). Please delete '{filename}' again.")
+        return False
+    except Exception as e:
+        st.error(f"❌ Error deleting {filename}: {str(e)}")
+        return False
+
+
 def wipe_index():
-    """Delete all vectors from the Pinecone index"""
+    """Delete all shared-knowledge vectors (per-user namespaces are left alone)"""
     try:
-        index.delete(delete_all=True)
+        index.delete(delete_all=True, namespace=GLOBAL_NAMESPACE)
+        catalog.clear(GLOBAL_NAMESPACE)
         return True
     except Exception as e:
         st.error(f"❌ Error wiping index: {str(e)}")
@@ -412,11 +361,11 @@ def wipe_index():
     
     # Chunk size slider
     chunk_size = st.slider(
-        "Chunk Size",
-        min_value=200,
-        max_value=800,
+        "Chunk Size (tokens)",
+        min_value=64,
+        max_value=CHUNK_TOKENS,
         value=DEFAULT_CHUNK_SIZE,
-        step=50,
+        step=16,
         help="Smaller chunks = more precise retrieval. Larger chunks = more context per chunk."
     )
     
@@ -436,8 +385,13 @@ def wipe_index():
     # Show ingested documents
     if st.session_state.get("ingested_docs"):
         st.caption("**Uploaded:**")
-        for doc in st.session_state.ingested_docs:
-            st.caption(f"• {doc['name']}")
+        for i, doc in enumerate(st.session_state.ingested_docs):
+            name_col, delete_col = st.columns([4, 1])
+            name_col.caption(f"• {doc['name']}")
+            if delete_col.button("✖", key=f"delete-doc-{i}", help=f"Remove {doc['name']}"):
+                if remove_document(doc['name']):
+                    st.session_state.ingested_docs.pop(i)
+                    st.rerun()
     
     st.divider()
     
@@ -446,6 +400,7 @@ def wipe_index():
     with col1:
         if st.button("🧹 Clear Chat", use_container_width=True):
             st.session_state.messages = []
+            st.session_state.pop("chat_session", None)
             st.rerun()
     with col2:
         if st.button("🗑️ Wipe Data", use_container_width=True):
@@ -456,6 +411,8 @@ def wipe_index():
 # Initialize chat history with context storage
 if "messages" not in st.session_state:
     st.session_state.messages = []
+if "chat_session" not in st.session_state:
+    st.session_state.chat_session = ChatSession()
 
 # Display chat history
 for message in st.session_state.messages:
@@ -474,21 +431,21 @@ def wipe_index():
     # Get AI response
     with st.chat_message("assistant"):
         with st.spinner("Thinking..."):
-            # Get conversation history (excluding current message)
-            history = st.session_state.messages[:-1]
+            session = st.session_state.chat_session
             
-            # Expand vague queries like "explain more on it" using conversation context
-            expanded_query = expand_query_with_context(query, history)
+            # Classify once: summary route, follow-up expansion and top_k
+            plan = classify_query(query, top_k=TOP_K)
             
-            # Retrieve chunks using the expanded query
-            chunks = retrieve_chunks(expanded_query)
+            # Follow-ups like "explain more on it" retrieve via the cached turn vectors
+            chunks = retrieve_chunks(query, plan, session.memory)
             
-            # Pass conversation history for context awareness in generation
-            answer = generate_answer(query, chunks, conversation_history=history)
+            # Summarized conversation history for context awareness in generation
+            answer = generate_answer(query, chunks, session=session)
             st.markdown(answer)
     
     # Add assistant response to chat history
     st.session_state.messages.append({"role": "assistant", "content": answer})
+    session.add_turn(query, answer)
 
 # Welcome message
 if not st.session_state.messages:
@@ -1,13 +1,18 @@
 import os
 import sys
-import re
 from dotenv import load_dotenv
 from pinecone import Pinecone
-from langchain_community.document_loaders import PyPDFLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_community.embeddings import HuggingFaceEmbeddings
 from tqdm import tqdm
 
+# Shared document pipeline lives with the RAG service
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend", "rag_service"))
+from loaders import load_document_from_path
+from text_normalize import normalize_documents
+from chunker import CHUNK_TOKENS, EMBEDDING_MODEL, chunk_documents, load_tokenizer
+from index_layout import delete_ids, delete_legacy_vectors, document_id, document_vectors, get_manifest, stale_ids
+from catalog import SERVING_ALIAS, AliasMovedError, DocumentCatalog, content_hash
+
 # --------------------------------
 # LOAD ENV
 # --------------------------------
@@ -36,6 +41,11 @@
 # INIT PINECONE CLIENT
 # --------------------------------
 pc = Pinecone(api_key=PINECONE_API_KEY)
+catalog = DocumentCatalog()
+# Follow the serving alias if migrate_index.py switched to a re-embedded index
+serving = catalog.resolve_alias(SERVING_ALIAS)
+if serving:
+    PINECONE_INDEX_NAME, EMBEDDING_MODEL = serving['target'], serving['embedding_model']
 index = pc.Index(PINECONE_INDEX_NAME)
 
 
@@ -50,35 +60,23 @@ def ensure_index():
 # LOAD PDF
 # --------------------------------
 print(f"📄 Loading PDF: {PDF_PATH}")
-loader = PyPDFLoader(PDF_PATH)
-docs = loader.load()
+docs = normalize_documents(load_document_from_path(PDF_PATH))
 print(f"✅ Loaded {len(docs)} pages")
 
-
-# --------------------------------
-# HELPER: SANITIZE TEXT
-# --------------------------------
-def sanitize_text(text: str) -> str:
-    """Remove problematic characters for Pinecone storage"""
-    if not text:
-        return ""
-    text = text.encode('ascii', 'ignore').decode('ascii')
-    text = re.sub(r'[\x00-\x08\x0b\x0c\x0e-\x1f\x7f-\x9f]', '', text)
-    text = re.sub(r'\n{3,}', '\n\n', text)  # Remove excessive newlines
-    return text.strip()
+# Skip the model load and upload entirely if this exact text is already indexed
+pdf_filename = os.path.basename(PDF_PATH)
+digest = content_hash(docs)
+chunk_tokens = serving['chunk_tokens'] if serving else CHUNK_TOKENS
+if catalog.is_current(pdf_filename, digest, chunk_tokens=chunk_tokens, embedding_model=EMBEDDING_MODEL):
+    print(f"⏭️ '{pdf_filename}' is unchanged since its last ingest ({catalog.get(pdf_filename)['chunk_count']} chunks)")
+    sys.exit(0)
 
 
 # --------------------------------
 # SPLIT INTO CHUNKS
 # --------------------------------
 print("✂️ Splitting text into chunks...")
-splitter = RecursiveCharacterTextSplitter(
-    chunk_size=400,
-    chunk_overlap=80,
-    separators=["\n\n", "\n", ".", " "],
-    length_function=len
-)
-chunks = splitter.split_documents(docs)
+chunks = chunk_documents(docs, tokenizer=load_tokenizer(EMBEDDING_MODEL), max_tokens=chunk_tokens)
 print(f"✅ Created {len(chunks)} chunks")
 
 
@@ -88,7 +86,7 @@ def sanitize_text(text: str) -> str:
 print("🧠 Loading embedding model (MiniLM)...")
 
 embeddings = HuggingFaceEmbeddings(
-    model_name="sentence-transformers/all-MiniLM-L6-v2",
+    model_name=EMBEDDING_MODEL,
     model_kwargs={'device': 'cpu'},
     encode_kwargs={'normalize_embeddings': True}
 )
@@ -101,45 +99,49 @@ def sanitize_text(text: str) -> str:
 
 print(f"🚀 Uploading {len(chunks)} chunks to Pinecone...\n")
 
-# Get source filename
-pdf_filename = os.path.basename(PDF_PATH)
-
-# Prepare texts for batch embedding (use embed_documents for efficiency)
-texts_to_embed = []
-valid_chunks = []
-
-for idx, doc in enumerate(chunks):
-    text = sanitize_text(doc.page_content)
-    if text:  # Skip empty chunks
-        texts_to_embed.append(text)
-        valid_chunks.append((idx, doc, text))
+# Skip empty chunks
+valid_chunks = [doc for doc in chunks if doc.page_content.strip()]
 
 print(f"📊 Processing {len(valid_chunks)} valid chunks (skipped {len(chunks) - len(valid_chunks)} empty)")
 
 # Batch embed all documents at once (more efficient than embed_query one by one)
 print("🧠 Generating embeddings...")
-all_embeddings = embeddings.embed_documents(texts_to_embed)
+all_embeddings = embeddings.embed_documents([doc.page_content for doc in valid_chunks])
 print(f"✅ Generated {len(all_embeddings)} embeddings (dim={len(all_embeddings[0])})")
 
-# Prepare vectors - only store text in metadata (simplified)
-vectors_to_upsert = []
-for i, (chunk_idx, doc, text) in enumerate(tqdm(valid_chunks, desc="Preparing vectors")):
-    vector_id = f"{pdf_filename}-chunk-{chunk_idx}"
-    
-    vectors_to_upsert.append({
-        "id": vector_id,
-        "values": all_embeddings[i],
-        "metadata": {"text": text}
-    })
-
-# Upsert in batches
+# Prepare vectors - per-document IDs ("<doc>#<i>"), text, source, chunk count, token count and page
+vectors_to_upsert = document_vectors(pdf_filename, valid_chunks, all_embeddings)
+size = sum(len(doc.page_content.encode('utf-8')) for doc in docs)
+
+# Upsert in batches; the catalog entry is only marked ready if every batch made it
 batch_size = 100
 print(f"\n💾 Uploading to Pinecone...")
-for i in tqdm(range(0, len(vectors_to_upsert), batch_size), desc="Uploading"):
-    batch = vectors_to_upsert[i:i + batch_size]
+with catalog.ingesting(pdf_filename, document_id(pdf_filename), digest, len(vectors_to_upsert), size,
+                       embedding_model=EMBEDDING_MODEL, chunk_tokens=chunk_tokens) as previous:
+    # No alias switch can commit while this row is pending; make sure none did before it
     try:
-        index.upsert(vectors=batch)
-    except Exception as e:
-        print(f"⚠️ Error: {e}")
+        catalog.check_alias(PINECONE_INDEX_NAME, EMBEDDING_MODEL)
+    except AliasMovedError as e:
+        raise SystemExit(f"❌ {e} since this run started; re-run to ingest into it")
+    if previous is None:
+        previous = get_manifest(index, pdf_filename)
+        # First ingest since the catalog: drop this file's old "<file>-chunk-<n>" vectors
+        delete_legacy_vectors(index, pdf_filename)
+    failed = 0
+    for i in tqdm(range(0, len(vectors_to_upsert), batch_size), desc="Uploading"):
+        batch = vectors_to_upsert[i:i + batch_size]
+        try:
+            index.upsert(vectors=batch)
+        except Exception as e:
+            failed += 1
+            print(f"⚠️ Error: {e}")
+    if failed:
+        raise SystemExit(f"❌ {failed} batches failed; re-run to finish ingesting '{pdf_filename}'")
+
+    # Re-ingesting a shorter version leaves old chunks behind; delete them by ID
+    leftover = stale_ids(previous, len(vectors_to_upsert))
+    if leftover:
+        delete_ids(index, leftover)
+        print(f"🧹 Removed {len(leftover)} stale chunks from a previous ingest")
 
 print(f"\n✅ Done! Ingested {len(vectors_to_upsert)} chunks from '{pdf_filename}'")
@@ -0,0 +1,117 @@
+"""
+Benchmark: bill image preprocessing (payload bytes, latency, extraction accuracy).
+
+Usage:
+    python benchmarks/bench_bill_preprocess.py <fixtures_dir> [--live]
+
+fixtures_dir holds receipt photos (jpg/png/webp/heic). An optional sidecar
+<name>.json with the expected {"merchant", "amount", "date", "category"}
+enables accuracy scoring. Offline mode measures preprocessing only; --live
+also calls Gemini (GEMINI_API_KEY required) with and without preprocessing
+and compares end-to-end latency and field accuracy.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from image_preprocess import preprocess_bill_image  # noqa: E402
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp', '.heic', '.heif')
+FIELDS = ('merchant', 'amount', 'date', 'category')
+
+
+def load_fixtures(path):
+    """[(name, image_bytes, expected_dict_or_None)] for every image in the directory"""
+    fixtures = []
+    for name in sorted(os.listdir(path)):
+        stem, ext = os.path.splitext(name)
+        if ext.lower() not in IMAGE_EXTENSIONS:
+            continue
+        with open(os.path.join(path, name), 'rb') as f:
+            data = f.read()
+        expected = None
+        sidecar = os.path.join(path, stem + '.json')
+        if os.path.exists(sidecar):
+            with open(sidecar, encoding='utf-8') as f:
+                expected = json.load(f)
+        fixtures.append((name, data, expected))
+    return fixtures
+
+
+def field_matches(field, got, expected):
+    if expected is None:
+        return got in (None, '', 'Not Mentioned', 'null')
+    if got is None:
+        return False
+    if field == 'amount':
+        try:
+            return abs(float(str(got).replace(',', '')) - float(expected)) < 0.01
+        except ValueError:
+            return False
+    if field == 'merchant':
+        a, b = str(got).lower().strip(), str(expected).lower().strip()
+        return a in b or b in a
+    return str(got).lower() == str(expected).lower()
+
+
+def score(result, expected):
+    """Fraction of expected fields extracted correctly"""
+    if not expected or result.get("status") == "error":
+        return None
+    hits = sum(field_matches(f, result.get(f), expected.get(f)) for f in FIELDS if f in expected)
+    return hits / max(1, sum(1 for f in FIELDS if f in expected))
+
+
+def mean(values):
+    values = [v for v in values if v is not None]
+    return sum(values) / len(values) if values else float('nan')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("fixtures_dir")
+    parser.add_argument("--live", action="store_true", help="call Gemini with and without preprocessing")
+    args = parser.parse_args()
+
+    fixtures = load_fixtures(args.fixtures_dir)
+    if not fixtures:
+        print("❌ No receipt images found")
+        return
+
+    print(f"{'image':<28}{'format':<12}{'raw KB':>9}{'sent KB':>9}{'prep ms':>9}")
+    rows = []
+    for name, data, expected in fixtures:
+        _, _, info = preprocess_bill_image(data)
+        rows.append(info)
+        print(f"{name[:27]:<28}{info['format'].split('/')[-1]:<12}{info['original_bytes'] / 1024:>9.0f}"
+              f"{info['bytes'] / 1024:>9.0f}{info.get('elapsed_ms', 0):>9.1f}")
+    raw = sum(r['original_bytes'] for r in rows)
+    sent = sum(r['bytes'] for r in rows)
+    print(f"\n📦 Payload: {raw / 1024:.0f} KB -> {sent / 1024:.0f} KB ({100 * (1 - sent / raw):.0f}% smaller), "
+          f"mean preprocessing {mean([r.get('elapsed_ms') for r in rows]):.1f} ms")
+
+    if not args.live:
+        return
+
+    from rag_server import GeminiOCR
+
+    ocr = GeminiOCR()
+    for label, preprocess in (("raw", False), ("preprocessed", True)):
+        latencies, scores = [], []
+        for name, data, expected in fixtures:
+            started = time.perf_counter()
+            result = ocr.extract_bill_info(data, use_cache=False, preprocess=preprocess)
+            latencies.append((time.perf_counter() - started) * 1000)
+            scores.append(score(result, expected))
+        latencies.sort()
+        print(f"🤖 {label:<13} p50={latencies[len(latencies) // 2]:.0f} ms  "
+              f"max={latencies[-1]:.0f} ms  accuracy={mean(scores):.2%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Benchmark: token-aware chunker on a 500-page document.
+
+Usage:
+    python benchmarks/bench_chunker.py [document.pdf|.docx] [--pages N]
+
+Reports wall time, chunk count, token-count distribution and how many chunks
+would overflow the embedding window. Without a document, synthetic statement
+pages mixed with prose are used. If langchain's RecursiveCharacterTextSplitter
+is installed, the old 500/100 character splitter is measured for comparison.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from langchain_core.documents import Document  # noqa: E402
+
+from bench_sanitize import synthetic_statement  # noqa: E402
+from chunker import CHUNK_TOKENS, chunk_documents, load_tokenizer  # noqa: E402
+from text_normalize import normalize_documents  # noqa: E402
+
+EMBEDDING_WINDOW = 254  # 256 minus [CLS]/[SEP]
+
+PROSE = (
+    "INVESTMENT BASICS\n\n"
+    + "An emergency fund should cover six months of expenses and sit in a liquid account. " * 25
+    + "\n\n1.2 Mutual Funds\nSIPs average out market volatility and suit salaried investors.\n"
+)
+
+
+def synthetic_document(pages):
+    return [Document(page_content=page + "\n\n" + PROSE, metadata={"source": "synthetic.pdf", "page": i})
+            for i, page in enumerate(synthetic_statement(pages))]
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("document", nargs="?")
+    parser.add_argument("--pages", type=int, default=500)
+    args = parser.parse_args()
+
+    if args.document:
+        from loaders import load_document_from_path
+        docs = load_document_from_path(args.document)
+    else:
+        docs = synthetic_document(args.pages)
+    docs = normalize_documents(docs)
+    tokenizer = load_tokenizer()
+
+    start = time.perf_counter()
+    chunks = chunk_documents(docs, tokenizer=tokenizer)
+    elapsed = time.perf_counter() - start
+
+    counts = [c.metadata["token_count"] for c in chunks]
+    print(f"📄 {len(docs)} pages -> {len(chunks)} chunks in {elapsed:.3f}s (target {CHUNK_TOKENS} tokens)")
+    print(f"   tokens p50={percentile(counts, 50)} p95={percentile(counts, 95)} max={max(counts)}")
+    print(f"   chunks with tables: {sum(c.metadata['has_table'] for c in chunks)}")
+    print(f"   over embedding window: {sum(c > EMBEDDING_WINDOW for c in counts)}")
+
+    try:
+        from langchain_text_splitters import RecursiveCharacterTextSplitter
+    except ImportError:
+        return
+    splitter = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=100)
+    start = time.perf_counter()
+    legacy = splitter.split_documents(docs)
+    legacy_elapsed = time.perf_counter() - start
+    legacy_counts = [len(ids) for ids in tokenizer([c.page_content for c in legacy],
+                                                   add_special_tokens=False)["input_ids"]]
+    print(f"\n📎 legacy 500/100 char splitter: {len(legacy)} chunks in {legacy_elapsed:.3f}s")
+    print(f"   tokens p50={percentile(legacy_counts, 50)} max={max(legacy_counts)} "
+          f"over window={sum(c > EMBEDDING_WINDOW for c in legacy_counts)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""
+Micro-benchmark and differential check: the legacy clean_response (a chain of
+re.sub calls with pattern strings) vs response_cleaner.clean_response and
+StreamingCleaner.
+
+Usage:
+    python benchmarks/bench_clean_response.py [--cases 20000] [--repeat 2000] [--seed 0]
+
+Generates random answers from markdown, filler-phrase, list, whitespace and
+plain-text fragments, checks that both implementations return identical
+output, and that StreamingCleaner fed the same text in random chunks
+reproduces it exactly. Exits non-zero on the first mismatch. Then times
+typical answers.
+"""
+
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from response_cleaner import StreamingCleaner, clean_response  # noqa: E402
+
+
+# Legacy implementation, kept verbatim for comparison
+def legacy_clean_response(text: str) -> str:
+    """Clean up Gemini response to remove markdown and unwanted phrases"""
+    if not text:
+        return ""
+
+    # Remove markdown symbols
+    text = re.sub(r'\*\*([^*]+)\*\*', r'\1', text)  # Bold
+    text = re.sub(r'\*([^*]+)\*', r'\1', text)      # Italic
+    text = re.sub(r'#{1,6}\s*', '', text)           # Headers
+    text = re.sub(r'`([^`]+)`', r'\1', text)        # Inline code
+    text = re.sub(r'^\s*[-*+]\s+', '', text, flags=re.MULTILINE)  # Bullet points
+    text = re.sub(r'^\s*\d+\.\s+', '', text, flags=re.MULTILINE)  # Numbered lists
+
+    # Remove common unwanted phrases
+    unwanted_starts = [
+        r'^Based on (the|my|this|your).*?,\s*',
+        r'^According to.*?,\s*',
+        r'^From (the|my|this).*?,\s*',
+        r'^The (context|document|information).*?,\s*',
+        r'^In (conclusion|summary|short),?\s*',
+        r'^To (summarize|conclude|sum up),?\s*',
+        r'^Overall,?\s*',
+        r'^Generally (speaking)?,?\s*',
+    ]
+    for pattern in unwanted_starts:
+        text = re.sub(pattern, '', text, flags=re.IGNORECASE)
+
+    # Remove trailing phrases
+    unwanted_ends = [
+        r'\s*I hope this helps!?\s*$',
+        r'\s*Let me know if.*$',
+        r'\s*Feel free to.*$',
+        r'\s*Is there anything else.*$',
+    ]
+    for pattern in unwanted_ends:
+        text = re.sub(pattern, '', text, flags=re.IGNORECASE)
+
+    # Clean up whitespace
+    text = re.sub(r'\n{3,}', '\n\n', text)
+    text = text.strip()
+
+    return text
+
+
+FRAGMENTS = [
+    "Yes, you can afford it.", "You have ₹50,000 in your wallet.", "A SIP invests monthly",
+    "Based on the context, ", "based on your balance, ", "According to the documents, ", "From my notes, ",
+    "The document says, ", "In summary, ", "In short ", "To sum up, ", "Overall, ", "OVERALL ", "Generally speaking, ",
+    "Generally ", "I hope this helps!", "I hope this helps", "Let me know if you need more.", "Feel free to ask.",
+    "Is there anything else?", "let me KNOW if", "**bold**", "*italic*", "**", "*", "`code`", "`", "# ", "## Title",
+    "#", "- ", "* ", "+ ", "-", "1. ", "12.", "3", ".", "\n", "\n", "\n", "\n\n\n", "  ", " ", "\t", ",", "x",
+    "ﬀ", "İ", "ſ", " ",
+]
+
+
+PLAIN = ["Yes, you can afford it.", "Keep six months aside.", "SIPs average volatility", "x", ",", " ", "\n", "\n", "\n\n"]
+
+
+def random_answer(rng):
+    # Half the cases are mostly plain multi-line text, the shape StreamingCleaner can release early
+    pool = FRAGMENTS if rng.random() < 0.5 else PLAIN * 6 + FRAGMENTS
+    return "".join(rng.choice(pool) for _ in range(rng.randint(0, 30)))
+
+
+def stream(text, rng):
+    cleaner = StreamingCleaner()
+    out, i = [], 0
+    while i < len(text):
+        step = rng.randint(1, 12)
+        out.append(cleaner.feed(text[i:i + step]))
+        i += step
+    out.append(cleaner.finish())
+    return "".join(out)
+
+
+def differential(cases, seed):
+    rng = random.Random(seed)
+    streamed_early = 0
+    for n in range(cases):
+        text = random_answer(rng)
+        expected = legacy_clean_response(text)
+        for name, got in (("clean_response", clean_response(text)), ("StreamingCleaner", stream(text, rng))):
+            if got != expected:
+                print(f"❌ {name} mismatch on case {n}:\n   input:    {text!r}\n"
+                      f"   expected: {expected!r}\n   got:      {got!r}")
+                return False
+        cleaner = StreamingCleaner()
+        streamed_early += bool(cleaner.feed(text))
+    print(f"✅ {cases} random answers identical (batch and streamed); "
+          f"{streamed_early} released output before finish()")
+    return True
+
+
+TYPICAL = [
+    "Yes, you can afford it. You have ₹55,000 in your wallet, so ₹40,000 leaves a comfortable buffer.",
+    "A SIP invests a fixed amount every month, which averages out market ups and downs over time.\n\n"
+    "Start with an amount you can keep up even in a tight month.",
+    "**Emergency fund**: keep *six months* of expenses.\n- Use a liquid fund\n- Avoid equity\n"
+    "I hope this helps! Let me know if you have more questions.",
+]
+
+
+def time_it(fn, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for text in TYPICAL:
+            fn(text)
+    return (time.perf_counter() - started) / (repeat * len(TYPICAL)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cases", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if not differential(args.cases, args.seed):
+        sys.exit(1)
+    print(f"   legacy:         {time_it(legacy_clean_response, args.repeat):6.2f} µs/answer")
+    print(f"   clean_response: {time_it(clean_response, args.repeat):6.2f} µs/answer")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Regression check and micro-benchmark for the /chat fast-path rule engine
+(intent.fast_answer).
+
+Usage:
+    python benchmarks/bench_intent.py [--repeat 20000]
+
+Runs a table of questions against a sample realtime_context and checks the
+detected intent, the parsed amount and whether the engine answers at all
+(None means the question goes to the LLM). Exits non-zero on the first
+mismatch. Then times fast_answer over the same questions.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from intent import AFFORDABILITY, BALANCE, OTHER, classify_intent, fast_answer, parse_amounts  # noqa: E402
+
+CONTEXT = {'wallet_balance': 20000, 'cashback': 750, 'loan_balance': 90000, 'portfolio': 150000}
+
+# (question, intent kind, amount, answered by the rules)
+CASES = [
+    ("Can I afford a new phone for 40000?", AFFORDABILITY, 40000, True),
+    ("Can I buy a laptop for ₹1.2 lakh?", AFFORDABILITY, 120000, True),
+    ("Can I book a flight for 8000?", AFFORDABILITY, 8000, True),
+    ("Can I buy shoes for 3000 at a discount of 20%?", AFFORDABILITY, 3000, True),
+    ("Can I afford it if I pay 5000 per month?", AFFORDABILITY, 5000, False),
+    # Unit prices and comparisons: the amount is not what the question costs
+    ("Can I buy 10 shares of TCS at 3500?", AFFORDABILITY, None, False),
+    ("Can I buy 3 laptops at 40000?", AFFORDABILITY, None, False),
+    ("Should I buy a car for 8 lakh or lease it?", AFFORDABILITY, None, False),
+    # get/book/order without a price are not purchases
+    ("Can I get a refund of 500?", OTHER, None, False),
+    ("Could I get a credit card with a limit of 50000?", OTHER, None, False),
+    ("What's my balance?", BALANCE, None, True),
+    ("How much money do I have?", BALANCE, None, True),
+    ("What is my net worth?", BALANCE, None, True),
+    # Questions about balances in general, not the user's own
+    ("What is a balance sheet?", OTHER, None, False),
+    ("What is net worth?", OTHER, None, False),
+    ("What is balance transfer?", OTHER, None, False),
+    ("what is the minimum balance for a savings account?", OTHER, None, False),
+    ("Show me how to check my PF balance", OTHER, None, False),
+    ("Tell me about balance funds", OTHER, None, False),
+    # Balances owed are not the wallet balance
+    ("What is my credit card balance?", OTHER, None, False),
+    ("Show my loan balance", OTHER, None, False),
+    ("What is a SIP and how does it average volatility?", OTHER, None, False),
+]
+
+# (text, parsed amounts) - percentages are not prices
+AMOUNT_CASES = [
+    ("discount of 20%", []),
+    ("interest at 8.5 percent", []),
+    ("a phone for 40000 with 10% off", [(40000.0, True)]),
+    ("₹2,500", [(2500.0, True)]),
+]
+
+# context keys are matched on whole words, and debts never count as spendable
+BALANCE_CASES = [
+    ({'cashback': 750, 'savings': 5000}, "Your savings is ₹5,000."),
+    ({'loan_balance': 90000, 'walletBalance': 1200}, "Your wallet balance is ₹1,200."),
+    ({'credit_card_balance': 4000}, None),
+]
+
+
+def check():
+    for query, kind, amount, answered in CASES:
+        intent = classify_intent(query)
+        answer, _ = fast_answer(query, CONTEXT)
+        if intent.kind != kind or (amount is not None and intent.amount != amount) or (answer is not None) != answered:
+            print(f"❌ {query!r}: got {intent}, answer={answer!r}; expected {kind}, amount={amount}, "
+                  f"answered={answered}")
+            return False
+    for text, expected in AMOUNT_CASES:
+        if parse_amounts(text) != expected:
+            print(f"❌ parse_amounts({text!r}) = {parse_amounts(text)}, expected {expected}")
+            return False
+    for context, expected in BALANCE_CASES:
+        answer, _ = fast_answer("What's my balance?", context)
+        if answer != expected:
+            print(f"❌ balance with {context}: got {answer!r}, expected {expected!r}")
+            return False
+    print(f"✅ {len(CASES) + len(AMOUNT_CASES) + len(BALANCE_CASES)} intent cases pass")
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=20000)
+    args = parser.parse_args()
+
+    if not check():
+        sys.exit(1)
+
+    queries = [query for query, *_ in CASES]
+    started = time.perf_counter()
+    for i in range(args.repeat):
+        fast_answer(queries[i % len(queries)], CONTEXT)
+    elapsed = time.perf_counter() - started
+    print(f"⏱️ fast_answer: {elapsed / args.repeat * 1e6:.1f} µs per question ({args.repeat} calls)")
+
+
+if __name__ == "__main__":
+    main()
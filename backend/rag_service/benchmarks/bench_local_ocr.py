@@ -0,0 +1,78 @@
+"""
+Benchmark: local OCR pre-pass vs always calling Gemini for bill extraction.
+
+Usage:
+    python benchmarks/bench_local_ocr.py <fixtures_dir> [--llm-ms 2500] [--live]
+
+Uses the same fixtures as bench_bill_preprocess.py (images + optional JSON
+sidecars). Reports the share of bills resolved locally at the configured
+confidence threshold, their accuracy, and latency saved. Offline, saved time
+is estimated from --llm-ms (mean Gemini latency); --live measures both paths
+end to end through GeminiOCR (GEMINI_API_KEY required).
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from bench_bill_preprocess import load_fixtures, mean, score  # noqa: E402
+from image_preprocess import preprocess_bill_image  # noqa: E402
+from local_ocr import LOCAL_OCR_AVAILABLE, LOCAL_OCR_MIN_CONFIDENCE, extract_locally  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("fixtures_dir")
+    parser.add_argument("--llm-ms", type=float, default=2500, help="assumed mean Gemini latency (offline estimate)")
+    parser.add_argument("--live", action="store_true", help="run GeminiOCR with and without the local pass")
+    args = parser.parse_args()
+
+    if not LOCAL_OCR_AVAILABLE:
+        print("❌ pytesseract / tesseract binary not installed")
+        return
+    fixtures = load_fixtures(args.fixtures_dir)
+    if not fixtures:
+        print("❌ No receipt images found")
+        return
+
+    resolved, local_ms, local_scores = 0, [], []
+    print(f"{'image':<28}{'conf':>6}{'ms':>8}  {'amount':<12}merchant")
+    for name, data, expected in fixtures:
+        image, _, _ = preprocess_bill_image(data)
+        result = extract_locally(image)
+        local_ms.append(result['elapsed_ms'])
+        if result['confidence'] >= LOCAL_OCR_MIN_CONFIDENCE:
+            resolved += 1
+            local_scores.append(score(result, expected))
+        print(f"{name[:27]:<28}{result['confidence']:>6.2f}{result['elapsed_ms']:>8.0f}  "
+              f"{str(result['amount']):<12}{result['merchant']}")
+
+    total = len(fixtures)
+    # Every bill pays for the local pass; resolved ones skip the Gemini call
+    saved = resolved * args.llm_ms - sum(local_ms)
+    print(f"\n⚡ Resolved locally: {resolved}/{total} ({resolved / total:.0%}) at confidence >= {LOCAL_OCR_MIN_CONFIDENCE}")
+    print(f"   local accuracy={mean(local_scores):.2%}  mean local pass={mean(local_ms):.0f} ms")
+    print(f"   estimated latency saved: {saved / total:.0f} ms per bill (assuming {args.llm_ms:.0f} ms per Gemini call)")
+
+    if not args.live:
+        return
+
+    from rag_server import GeminiOCR
+
+    ocr = GeminiOCR()
+    for label, local_ocr in (("gemini only", False), ("local + gemini", True)):
+        latencies, scores = [], []
+        for name, data, expected in fixtures:
+            started = time.perf_counter()
+            result = ocr.extract_bill_info(data, use_cache=False, local_ocr=local_ocr)
+            latencies.append((time.perf_counter() - started) * 1000)
+            scores.append(score(result, expected))
+        print(f"🤖 {label:<15} mean={mean(latencies):.0f} ms  total={sum(latencies) / 1000:.1f} s  "
+              f"accuracy={mean(scores):.2%}")
+
+
+if __name__ == "__main__":
+    main()
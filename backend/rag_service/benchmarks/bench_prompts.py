@@ -0,0 +1,142 @@
+"""
+Micro-benchmark: the legacy /chat prompt builder (two f-string branches with
+the rules after the dynamic context) vs prompts.build_chat_prompt.
+
+Usage:
+    python benchmarks/bench_prompts.py [--repeat N]
+
+Reports build time per prompt, prompt size in tokens (embedding-model
+tokenizer, or the approximate fallback) and how many leading characters are
+identical across requests, which is what a prefix cache can reuse.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from chunker import load_tokenizer  # noqa: E402
+from prompts import build_chat_prompt  # noqa: E402
+
+CASES = [
+    ("Can I afford a new phone for 40000?", [], {"wallet_balance": 55000, "net_worth": 320000}, ""),
+    ("What is a SIP?", ["A SIP invests a fixed amount every month into a mutual fund. " * 6] * 5, None, ""),
+    ("and what about ELSS?", ["ELSS funds have a three year lock-in and qualify under 80C. " * 6] * 7,
+     {"balance": 1000, "portfolio": 5000},
+     "User: What is a SIP?\nAssistant: A SIP invests a fixed amount every month."),
+    ("How do I reduce my credit card debt?", [], None, ""),
+]
+
+
+# Legacy implementation, kept verbatim for comparison
+
+def legacy_build_chat_prompt(query: str, context_chunks, realtime_context, history: str = "") -> str:
+    """
+    RAG prompt with documents, or the general-knowledge fallback when there
+    are none. `history` is the session's summarized conversation, if any.
+    """
+    has_document_context = len(context_chunks) > 0
+    history_block = f"CONVERSATION SO FAR (use it for follow-up questions):\n{history}\n" if history else ""
+    
+    system_instruction = "You are F-Buddy AI, a friendly and helpful financial assistant."
+    
+    # Inject Real-Time Financial Context
+    financial_context_str = ""
+    if realtime_context:
+        financial_context_str = "CURRENT FINANCIAL STATUS (Real-time):\n"
+        for key, val in realtime_context.items():
+            # Format key for readability ("total_balance" -> "Total Balance")
+            nice_key = key.replace('_', ' ').title()
+            financial_context_str += f"- {nice_key}: {val}\n"
+        financial_context_str += "\nUse this real-time data to answer questions about affordability (e.g., 'Can I buy X?').\n"
+
+    context_block = ""
+    if has_document_context:
+        context_block = f"CONTEXT FROM DOCUMENTS/HISTORY:\n{chr(10).join(context_chunks)}\n"
+        
+        prompt = f"""
+{system_instruction}
+
+{financial_context_str}
+{context_block}
+{history_block}
+USER QUESTION:
+{query}
+
+IMPORTANT RESPONSE RULES:
+1. Give a DIRECT, CONCISE answer in 2-4 sentences max.
+2. If the user asks if they can buy something, COMPARE the cost to their 'Wallet Balance' or 'Net Worth' derived from the Financial Status above.
+   - Example: "Yes, you have ₹50,000 balance." or "No, you only have ₹10,000."
+3. NO asterisks (*), hashes (#), or markdown symbols.
+4. NO phrases like "Based on the context" or "According to the documents".
+5. NO "In conclusion" or summary statements.
+6. Use simple, conversational language.
+7. Only add a brief disclaimer for major financial decisions.
+
+Answer directly:
+"""
+    else:
+        # Fallback: No relevant documents found, use LLM's general finance knowledge
+        # Inject Real-Time Financial Context even in fallback
+        financial_context_str = ""
+        if realtime_context:
+            financial_context_str = "CURRENT FINANCIAL STATUS (Real-time):\n"
+            for key, val in realtime_context.items():
+                nice_key = key.replace('_', ' ').title()
+                financial_context_str += f"- {nice_key}: {val}\n"
+            financial_context_str += "\nUse this real-time data to answer questions about affordability.\n"
+
+        prompt = f"""
+You are F-Buddy AI, a friendly financial assistant.
+
+{financial_context_str}
+{history_block}
+USER QUESTION:
+{query}
+
+IMPORTANT RESPONSE RULES:
+1. Give a DIRECT, CONCISE answer in 2-4 sentences max
+2. Compare costs to 'Wallet Balance' if asked about affordability.
+3. NO asterisks (*), hashes (#), or markdown symbols
+4. NO phrases like "Based on my knowledge" or "Generally speaking"
+5. NO "In conclusion" or summary statements
+6. Use simple, conversational language
+7. Only add a brief disclaimer for major financial decisions
+8. If not about finance, politely say you only help with money topics
+
+Answer directly:
+"""
+
+    return prompt
+
+
+def time_builder(builder, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for case in CASES:
+            builder(*case)
+    return (time.perf_counter() - started) / (repeat * len(CASES)) * 1e6
+
+
+def shared_prefix(prompts):
+    return len(os.path.commonprefix(prompts))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=20000)
+    args = parser.parse_args()
+
+    tokenizer = load_tokenizer()
+    for name, builder in (("legacy", legacy_build_chat_prompt), ("prompts", build_chat_prompt)):
+        prompts = [builder(*case) for case in CASES]
+        tokens = [len(tokenizer(p, add_special_tokens=False)["input_ids"]) for p in prompts]
+        print(f"{name:>8}: {time_builder(builder, args.repeat):6.2f} µs/prompt, "
+              f"{sum(tokens) / len(tokens):6.1f} tokens avg, "
+              f"{shared_prefix(prompts)} chars shared prefix")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+"""
+Benchmark suite for the RAG service with local Pinecone/embedding/Gemini fakes.
+
+Usage:
+    python benchmarks/bench_rag.py [--pages 200] [--requests 200] [--concurrency 1,4,16]
+                                   [--llm-ms 800] [--query-ms 30] [--embed-ms 5]
+                                   [--real-embeddings] [--tracemalloc] [--compare results/old.json]
+
+Measures ingestion throughput (pages/sec, chunks/sec) through ingest_documents,
+embedding throughput, and /chat p50/p95/p99 under concurrent load via the Flask
+test client (admission limits lifted; non-200 responses are counted as errors), plus memory high-water marks (ru_maxrss, and tracemalloc peaks per
+phase with --tracemalloc, which slows the run). Results are written as JSON to
+benchmarks/results/ so runs can be compared with --compare.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from bench_chunker import synthetic_document  # noqa: E402
+from fakes import FakeEmbeddings, FakeIndex, FakeLLMClient  # noqa: E402
+from rate_limit import AdmissionController  # noqa: E402
+from resilience import ResilientLLM  # noqa: E402
+from text_normalize import normalize_documents  # noqa: E402
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+QUERIES = [
+    "Can I afford a new phone for 40000?",
+    "How much should I keep in an emergency fund?",
+    "What is a SIP and how does it average volatility?",
+    "Show my spending on restaurants this month",
+    "Is a mutual fund better than a fixed deposit?",
+    "How do I reduce my credit card debt?",
+]
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))] if ordered else None
+
+
+def max_rss_mb():
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return round(rss / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+@contextlib.contextmanager
+def phase(results, name, trace_memory):
+    """Quiet the service's print logging and record memory for one phase"""
+    if trace_memory:
+        tracemalloc.start()
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+    if trace_memory:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        results[name]['tracemalloc_peak_mb'] = round(peak / (1024 * 1024), 1)
+    results[name]['max_rss_mb'] = max_rss_mb()
+
+
+def bench_ingestion(rag_server, pages, results, trace_memory):
+    docs = normalize_documents(synthetic_document(pages))
+    results['ingestion'] = {}
+    with phase(results, 'ingestion', trace_memory):
+        started = time.perf_counter()
+        chunks = rag_server.ingest_documents(docs, 'bench.pdf')
+        elapsed = time.perf_counter() - started
+    results['ingestion'].update({
+        'pages': pages,
+        'chunks': chunks,
+        'elapsed_s': round(elapsed, 3),
+        'pages_per_sec': round(pages / elapsed, 1),
+        'chunks_per_sec': round(chunks / elapsed, 1),
+    })
+
+
+def bench_embeddings(embeddings, texts, results, trace_memory, batch_size=64):
+    results['embedding'] = {}
+    with phase(results, 'embedding', trace_memory):
+        started = time.perf_counter()
+        for i in range(0, len(texts), batch_size):
+            embeddings.embed_documents(texts[i:i + batch_size])
+        elapsed = time.perf_counter() - started
+    results['embedding'].update({
+        'texts': len(texts),
+        'batch_size': batch_size,
+        'texts_per_sec': round(len(texts) / elapsed, 1),
+    })
+
+
+def bench_chat(rag_server, total_requests, concurrency, results, trace_memory):
+    name = f'chat_c{concurrency}'
+    results[name] = {}
+
+    def one(i):
+        client = rag_server.app.test_client()
+        started = time.perf_counter()
+        response = client.post('/chat', json={'query': QUERIES[i % len(QUERIES)], 'user_id': f'user{i % 5}'})
+        return (time.perf_counter() - started) * 1000, response.status_code
+
+    with phase(results, name, trace_memory):
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            samples = list(pool.map(one, range(total_requests)))
+        elapsed = time.perf_counter() - started
+    # Only 200s count as served: 429s/500s return instantly and would flatter the numbers
+    latencies = [ms for ms, status in samples if status == 200]
+    statuses = {}
+    for _, status in samples:
+        if status != 200:
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+    results[name].update({
+        'concurrency': concurrency,
+        'requests': total_requests,
+        'errors': total_requests - len(latencies),
+        'error_statuses': statuses,
+        'p50_ms': round(percentile(latencies, 50), 1) if latencies else None,
+        'p95_ms': round(percentile(latencies, 95), 1) if latencies else None,
+        'p99_ms': round(percentile(latencies, 99), 1) if latencies else None,
+        'requests_per_sec': round(len(latencies) / elapsed, 1),
+    })
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except Exception:
+        return None
+
+
+def compare(current, previous_path):
+    """Print relative change of every numeric result vs an earlier run"""
+    with open(previous_path, encoding='utf-8') as f:
+        previous = json.load(f)['results']
+    print(f"\n📊 Compared with {os.path.basename(previous_path)}")
+    for section, values in current.items():
+        for key, value in values.items():
+            old = previous.get(section, {}).get(key)
+            if isinstance(value, (int, float)) and isinstance(old, (int, float)) and old:
+                print(f"   {section}.{key}: {old} -> {value} ({(value - old) / old:+.1%})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", default="1,4,16")
+    parser.add_argument("--llm-ms", type=float, default=800)
+    parser.add_argument("--query-ms", type=float, default=30)
+    parser.add_argument("--upsert-ms", type=float, default=20)
+    parser.add_argument("--embed-ms", type=float, default=5)
+    parser.add_argument("--real-embeddings", action="store_true", help="use the HuggingFace model instead of the fake")
+    parser.add_argument("--tracemalloc", action="store_true", help="record Python heap peaks per phase")
+    parser.add_argument("--out", default=RESULTS_DIR)
+    parser.add_argument("--compare", help="earlier results JSON to diff against")
+    args = parser.parse_args()
+
+    # A throwaway catalog: against the real one, a second run would find bench.pdf
+    # already indexed and time a no-op (and the bench would pollute it)
+    catalog_dir = tempfile.mkdtemp(prefix="bench-rag-")
+    os.environ["CATALOG_PATH"] = os.path.join(catalog_dir, "catalog.db")
+    import rag_server
+
+    if args.real_embeddings:
+        from langchain_community.embeddings import HuggingFaceEmbeddings
+        embeddings = HuggingFaceEmbeddings(model_name=rag_server.EMBEDDING_MODEL, model_kwargs={"device": "cpu"},
+                                           encode_kwargs={"normalize_embeddings": True})
+    else:
+        embeddings = FakeEmbeddings(call_ms=args.embed_ms)
+    # Swap the service's clients for the stand-ins; pc_client marks them initialized
+    rag_server.pc_client = object()
+    rag_server.index = FakeIndex(query_ms=args.query_ms, upsert_ms=args.upsert_ms)
+    rag_server.embeddings = embeddings
+    rag_server.llm = FakeLLMClient(latency_ms=args.llm_ms)
+    rag_server.resilient_llm = ResilientLLM(rag_server.llm)
+    # Measure the pipeline, not the per-user/global request budgets
+    rag_server.admission = AdmissionController({endpoint: (1e9, 1e9) for endpoint in rag_server.RATE_LIMITS})
+
+    results = {}
+    print(f"📄 Ingesting {args.pages} synthetic pages...")
+    bench_ingestion(rag_server, args.pages, results, args.tracemalloc)
+    print(f"   {results['ingestion']['pages_per_sec']} pages/s, {results['ingestion']['chunks_per_sec']} chunks/s")
+
+    texts = [doc.page_content for doc in normalize_documents(synthetic_document(min(args.pages, 50)))]
+    texts = (texts * (1000 // max(1, len(texts)) + 1))[:1000]
+    bench_embeddings(embeddings, texts, results, args.tracemalloc)
+    print(f"🔢 Embedding: {results['embedding']['texts_per_sec']} texts/s")
+
+    for concurrency in (int(c) for c in args.concurrency.split(',')):
+        bench_chat(rag_server, args.requests, concurrency, results, args.tracemalloc)
+        r = results[f'chat_c{concurrency}']
+        print(f"💬 /chat c={concurrency}: p50={r['p50_ms']} p95={r['p95_ms']} p99={r['p99_ms']} ms, "
+              f"{r['requests_per_sec']} req/s, errors={r['errors']} {r['error_statuses'] or ''}")
+
+    run = {
+        'timestamp': datetime.now().isoformat(),
+        'git_commit': git_commit(),
+        'params': vars(args),
+        'results': results,
+    }
+    os.makedirs(args.out, exist_ok=True)
+    path = os.path.join(args.out, f"rag-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(run, f, indent=2)
+    print(f"\n💾 Results written to {path}")
+
+    if args.compare:
+        compare(results, args.compare)
+    shutil.rmtree(catalog_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Micro-benchmark: legacy per-chunk sanitize_text variants vs the shared
+single-pass normalizer applied once per page.
+
+Usage:
+    python benchmarks/bench_sanitize.py [corpus_dir] [--repeat N]
+
+corpus_dir may contain .txt, .pdf and .docx statements (e.g. exported bank or
+card statements). Without one, a synthetic statement corpus is generated.
+"""
+
+import argparse
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from text_normalize import sanitize_text  # noqa: E402
+
+CHUNK_SIZE = 500
+CHUNK_OVERLAP = 100
+
+
+# Legacy implementations, kept verbatim for comparison
+def legacy_rag_server(text):
+    if not text:
+        return ""
+    text = text.encode('ascii', 'ignore').decode('ascii')
+    text = re.sub(r'[\x00-\x08\x0b\x0c\x0e-\x1f\x7f-\x9f]', '', text)
+    return text.strip()
+
+
+def legacy_app(text):
+    if not text:
+        return ""
+    text = text.encode('ascii', 'ignore').decode('ascii')
+    text = re.sub(r'[\x00-\x08\x0b\x0c\x0e-\x1f\x7f-\x9f]', '', text)
+    text = re.sub(r'\n{3,}', '\n\n', text)
+    text = re.sub(r' {2,}', ' ', text)
+    return text.strip()
+
+
+def legacy_ingest(text):
+    if not text:
+        return ""
+    text = text.encode('ascii', 'ignore').decode('ascii')
+    text = re.sub(r'[\x00-\x08\x0b\x0c\x0e-\x1f\x7f-\x9f]', '', text)
+    text = re.sub(r'\n{3,}', '\n\n', text)
+    return text.strip()
+
+
+def synthetic_statement(pages=200):
+    """Bank-statement-like pages with rupee amounts, Hindi merchant names and PDF noise"""
+    rows = [
+        "02/01/2025  UPI/ज़ोमैटो/Order 4411      ₹ 349.00   Dr   ₹ 52,310.45",
+        "03/01/2025  NEFT SALARY CREDIT          ₹ 85,000.00 Cr  ₹ 1,37,310.45",
+        "05/01/2025  POS  BIG BAZAAR  MUMBAI    ₹ 2,145.60  Dr   ₹ 1,35,164.85",
+        "07/01/2025  ATM WDL\x0c  ANDHERI           ₹ 5,000.00  Dr   ₹ 1,30,164.85",
+        "09/01/2025  UPI/पेट्रोल पंप/HP​       ₹ 1,200.00  Dr   ₹ 1,28,964.85",
+    ]
+    page = "STATEMENT OF ACCOUNT\n\n\n\nDate        Narration                 Amount     Type  Balance\n"
+    page += "\n".join(rows * 8) + "\n\n\n\nPage   footer\x07  -  continued\n"
+    return [page] * pages
+
+
+def load_corpus(path):
+    from loaders import load_document_from_path
+
+    pages = []
+    for name in sorted(os.listdir(path)):
+        full = os.path.join(path, name)
+        if name.lower().endswith('.txt'):
+            with open(full, encoding='utf-8', errors='replace') as f:
+                pages.append(f.read())
+        elif name.lower().endswith(('.pdf', '.docx')):
+            pages.extend(doc.page_content for doc in load_document_from_path(full))
+    return pages
+
+
+def split_chunks(pages):
+    """Character windows matching the old 500/100 splitter settings"""
+    step = CHUNK_SIZE - CHUNK_OVERLAP
+    return [page[i:i + CHUNK_SIZE] for page in pages for i in range(0, max(len(page), 1), step)]
+
+
+def timed(fn, items, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for item in items:
+            fn(item)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("corpus_dir", nargs="?")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    pages = load_corpus(args.corpus_dir) if args.corpus_dir else synthetic_statement()
+    chunks = split_chunks(pages)
+    total_mb = sum(len(p.encode('utf-8')) for p in pages) / 1e6
+    print(f"📄 Corpus: {len(pages)} pages, {len(chunks)} chunks, {total_mb:.2f} MB")
+
+    cases = [
+        ("legacy rag_server (per chunk)", legacy_rag_server, chunks),
+        ("legacy apis/app (per chunk)", legacy_app, chunks),
+        ("legacy apis/ingest (per chunk)", legacy_ingest, chunks),
+        ("shared unicode (per page)", sanitize_text, pages),
+        ("shared ascii (per page)", lambda t: sanitize_text(t, keep_unicode=False), pages),
+    ]
+    print(f"\n{'variant':<34}{'seconds':>10}{'MB/s':>10}")
+    for name, fn, items in cases:
+        elapsed = timed(fn, items, args.repeat)
+        print(f"{name:<34}{elapsed:>10.4f}{total_mb / elapsed:>10.1f}")
+
+    sample = pages[0]
+    kept = sum(sample.count(ch) for ch in "₹ज़")
+    print(f"\n₹/Indic characters in first page: {kept} "
+          f"(legacy keeps {sum(legacy_app(sample).count(ch) for ch in '₹ज़')}, "
+          f"shared keeps {sum(sanitize_text(sample).count(ch) for ch in '₹ज़')})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+"""
+Offline retrieval evaluation: recall@k, MRR, prompt tokens and latency over a
+grid of chunk sizes, TOP_K and similarity cutoffs, with the Pareto front.
+
+Usage:
+    python benchmarks/eval_retrieval.py <corpus_dir> <golden.jsonl>
+        [--chunk-tokens 128,192,240] [--top-k 3,5,7,15] [--min-similarity 0.2,0.25,0.3]
+        [--mode chat|app] [--workers N] [--fake-embeddings] [--query-ms 0]
+
+corpus_dir holds .pdf/.docx/.txt documents. golden.jsonl has one labelled
+question per line:
+    {"question": "How big should my emergency fund be?",
+     "relevant": ["emergency fund should cover six months"]}
+Labels are text snippets rather than chunk IDs so they stay valid across
+chunk sizes; a retrieved chunk is relevant if it contains a snippet.
+
+--mode chat mirrors rag_server /chat (score cutoff, at most 7 chunks);
+--mode app mirrors apis/app.py retrieve_chunks + clean_context (cutoff,
+near-duplicate removal). Each chunk size is indexed and evaluated in its own
+process. Latency is embedding + local exact search (+ --query-ms to simulate
+the Pinecone round trip), so compare settings relative to each other.
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from chunker import CHUNK_OVERLAP_TOKENS, EMBEDDING_MODEL, chunk_documents, load_tokenizer  # noqa: E402
+from fakes import FakeEmbeddings, FakeIndex  # noqa: E402
+from text_normalize import normalize_documents  # noqa: E402
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+CHAT_MAX_CONTEXT = 7  # rag_server.filter_matches keeps the top 7
+_SPACES = re.compile(r'\s+')
+
+
+def _norm(text):
+    return _SPACES.sub(' ', text).strip().lower()
+
+
+def load_corpus(path):
+    from langchain_core.documents import Document
+    from loaders import SUPPORTED_EXTENSIONS, load_document_from_path
+
+    docs = []
+    for name in sorted(os.listdir(path)):
+        full = os.path.join(path, name)
+        ext = os.path.splitext(name)[1].lower()
+        if ext == '.txt':
+            with open(full, encoding='utf-8', errors='ignore') as f:
+                docs.append(Document(page_content=f.read(), metadata={'source': name}))
+        elif ext.lstrip('.') in SUPPORTED_EXTENSIONS:
+            docs.extend(load_document_from_path(full, name))
+    return normalize_documents(docs)
+
+
+def load_golden(path):
+    with open(path, encoding='utf-8') as f:
+        rows = [json.loads(line) for line in f if line.strip()]
+    return [(row['question'], [_norm(r) for r in row['relevant']]) for row in rows]
+
+
+def _jaccard(a, b):
+    wa, wb = set(a.lower().split()), set(b.lower().split())
+    return len(wa & wb) / len(wa | wb) if wa and wb else 0.0
+
+
+def select_context(matches, min_similarity, mode):
+    """Chunks the service would put in the prompt for these matches"""
+    texts = [m['metadata']['text'] for m in matches if m['score'] >= min_similarity and m['metadata'].get('text')]
+    if mode == 'chat':
+        return texts[:CHAT_MAX_CONTEXT]
+    unique = []
+    for text in texts:  # apis/app.py deduplicate_chunks (Jaccard > 0.85)
+        if all(_jaccard(text, kept) <= 0.85 for kept in unique):
+            unique.append(text)
+    return unique
+
+
+def score_question(context, relevant):
+    """(recall, reciprocal rank) of the selected chunks against the labels"""
+    normalized = [_norm(text) for text in context]
+    found = {label for label in relevant if any(label in text for text in normalized)}
+    rank = next((i for i, text in enumerate(normalized, 1) if any(label in text for label in relevant)), None)
+    return len(found) / len(relevant), (1.0 / rank if rank else 0.0)
+
+
+def evaluate_chunk_size(job):
+    """Worker: index the corpus at one chunk size and evaluate every top_k/cutoff"""
+    docs, golden, chunk_tokens, top_ks, cutoffs, mode, fake_embeddings, query_ms = job
+    if fake_embeddings:
+        embeddings = FakeEmbeddings(call_ms=0, per_text_ms=0)
+    else:
+        from langchain_community.embeddings import HuggingFaceEmbeddings
+        embeddings = HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL, model_kwargs={"device": "cpu"},
+                                           encode_kwargs={"normalize_embeddings": True})
+    tokenizer = load_tokenizer()
+
+    chunks = chunk_documents(docs, tokenizer=tokenizer, max_tokens=chunk_tokens,
+                             overlap_tokens=min(CHUNK_OVERLAP_TOKENS, chunk_tokens // 4))
+    index = FakeIndex(query_ms=0, upsert_ms=0)
+    vectors = embeddings.embed_documents([c.page_content for c in chunks])
+    index.upsert([{"id": f"c{i}", "values": v, "metadata": {"text": c.page_content}}
+                  for i, (c, v) in enumerate(zip(chunks, vectors))])
+
+    # Embed each question once; its cost is added to every setting's latency
+    queries = []
+    for question, relevant in golden:
+        started = time.perf_counter()
+        vec = embeddings.embed_query(question)
+        queries.append((vec, relevant, (time.perf_counter() - started) * 1000))
+
+    rows = []
+    for top_k in top_ks:
+        searched = []
+        for vec, relevant, embed_ms in queries:
+            started = time.perf_counter()
+            matches = index.query(vector=vec, top_k=top_k, include_metadata=True)["matches"]
+            searched.append((matches, relevant, embed_ms + query_ms + (time.perf_counter() - started) * 1000))
+        for cutoff in cutoffs:
+            recalls, rrs, tokens, latencies = [], [], [], []
+            for matches, relevant, latency in searched:
+                context = select_context(matches, cutoff, mode)
+                recall, rr = score_question(context, relevant)
+                recalls.append(recall)
+                rrs.append(rr)
+                tokens.append(sum(len(ids) for ids in tokenizer(context, add_special_tokens=False)["input_ids"])
+                              if context else 0)
+                latencies.append(latency)
+            latencies.sort()
+            rows.append({
+                'chunk_tokens': chunk_tokens,
+                'top_k': top_k,
+                'min_similarity': cutoff,
+                'chunks_indexed': len(chunks),
+                'recall': round(sum(recalls) / len(recalls), 4),
+                'mrr': round(sum(rrs) / len(rrs), 4),
+                'prompt_tokens': round(sum(tokens) / len(tokens), 1),
+                'latency_p50_ms': round(latencies[len(latencies) // 2], 2),
+                'latency_p95_ms': round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 2),
+            })
+    return rows
+
+
+def pareto_front(rows):
+    """Settings no other setting beats on recall, MRR, prompt tokens and latency at once"""
+    def dominates(a, b):
+        better_or_equal = (a['recall'] >= b['recall'] and a['mrr'] >= b['mrr']
+                           and a['prompt_tokens'] <= b['prompt_tokens'] and a['latency_p50_ms'] <= b['latency_p50_ms'])
+        strictly = (a['recall'] > b['recall'] or a['mrr'] > b['mrr']
+                    or a['prompt_tokens'] < b['prompt_tokens'] or a['latency_p50_ms'] < b['latency_p50_ms'])
+        return better_or_equal and strictly
+    return [r for r in rows if not any(dominates(o, r) for o in rows if o is not r)]
+
+
+def _floats(value):
+    return [float(v) for v in value.split(',')]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("corpus_dir")
+    parser.add_argument("golden")
+    parser.add_argument("--chunk-tokens", default="128,192,240")
+    parser.add_argument("--top-k", default="3,5,7,15")
+    parser.add_argument("--min-similarity", default="0.2,0.25,0.3")
+    parser.add_argument("--mode", choices=("chat", "app"), default="chat")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--fake-embeddings", action="store_true", help="hashed vectors instead of the real model")
+    parser.add_argument("--query-ms", type=float, default=0.0, help="simulated Pinecone round trip per query")
+    parser.add_argument("--out", default=RESULTS_DIR)
+    args = parser.parse_args()
+
+    docs = load_corpus(args.corpus_dir)
+    golden = load_golden(args.golden)
+    if not docs or not golden:
+        print("❌ Need a non-empty corpus and golden set")
+        return
+    chunk_sizes = [int(v) for v in args.chunk_tokens.split(',')]
+    top_ks = [int(v) for v in args.top_k.split(',')]
+    cutoffs = _floats(args.min_similarity)
+    print(f"🧪 {len(docs)} pages, {len(golden)} questions, "
+          f"{len(chunk_sizes) * len(top_ks) * len(cutoffs)} settings ({args.mode} mode)")
+
+    jobs = [(docs, golden, size, top_ks, cutoffs, args.mode, args.fake_embeddings, args.query_ms)
+            for size in chunk_sizes]
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=max(1, min(args.workers, len(jobs)))) as pool:
+        rows = [row for result in pool.map(evaluate_chunk_size, jobs) for row in result]
+    print(f"⏱️ Evaluated in {time.perf_counter() - started:.1f}s\n")
+
+    front = pareto_front(rows)
+    print(f"{'':2}{'chunk':>6}{'top_k':>6}{'cutoff':>7}{'recall@k':>9}{'MRR':>7}{'tokens':>8}{'p50 ms':>8}{'p95 ms':>8}")
+    for r in sorted(rows, key=lambda r: (-r['recall'], -r['mrr'], r['prompt_tokens'])):
+        mark = '★' if r in front else ''
+        print(f"{mark:2}{r['chunk_tokens']:>6}{r['top_k']:>6}{r['min_similarity']:>7.2f}{r['recall']:>9.3f}"
+              f"{r['mrr']:>7.3f}{r['prompt_tokens']:>8.0f}{r['latency_p50_ms']:>8.1f}{r['latency_p95_ms']:>8.1f}")
+    print(f"\n★ = Pareto front ({len(front)} of {len(rows)} settings)")
+
+    os.makedirs(args.out, exist_ok=True)
+    path = os.path.join(args.out, f"eval-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'timestamp': datetime.now().isoformat(), 'params': vars(args),
+                   'results': rows, 'pareto_front': front}, f, indent=2)
+    print(f"💾 Results written to {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+"""
+Local stand-ins for Pinecone, the embedding model and Gemini, with
+configurable latencies, so the RAG service can be benchmarked offline and
+runs stay comparable over time.
+
+FakeEmbeddings produce deterministic hashed bag-of-words vectors (similar
+texts get similar vectors), FakeIndex does exact cosine search in memory,
+and FakeLLMClient is the real LLMClient (limits, stats) over a fake model.
+"""
+
+import hashlib
+import math
+import os
+import re
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from llm_client import DEFAULT_MODEL, LLMClient  # noqa: E402
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+DIMENSION = 384
+_WORD = re.compile(r"\w+")
+
+
+def _sleep_ms(ms):
+    if ms > 0:
+        time.sleep(ms / 1000)
+
+
+class FakeEmbeddings:
+    """embed_query / embed_documents with per-call and per-text latency"""
+
+    def __init__(self, call_ms: float = 5.0, per_text_ms: float = 0.5, dimension: int = DIMENSION):
+        self.call_ms = call_ms
+        self.per_text_ms = per_text_ms
+        self.dimension = dimension
+
+    def _vector(self, text):
+        vec = [0.0] * self.dimension
+        for word in _WORD.findall(text.lower()):
+            h = int.from_bytes(hashlib.blake2b(word.encode(), digest_size=4).digest(), 'little')
+            vec[h % self.dimension] += 1.0 if h & 1 << 31 else -1.0
+        norm = math.sqrt(sum(v * v for v in vec)) or 1.0
+        return [v / norm for v in vec]
+
+    def embed_query(self, text):
+        _sleep_ms(self.call_ms + self.per_text_ms)
+        return self._vector(text)
+
+    def embed_documents(self, texts):
+        _sleep_ms(self.call_ms + self.per_text_ms * len(texts))
+        return [self._vector(t) for t in texts]
+
+
+class FakeIndex:
+    """In-memory Pinecone index: exact cosine top-k with namespaces and metadata"""
+
+    def __init__(self, query_ms: float = 30.0, upsert_ms: float = 20.0):
+        self.query_ms = query_ms
+        self.upsert_ms = upsert_ms
+        self._namespaces = {}  # namespace -> {id: (values, metadata)}
+        self._lock = threading.Lock()
+
+    def upsert(self, vectors, namespace: str = ""):
+        _sleep_ms(self.upsert_ms)
+        with self._lock:
+            store = self._namespaces.setdefault(namespace, {})
+            for v in vectors:
+                store[v["id"]] = (v["values"], v.get("metadata", {}))
+        return {"upserted_count": len(vectors)}
+
+    def query(self, vector, top_k=10, include_metadata=False, namespace: str = "", filter=None, **_):
+        _sleep_ms(self.query_ms)
+        with self._lock:
+            items = list(self._namespaces.get(namespace, {}).items())
+        if filter:
+            items = [(i, (v, m)) for i, (v, m) in items if _matches_filter(m, filter)]
+        if not items:
+            return {"matches": [], "namespace": namespace}
+        if np is not None:
+            scores = np.asarray([v for _, (v, _) in items]) @ np.asarray(vector)
+            scores = scores.tolist()
+        else:
+            scores = [sum(a * b for a, b in zip(v, vector)) for _, (v, _) in items]
+        ranked = sorted(zip(scores, items), key=lambda x: x[0], reverse=True)[:top_k]
+        return {"namespace": namespace, "matches": [
+            {"id": i, "score": s, **({"metadata": m} if include_metadata else {})}
+            for s, (i, (_, m)) in ranked
+        ]}
+
+    def fetch(self, ids, namespace: str = ""):
+        with self._lock:
+            store = self._namespaces.get(namespace, {})
+            return {"vectors": {i: {"id": i, "values": store[i][0], "metadata": store[i][1]}
+                                for i in ids if i in store}}
+
+    def list(self, prefix: str = "", namespace: str = "", limit: int = 100):
+        """IDs starting with `prefix`, in pages of `limit` (serverless list())"""
+        with self._lock:
+            ids = sorted(i for i in self._namespaces.get(namespace, {}) if i.startswith(prefix))
+        for i in range(0, len(ids), limit):
+            yield ids[i:i + limit]
+
+    def delete(self, ids=None, delete_all=False, namespace: str = "", filter=None):
+        with self._lock:
+            store = self._namespaces.setdefault(namespace, {})
+            if delete_all:
+                store.clear()
+            for i in ids or []:
+                store.pop(i, None)
+            if filter:
+                for i in [i for i, (_, m) in store.items() if _matches_filter(m, filter)]:
+                    del store[i]
+        return {}
+
+    def describe_index_stats(self, **_):
+        with self._lock:
+            counts = {ns: len(store) for ns, store in self._namespaces.items()}
+        return {
+            "dimension": DIMENSION,
+            "total_vector_count": sum(counts.values()),
+            "namespaces": {ns: {"vector_count": c} for ns, c in counts.items()},
+        }
+
+
+def _matches_filter(metadata, flt):
+    """Subset of Pinecone's filter language: equality, $eq, $ne, $in, $exists"""
+    for key, cond in flt.items():
+        value = metadata.get(key)
+        if not isinstance(cond, dict):
+            cond = {"$eq": cond}
+        for op, arg in cond.items():
+            if op == "$eq" and value != arg:
+                return False
+            if op == "$ne" and value == arg:
+                return False
+            if op == "$in" and value not in arg:
+                return False
+            if op == "$exists" and (key in metadata) != arg:
+                return False
+    return True
+
+
+class _FakeUsage:
+    def __init__(self, prompt_tokens, output_tokens):
+        self.prompt_token_count = prompt_tokens
+        self.candidates_token_count = output_tokens
+
+
+class _FakeResponse:
+    def __init__(self, text, prompt_chars):
+        self.text = text
+        self.usage_metadata = _FakeUsage(prompt_chars // 4, len(text) // 4)
+
+
+class FakeGeminiModel:
+    """generate_content with fixed latency and a canned markdown-ish answer"""
+
+    ANSWER = ("**Yes**, you can afford it. Based on your balance, keep *three months* of "
+              "expenses aside first.\n\n- Start a SIP\n- Review spending monthly\n\nI hope this helps!")
+
+    def __init__(self, latency_ms: float):
+        self.latency_ms = latency_ms
+
+    def generate_content(self, contents, request_options=None, **_):
+        _sleep_ms(self.latency_ms)
+        prompt_chars = sum(len(c) for c in contents if isinstance(c, str)) if isinstance(contents, list) \
+            else len(contents)
+        return _FakeResponse(self.ANSWER, prompt_chars)
+
+
+class FakeLLMClient(LLMClient):
+    """The real LLMClient (concurrency limit, stats) over FakeGeminiModel"""
+
+    def __init__(self, latency_ms: float = 800.0, **kwargs):
+        super().__init__(**kwargs)
+        self._api_key = 'fake'
+        self._fake_model = FakeGeminiModel(latency_ms)
+
+    def model(self, name: str = DEFAULT_MODEL):
+        return self._fake_model
@@ -0,0 +1,150 @@
+"""
+Result cache for bill extraction, scoped per user and keyed on an exact
+content hash: only byte-identical uploads reuse a stored extraction.
+
+A perceptual (difference) hash additionally recognises re-photographed
+receipts, but only to warn the app before an expense is logged twice - two
+similar-looking bills are still extracted separately. Pillow is optional:
+without it only exact duplicates are detected.
+"""
+
+import hashlib
+import io
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+try:
+    from PIL import Image
+except ImportError:  # exact-hash matching still works
+    Image = None
+
+BILL_CACHE_SIZE = int(os.getenv("BILL_CACHE_SIZE", "512"))
+# Max differing bits (out of 256) for two photos to count as the same receipt
+BILL_PHASH_MAX_DISTANCE = int(os.getenv("BILL_PHASH_MAX_DISTANCE", "20"))
+
+_HASH_SIZE = 16
+
+
+def perceptual_hash(image_bytes: bytes):
+    """256-bit difference hash of the image, or None if it cannot be decoded"""
+    if Image is None:
+        return None
+    try:
+        with Image.open(io.BytesIO(image_bytes)) as img:
+            # Let the JPEG decoder downscale while decoding (much cheaper on 12 MP photos)
+            img.draft('L', (_HASH_SIZE * 8, _HASH_SIZE * 8))
+            small = img.convert('L').resize((_HASH_SIZE + 1, _HASH_SIZE))
+            pixels = list(small.getdata())
+    except Exception:
+        return None
+    bits = 0
+    for row in range(_HASH_SIZE):
+        offset = row * (_HASH_SIZE + 1)
+        for col in range(_HASH_SIZE):
+            bits = (bits << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return bits
+
+
+class Fingerprint:
+    """Exact + perceptual identity of one image uploaded by one user (or client)"""
+
+    __slots__ = ('owner', 'digest', 'phash')
+
+    def __init__(self, image_bytes: bytes, owner=None):
+        self.owner = owner
+        self.digest = hashlib.sha256(image_bytes).hexdigest()
+        self.phash = perceptual_hash(image_bytes)
+
+    @property
+    def key(self):
+        return (self.owner, self.digest)
+
+
+class BillResultCache:
+    """
+    Bounded LRU of successful extractions, keyed by (owner, content hash).
+    Exact lookups are O(1); duplicate detection scans the owner's entries in
+    the (small, bounded) set of stored perceptual hashes.
+    """
+
+    def __init__(self, max_size: int = BILL_CACHE_SIZE, max_distance: int = BILL_PHASH_MAX_DISTANCE):
+        self.max_size = max_size
+        self.max_distance = max_distance
+        self._entries = OrderedDict()  # (owner, digest) -> entry dict
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, fingerprint: Fingerprint):
+        """
+        Returns (result, duplicate_info) if this owner uploaded the identical
+        image before, else None. duplicate_info says when it was first seen.
+        """
+        with self._lock:
+            entry = self._entries.get(fingerprint.key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self._entries.move_to_end(fingerprint.key)
+            entry['times_seen'] += 1
+            return entry['result'], self._duplicate_info(entry, 'exact', 0)
+
+    def find_duplicate(self, fingerprint: Fingerprint):
+        """
+        duplicate_info for a perceptually similar image from the same owner
+        (e.g. a retake of a receipt already scanned), else None. Never returns
+        the stored extraction: the caller still extracts this image itself.
+        """
+        if fingerprint.phash is None:
+            return None
+        with self._lock:
+            entry, distance = self._nearest(fingerprint.owner, fingerprint.phash)
+            if entry is None:
+                return None
+            return self._duplicate_info(entry, 'perceptual', distance)
+
+    @staticmethod
+    def _duplicate_info(entry, match, distance):
+        return {
+            'match': match,
+            'distance': distance,
+            'first_seen': entry['first_seen'],
+            'times_seen': entry['times_seen'],
+        }
+
+    def _nearest(self, owner, phash: int):
+        best, best_distance = None, self.max_distance + 1
+        for entry in self._entries.values():
+            if entry['owner'] != owner or entry['phash'] is None:
+                continue
+            distance = bin(entry['phash'] ^ phash).count('1')
+            if distance < best_distance:
+                best, best_distance = entry, distance
+        return (best, best_distance) if best is not None else (None, None)
+
+    def put(self, fingerprint: Fingerprint, result: dict):
+        with self._lock:
+            self._entries[fingerprint.key] = {
+                'owner': fingerprint.owner,
+                'phash': fingerprint.phash,
+                'result': result,
+                'first_seen': datetime.now().isoformat(),
+                'times_seen': 1,
+            }
+            self._entries.move_to_end(fingerprint.key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 3) if lookups else 0.0,
+            }
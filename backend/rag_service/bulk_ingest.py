@@ -0,0 +1,258 @@
+"""
+Bulk ingestion of whole directories straight into Pinecone, bypassing HTTP.
+
+Usage:
+    python bulk_ingest.py PATH_OR_GLOB [...] [--workers N] [--user-id ID]
+                          [--state bulk_ingest.state.json] [--retry-failed]
+
+Directories are walked recursively for supported files (.pdf, .docx, .doc);
+globs are expanded. Files are loaded, chunked, embedded and upserted by a
+pool of worker processes, each holding its own embedding model and Pinecone
+client, so parsing and embedding run on every core instead of one. Source
+names are paths relative to the directory given, or to a glob's fixed leading
+directory (so reports/2023/q1.pdf and reports/2024/q1.pdf stay distinct);
+files named directly use their basename. Two files that would still get the
+same source name (e.g. from two directory arguments) are refused up front.
+
+Progress is checkpointed to the --state file after every file, written
+atomically, so a crash or Ctrl-C resumes where it stopped: files recorded as
+done with unchanged size and mtime are skipped without being opened. Files
+whose text is already indexed with the serving model and chunk size (per the
+local catalog) are skipped after hashing, before any embedding. Failed files
+are retried only with --retry-failed. Aggregate throughput and failures are
+printed at the end.
+"""
+
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+
+from dotenv import load_dotenv
+
+load_dotenv(override=True)
+
+from catalog import SERVING_ALIAS, DocumentCatalog, content_hash  # noqa: E402
+from chunker import CHUNK_TOKENS, EMBEDDING_MODEL, chunk_documents, load_tokenizer  # noqa: E402
+from index_layout import (delete_ids, delete_legacy_vectors, document_id, document_vectors, get_manifest,  # noqa: E402
+                          stale_ids, user_namespace)
+from loaders import SUPPORTED_EXTENSIONS, file_extension, load_document_from_path  # noqa: E402
+from text_normalize import normalize_documents  # noqa: E402
+
+PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
+PINECONE_INDEX_NAME = os.getenv("PINECONE_INDEX_NAME", "rag1")
+DEFAULT_STATE_PATH = "bulk_ingest.state.json"
+UPSERT_BATCH_SIZE = 100
+
+# Per-process clients, set up once by _init_worker
+_worker = {}
+
+
+def glob_base(pattern: str) -> str:
+    """Leading directory of a glob pattern without wildcards ("docs/*/q?.pdf" -> "docs")"""
+    parts = []
+    for part in os.path.dirname(pattern).replace(os.sep, '/').split('/'):
+        if glob.has_magic(part):
+            break
+        parts.append(part)
+    return '/'.join(parts) or '.'
+
+
+def discover(patterns):
+    """(path, source name) for every supported file under the given dirs/globs/files, deduplicated"""
+    found = {}
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            for root, _, names in os.walk(pattern):
+                for name in sorted(names):
+                    path = os.path.join(root, name)
+                    found.setdefault(os.path.abspath(path), os.path.relpath(path, pattern).replace(os.sep, '/'))
+        else:
+            base = glob_base(pattern)
+            for path in sorted(glob.glob(pattern, recursive=True)) or [pattern]:
+                if os.path.isfile(path):
+                    found.setdefault(os.path.abspath(path), os.path.relpath(path, base).replace(os.sep, '/'))
+    return [(path, source) for path, source in found.items() if file_extension(path) in SUPPORTED_EXTENSIONS]
+
+
+def duplicate_sources(files):
+    """{source name: [paths]} for names claimed by more than one file"""
+    paths = {}
+    for path, source in files:
+        paths.setdefault(source, []).append(path)
+    return {source: group for source, group in paths.items() if len(group) > 1}
+
+
+def _init_worker(torch_threads: int):
+    from langchain_community.embeddings import HuggingFaceEmbeddings
+    from pinecone import Pinecone
+
+    try:
+        import torch
+        torch.set_num_threads(torch_threads)  # N processes x all cores would oversubscribe the CPU
+    except ImportError:
+        pass
+    catalog = DocumentCatalog()
+    serving = catalog.resolve_alias(SERVING_ALIAS)
+    model = serving['embedding_model'] if serving else EMBEDDING_MODEL
+    target = serving['target'] if serving else PINECONE_INDEX_NAME
+    _worker.update(
+        catalog=catalog,
+        target=target,
+        model=model,
+        chunk_tokens=serving['chunk_tokens'] if serving else CHUNK_TOKENS,
+        index=Pinecone(api_key=PINECONE_API_KEY).Index(target),
+        embeddings=HuggingFaceEmbeddings(model_name=model, model_kwargs={"device": "cpu"},
+                                         encode_kwargs={"normalize_embeddings": True}),
+    )
+
+
+def ingest_file(path: str, source: str, user_id=None) -> dict:
+    """Runs in a worker process: one file end to end. Returns a result record."""
+    started = time.perf_counter()
+    catalog, index, model, chunk_tokens = (_worker[k] for k in ('catalog', 'index', 'model', 'chunk_tokens'))
+    namespace = user_namespace(user_id)
+    try:
+        docs = normalize_documents(load_document_from_path(path, source))
+        size = sum(len(doc.page_content.encode('utf-8')) for doc in docs)
+        digest = content_hash(docs)
+        if catalog.is_current(source, digest, namespace, chunk_tokens, model):
+            return {'status': 'indexed', 'chunks': catalog.get(source, namespace)['chunk_count'], 'bytes': size,
+                    'seconds': time.perf_counter() - started}
+
+        chunks = chunk_documents(docs, tokenizer=load_tokenizer(model), max_tokens=chunk_tokens)
+        if not chunks:
+            return {'status': 'failed', 'error': 'no text found', 'seconds': time.perf_counter() - started}
+        values = _worker['embeddings'].embed_documents([doc.page_content for doc in chunks])
+        extra = {"uploaded_at": datetime.now().isoformat()}
+        if user_id:
+            extra["user_id"] = str(user_id)
+        vectors = document_vectors(source, chunks, values, **extra)
+
+        with catalog.ingesting(source, document_id(source), digest, len(vectors), size, namespace,
+                               model, chunk_tokens) as previous:
+            # Raises (failing the file) if migrate_index.py switched the alias since this worker started
+            catalog.check_alias(_worker['target'], model)
+            if previous is None:
+                previous = get_manifest(index, source, namespace)
+                delete_legacy_vectors(index, source, user_id)
+            for i in range(0, len(vectors), UPSERT_BATCH_SIZE):
+                index.upsert(vectors=vectors[i:i + UPSERT_BATCH_SIZE], namespace=namespace)
+            leftover = stale_ids(previous, len(vectors))
+            if leftover:
+                delete_ids(index, leftover, namespace)
+        return {'status': 'done', 'chunks': len(vectors), 'bytes': size, 'seconds': time.perf_counter() - started}
+    except Exception as e:
+        return {'status': 'failed', 'error': f"{type(e).__name__}: {e}", 'seconds': time.perf_counter() - started}
+
+
+class Checkpoint:
+    """JSON map of absolute path -> last result and namespace, rewritten atomically after every file"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.entries = {}
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                self.entries = json.load(f)
+
+    @staticmethod
+    def _signature(path):
+        stat = os.stat(path)
+        return {'size': stat.st_size, 'mtime': stat.st_mtime}
+
+    def finished(self, path: str, namespace: str, retry_failed: bool) -> bool:
+        entry = self.entries.get(path)
+        if entry is None or entry['namespace'] != namespace or (entry['status'] == 'failed' and retry_failed):
+            return False
+        return {'size': entry['size'], 'mtime': entry['mtime']} == self._signature(path)
+
+    def record(self, path: str, source: str, namespace: str, result: dict):
+        self.entries[path] = {'source': source, 'namespace': namespace, **self._signature(path), **result}
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self.entries, f, indent=1)
+        os.replace(tmp, self.path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("paths", nargs="+", help="directories, globs or files")
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) // 2))
+    parser.add_argument("--user-id", help="ingest into this user's namespace instead of the global one")
+    parser.add_argument("--state", default=DEFAULT_STATE_PATH, help="checkpoint file")
+    parser.add_argument("--retry-failed", action="store_true", help="retry files that failed last time")
+    args = parser.parse_args()
+
+    files = discover(args.paths)
+    duplicates = duplicate_sources(files)
+    if duplicates:
+        # Same source name = same catalog row and vector IDs: one would overwrite the other
+        for source, paths in duplicates.items():
+            print(f"❌ {source}: {', '.join(paths)}")
+        parser.error("several files map to the same source name; pass their common parent directory instead")
+    checkpoint = Checkpoint(args.state)
+    namespace = user_namespace(args.user_id)
+    todo = [(path, source) for path, source in files if not checkpoint.finished(path, namespace, args.retry_failed)]
+    print("=" * 60)
+    print(f"📚 Bulk ingest: {len(files)} files found, {len(files) - len(todo)} already done per {args.state}")
+    print("=" * 60)
+    if not todo:
+        return
+
+    totals = {'done': 0, 'indexed': 0, 'failed': 0}
+    chunks = size = 0
+    failures = []
+    pool_broken = False
+    started = time.perf_counter()
+    torch_threads = max(1, (os.cpu_count() or 1) // args.workers)
+    try:
+        with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker,
+                                 initargs=(torch_threads,)) as pool:
+            futures = {pool.submit(ingest_file, path, source, args.user_id): (path, source) for path, source in todo}
+            for n, future in enumerate(as_completed(futures), 1):
+                path, source = futures[future]
+                try:
+                    result = future.result()
+                except BrokenProcessPool as e:
+                    # A worker died (or _init_worker failed, e.g. no Pinecone/model): every pending file
+                    # fails, but through no fault of its own, so leave it unrecorded for a plain re-run
+                    result = {'status': 'failed', 'error': f"worker pool broke: {e}", 'seconds': 0.0}
+                    pool_broken = True
+                else:
+                    checkpoint.record(path, source, namespace, result)
+                totals[result['status']] += 1
+                if result['status'] == 'failed':
+                    failures.append((source, result['error']))
+                    print(f"  [{n}/{len(todo)}] ❌ {source}: {result['error']}")
+                    continue
+                chunks += result['chunks'] if result['status'] == 'done' else 0
+                size += result['bytes'] if result['status'] == 'done' else 0
+                mark = "✅" if result['status'] == 'done' else "⏭️"
+                print(f"  [{n}/{len(todo)}] {mark} {source}: {result['chunks']} chunks ({result['seconds']:.1f}s)")
+    except KeyboardInterrupt:
+        print(f"\n⏸️ Interrupted; progress is saved in {args.state}, re-run to resume")
+        sys.exit(130)
+
+    elapsed = time.perf_counter() - started
+    print("\n" + "=" * 60)
+    print(f"📊 {totals['done']} ingested, {totals['indexed']} unchanged, {totals['failed']} failed in {elapsed:.1f}s")
+    print(f"   {len(todo) / elapsed:.2f} files/s, {chunks / elapsed:.1f} chunks/s, "
+          f"{size / elapsed / 1e6:.2f} MB/s of text ({args.workers} workers)")
+    for source, error in failures:
+        print(f"   ❌ {source}: {error}")
+    if pool_broken:
+        print("   The worker pool broke; re-run to resume (files it did not finish are retried)")
+    elif failures:
+        print("   Re-run with --retry-failed to retry them")
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
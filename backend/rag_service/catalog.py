@@ -0,0 +1,203 @@
+"""
+Local SQLite catalog of what is in the Pinecone index.
+
+One row per (namespace, source): doc_id, content hash, chunk count, UTF-8
+bytes, embedding model, chunk size and ingest time. Ingestion writes the row
+as 'pending' before the first upsert and flips it to 'ready' after the last
+one; deletion marks it 'deleting' before removing vectors and drops it after.
+A crash mid-way therefore leaves a row that is not 'ready', whose chunk_count
+still covers every vector ID that may exist, so the next ingest or delete
+cleans up exactly. /stats, the startup auto-ingest check and check_index.py
+answer from here without touching the index.
+
+The aliases table maps a logical name ("serving") to the Pinecone index and
+embedding setup readers should use. migrate_index.py re-embeds into a shadow
+index and then repoints the alias and rewrites the document rows in one
+transaction, which the RAG service picks up without a restart. The switch only
+commits while every row is 'ready', so a writer that re-checks the alias
+inside ingesting()/removing() (check_alias) can't be left on the old index.
+
+The database is a single file (CATALOG_PATH) in WAL mode so the RAG service,
+the Streamlit app and CLIs on the same host can share it.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+from chunker import CHUNK_TOKENS, EMBEDDING_MODEL
+
+CATALOG_PATH = os.getenv("CATALOG_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "catalog.db"))
+
+READY, PENDING, DELETING = 'ready', 'pending', 'deleting'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    namespace       TEXT    NOT NULL,
+    source          TEXT    NOT NULL,
+    doc_id          TEXT    NOT NULL,
+    content_hash    TEXT    NOT NULL,
+    chunk_count     INTEGER NOT NULL,
+    bytes           INTEGER NOT NULL,
+    embedding_model TEXT    NOT NULL,
+    chunk_tokens    INTEGER NOT NULL,
+    ingested_at     TEXT    NOT NULL,
+    status          TEXT    NOT NULL,
+    PRIMARY KEY (namespace, source)
+);
+CREATE TABLE IF NOT EXISTS aliases (
+    alias           TEXT    PRIMARY KEY,
+    target          TEXT    NOT NULL,
+    embedding_model TEXT    NOT NULL,
+    chunk_tokens    INTEGER NOT NULL,
+    updated_at      TEXT    NOT NULL
+);
+"""
+
+SERVING_ALIAS = 'serving'
+
+
+class AliasConflictError(RuntimeError):
+    """A document changed while it was being migrated; nothing was switched"""
+
+
+class AliasMovedError(RuntimeError):
+    """The serving alias was repointed after a writer resolved it; re-resolve and retry"""
+
+
+def content_hash(docs) -> str:
+    """SHA-256 of the documents' normalized text, page by page"""
+    digest = hashlib.sha256()
+    for doc in docs:
+        digest.update(doc.page_content.encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+class DocumentCatalog:
+    def __init__(self, path: str = CATALOG_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=10, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        if path != ':memory:':
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+
+    def _execute(self, sql, params=()):
+        with self._lock, self._conn:
+            return self._conn.execute(sql, params).fetchall()
+
+    def get(self, source: str, namespace: str = "", ready_only: bool = True):
+        """The document's row as a dict, or None (also for unfinished rows unless ready_only=False)"""
+        rows = self._execute("SELECT * FROM documents WHERE namespace = ? AND source = ?", (namespace, source))
+        if not rows or (ready_only and rows[0]['status'] != READY):
+            return None
+        return dict(rows[0])
+
+    def is_current(self, source: str, digest: str, namespace: str = "", chunk_tokens: int = CHUNK_TOKENS,
+                   embedding_model: str = EMBEDDING_MODEL) -> bool:
+        """True if `source` is indexed from identical content with the given model and chunk size"""
+        row = self.get(source, namespace)
+        return (row is not None and row['content_hash'] == digest
+                and row['embedding_model'] == embedding_model and row['chunk_tokens'] == chunk_tokens)
+
+    def documents(self, namespace=None, status: str = READY):
+        if namespace is None:
+            rows = self._execute("SELECT * FROM documents WHERE status = ? ORDER BY namespace, source", (status,))
+        else:
+            rows = self._execute("SELECT * FROM documents WHERE status = ? AND namespace = ? ORDER BY source",
+                                 (status, namespace))
+        return [dict(row) for row in rows]
+
+    @contextmanager
+    def ingesting(self, source: str, doc_id: str, digest: str, chunk_count: int, size: int,
+                  namespace: str = "", embedding_model: str = EMBEDDING_MODEL, chunk_tokens: int = CHUNK_TOKENS):
+        """
+        Wrap the upserts of one document. Yields the previous row (any status)
+        or None; the row becomes 'ready' with the new counts only if the block
+        completes.
+        """
+        previous = self.get(source, namespace, ready_only=False)
+        # While pending, chunk_count is an upper bound on the IDs that may exist
+        upper = max(chunk_count, previous['chunk_count'] if previous else 0)
+        now = datetime.now().isoformat()
+        self._execute("INSERT OR REPLACE INTO documents VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                      (namespace, source, doc_id, digest, upper, size, embedding_model, chunk_tokens, now, PENDING))
+        yield previous
+        self._execute("UPDATE documents SET chunk_count = ?, status = ? WHERE namespace = ? AND source = ?",
+                      (chunk_count, READY, namespace, source))
+
+    @contextmanager
+    def removing(self, source: str, namespace: str = ""):
+        """Wrap the deletion of one document's vectors; yields its row (any status) or None"""
+        row = self.get(source, namespace, ready_only=False)
+        if row is not None:
+            self._execute("UPDATE documents SET status = ? WHERE namespace = ? AND source = ?",
+                          (DELETING, namespace, source))
+        yield row
+        self._execute("DELETE FROM documents WHERE namespace = ? AND source = ?", (namespace, source))
+
+    def clear(self, namespace: str = "") -> int:
+        """Forget every document in a namespace (after its vectors were wiped)"""
+        with self._lock, self._conn:
+            return self._conn.execute("DELETE FROM documents WHERE namespace = ?", (namespace,)).rowcount
+
+    def resolve_alias(self, alias: str = SERVING_ALIAS):
+        """{'target', 'embedding_model', 'chunk_tokens', ...} for an alias, or None if never switched"""
+        rows = self._execute("SELECT * FROM aliases WHERE alias = ?", (alias,))
+        return dict(rows[0]) if rows else None
+
+    def check_alias(self, target: str, embedding_model: str, alias: str = SERVING_ALIAS):
+        """
+        Raise AliasMovedError unless `alias` still points at `target` with
+        `embedding_model` (an alias never switched counts as pointing there).
+        Call inside ingesting()/removing(): their unfinished row keeps
+        switch_alias() from committing until the block ends.
+        """
+        current = self.resolve_alias(alias)
+        if current is not None and (current['target'], current['embedding_model']) != (target, embedding_model):
+            raise AliasMovedError(f"'{alias}' now points at {current['target']} ({current['embedding_model']})")
+
+    def switch_alias(self, target: str, embedding_model: str, chunk_tokens: int, migrated,
+                     alias: str = SERVING_ALIAS):
+        """
+        Atomically repoint `alias` at `target` and record the migrated documents.
+        `migrated` holds the document rows as read before migrating, each with
+        its new chunk_count; if any row changed since, nothing is switched.
+        """
+        now = datetime.now().isoformat()
+        with self._lock, self._conn:
+            for row in migrated:
+                updated = self._conn.execute(
+                    "UPDATE documents SET chunk_count = ?, embedding_model = ?, chunk_tokens = ?, ingested_at = ? "
+                    "WHERE namespace = ? AND source = ? AND content_hash = ? AND ingested_at = ? AND status = ?",
+                    (row['chunk_count'], embedding_model, chunk_tokens, now,
+                     row['namespace'], row['source'], row['content_hash'], row['ingested_at'], READY)).rowcount
+                if not updated:
+                    # Raising inside the `with self._conn` block rolls the transaction back
+                    raise AliasConflictError(f"{row['namespace'] or '(global)'}/{row['source']} changed during migration")
+            total = self._conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+            if total != len(migrated):
+                raise AliasConflictError(f"{total - len(migrated)} documents were added or are mid-ingest")
+            self._conn.execute("INSERT OR REPLACE INTO aliases VALUES (?, ?, ?, ?, ?)",
+                               (alias, target, embedding_model, chunk_tokens, now))
+
+    def stats(self) -> dict:
+        rows = self._execute(
+            "SELECT namespace, COUNT(*) AS documents, SUM(chunk_count) AS chunks, SUM(bytes) AS bytes "
+            "FROM documents WHERE status = ? GROUP BY namespace", (READY,))
+        models = self._execute("SELECT DISTINCT embedding_model FROM documents WHERE status = ?", (READY,))
+        unfinished = self._execute("SELECT COUNT(*) AS n FROM documents WHERE status != ?", (READY,))[0]['n']
+        return {
+            'documents': sum(row['documents'] for row in rows),
+            'chunks': sum(row['chunks'] for row in rows),
+            'bytes': sum(row['bytes'] for row in rows),
+            'namespaces': {row['namespace']: {'documents': row['documents'], 'chunks': row['chunks']}
+                           for row in rows},
+            'embedding_models': [row['embedding_model'] for row in models],
+            'unfinished': unfinished,
+        }
@@ -1,30 +1,42 @@
 import os
 from dotenv import load_dotenv
 from pinecone import Pinecone
+from index_layout import get_manifest
+from catalog import SERVING_ALIAS, DocumentCatalog
 
 load_dotenv(override=True)
 api_key = os.getenv("PINECONE_API_KEY")
 index_name = os.getenv("PINECONE_INDEX_NAME", "rag1")
 
+catalog = DocumentCatalog()
+serving = catalog.resolve_alias(SERVING_ALIAS)
+if serving:
+    print(f"🔀 Serving alias -> {serving['target']} ({serving['embedding_model']})")
+    index_name = serving['target']
+
 pc = Pinecone(api_key=api_key)
 index = pc.Index(index_name)
 
 print(f"Checking for 'context.pdf' in {index_name}...")
 
-# Query specifically for source: context.pdf
-results = index.query(
-    vector=[0.1]*384, # Small non-zero vector to avoid potential issues with all-zeros
-    filter={"source": {"$eq": "context.pdf"}},
-    top_k=5,
-    include_metadata=True
-)
-
-if results.get('matches'):
-    print(f"✅ Found {len(results['matches'])} chunks from 'context.pdf'")
-    for m in results['matches']:
-        print(f"  - Chunk ID: {m['id']}, Preview: {m['metadata'].get('text', '')[:50]}...")
+# The local catalog answers without touching the index
+entry = catalog.get("context.pdf")
+if entry:
+    print(f"✅ Catalog: 'context.pdf' has {entry['chunk_count']} chunks ({entry['bytes']} bytes), "
+          f"embedded with {entry['embedding_model']} at {entry['ingested_at']}")
+else:
+    print("ℹ️ 'context.pdf' is not in the local catalog")
+
+# One fetch of the manifest chunk (ID "context.pdf#0") confirms what the index itself holds
+manifest = get_manifest(index, "context.pdf")
+
+if manifest:
+    print(f"✅ 'context.pdf' is indexed: {manifest.get('chunk_count')} chunks, uploaded {manifest.get('uploaded_at')}")
+    print(f"  - Preview: {manifest.get('text', '')[:50]}...")
 else:
-    print("❌ 'context.pdf' is NOT in the index.")
+    print("❌ 'context.pdf' is NOT in the index (or was ingested before the per-document ID layout).")
 
 stats = index.describe_index_stats()
 print(f"Total Vectors in Index: {stats.get('total_vector_count', 0)}")
+for namespace, ns_stats in (stats.get('namespaces') or {}).items():
+    print(f"  - Namespace {namespace or '(global)'}: {ns_stats.get('vector_count', 0)} vectors")
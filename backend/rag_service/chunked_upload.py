@@ -0,0 +1,240 @@
+"""
+Resumable chunked uploads: init -> PUT parts (any order, in parallel) -> complete.
+
+Each upload is a staging directory holding upload.json (filename, size, part
+size, user, state) and one file per received part. Parts are streamed to disk
+in small blocks while their SHA-256 is computed, written under a temporary
+name and renamed into place only when the checksum matches, so a part on disk
+is always complete and verified; re-sending a part simply replaces it. A
+dropped connection costs at most the parts in flight: the client asks for the
+status and sends only what is missing. Because all state is on disk, uploads
+survive a server restart. Uploads idle for UPLOAD_TTL_SECONDS expire,
+whatever their state.
+
+complete() joins the parts into one file (streamed copy, optionally checked
+against the whole-file SHA-256 the client declared at init; on a mismatch all
+parts are dropped and must be re-sent) and hands it to the ingestion callback;
+status moves uploading -> assembling -> ingesting -> done / failed. Uploads
+found ingesting at startup (interrupted()) are resumed from their assembled
+file, or failed if it is gone; ones caught assembling go back to uploading.
+"""
+
+import hashlib
+import json
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+
+UPLOAD_PART_SIZE = int(os.getenv("UPLOAD_PART_SIZE", str(8 * 1024 * 1024)))
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(1024 * 1024 * 1024)))
+UPLOAD_TTL_SECONDS = float(os.getenv("UPLOAD_TTL_SECONDS", "86400"))
+
+STREAM_BLOCK_SIZE = 256 * 1024
+MIN_PART_SIZE = 256 * 1024
+
+UPLOADING, ASSEMBLING, INGESTING, DONE, FAILED = 'uploading', 'assembling', 'ingesting', 'done', 'failed'
+
+_UPLOAD_ID = re.compile(r'^[0-9a-f]{32}$')
+
+
+class UploadError(Exception):
+    """Client-side problem with an upload request; carries the HTTP status to answer with"""
+
+    def __init__(self, message: str, status: int = 400):
+        super().__init__(message)
+        self.status = status
+
+
+class ChunkedUploadStore:
+    def __init__(self, root: str, part_size: int = UPLOAD_PART_SIZE, max_bytes: int = UPLOAD_MAX_BYTES,
+                 ttl: float = UPLOAD_TTL_SECONDS):
+        self.root = root
+        self.part_size = part_size
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._lock = threading.Lock()  # guards upload.json read-modify-write (never held for file copies)
+        os.makedirs(root, exist_ok=True)
+
+    def _dir(self, upload_id: str) -> str:
+        if not _UPLOAD_ID.match(upload_id or ''):
+            raise UploadError("Unknown upload", 404)
+        path = os.path.join(self.root, upload_id)
+        if not os.path.isdir(path):
+            raise UploadError("Unknown upload", 404)
+        return path
+
+    def _read(self, upload_id: str) -> dict:
+        with open(os.path.join(self._dir(upload_id), 'upload.json'), encoding='utf-8') as f:
+            return json.load(f)
+
+    def _write(self, upload_id: str, meta: dict):
+        path = os.path.join(self._dir(upload_id), 'upload.json')
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        os.replace(path + '.tmp', path)
+
+    def _part_path(self, upload_id: str, number: int) -> str:
+        return os.path.join(self._dir(upload_id), f"part-{number:05d}")
+
+    def update(self, upload_id: str, **fields) -> dict:
+        with self._lock:
+            meta = self._read(upload_id)
+            meta.update(fields, updated_at=time.time())
+            self._write(upload_id, meta)
+            return meta
+
+    def init(self, filename: str, size, sha256: str = None, part_size=None, user_id=None) -> dict:
+        """`size` and `part_size` may come straight from request JSON; bad values are a 400"""
+        try:
+            size = int(size or 0)
+            part_size = int(part_size or self.part_size)
+        except (TypeError, ValueError):
+            raise UploadError("size and part_size must be integers")
+        if size <= 0 or size > self.max_bytes:
+            raise UploadError(f"Size must be between 1 and {self.max_bytes} bytes", 413 if size > 0 else 400)
+        part_size = max(MIN_PART_SIZE, min(part_size, self.part_size))
+        upload_id = uuid.uuid4().hex
+        os.makedirs(os.path.join(self.root, upload_id))
+        meta = {
+            'upload_id': upload_id, 'filename': filename, 'size': size, 'sha256': sha256,
+            'part_size': part_size, 'parts': -(-size // part_size), 'user_id': user_id,
+            'state': UPLOADING, 'created_at': time.time(), 'updated_at': time.time(),
+        }
+        self._write(upload_id, meta)
+        return meta
+
+    def expected_part_size(self, meta: dict, number: int) -> int:
+        if number == meta['parts']:
+            return meta['size'] - meta['part_size'] * (meta['parts'] - 1)
+        return meta['part_size']
+
+    def put_part(self, upload_id: str, number: int, stream, sha256: str = None) -> str:
+        """Stream one part to disk; returns its SHA-256. Rejects wrong sizes and checksum mismatches."""
+        meta = self._read(upload_id)
+        if meta['state'] != UPLOADING:
+            raise UploadError(f"Upload is {meta['state']}", 409)
+        if not 1 <= number <= meta['parts']:
+            raise UploadError(f"Part number must be 1..{meta['parts']}")
+        expected = self.expected_part_size(meta, number)
+        final = self._part_path(upload_id, number)
+        tmp = f"{final}.{uuid.uuid4().hex}.tmp"  # concurrent retries of one part don't collide
+        digest = hashlib.sha256()
+        written = 0
+        try:
+            with open(tmp, 'wb') as f:
+                while True:
+                    block = stream.read(STREAM_BLOCK_SIZE)
+                    if not block:
+                        break
+                    written += len(block)
+                    if written > expected:
+                        raise UploadError(f"Part {number} is larger than {expected} bytes")
+                    digest.update(block)
+                    f.write(block)
+            if written != expected:
+                raise UploadError(f"Part {number} has {written} bytes, expected {expected}")
+            if sha256 and digest.hexdigest() != sha256.lower():
+                raise UploadError(f"Checksum mismatch on part {number}", 422)
+            os.replace(tmp, final)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        self.update(upload_id)  # refresh updated_at so active uploads don't expire
+        return digest.hexdigest()
+
+    def received(self, upload_id: str):
+        names = os.listdir(self._dir(upload_id))
+        return sorted(int(name[5:]) for name in names if name.startswith('part-') and name[5:].isdigit())
+
+    def status(self, upload_id: str) -> dict:
+        meta = self._read(upload_id)
+        received = set(self.received(upload_id)) if meta['state'] == UPLOADING else set(range(1, meta['parts'] + 1))
+        return {**meta, 'received': sorted(received),
+                'missing': [n for n in range(1, meta['parts'] + 1) if n not in received]}
+
+    def assemble(self, upload_id: str) -> str:
+        """Join all parts into one file and mark the upload as ingesting; returns the file's path"""
+        # Claim the upload under the lock (a second complete or a late part now gets a 409),
+        # then copy without it so other uploads aren't held up by a large file
+        with self._lock:
+            meta = self._read(upload_id)
+            if meta['state'] != UPLOADING:
+                raise UploadError(f"Upload is {meta['state']}", 409)
+            missing = [n for n in range(1, meta['parts'] + 1) if not os.path.exists(self._part_path(upload_id, n))]
+            if missing:
+                raise UploadError(f"Missing parts: {missing[:20]}", 409)
+            meta.update(state=ASSEMBLING, updated_at=time.time())
+            self._write(upload_id, meta)
+
+        path = os.path.join(self._dir(upload_id), 'file')
+        digest = hashlib.sha256()
+        try:
+            with open(path, 'wb') as out:
+                for n in range(1, meta['parts'] + 1):
+                    with open(self._part_path(upload_id, n), 'rb') as part:
+                        while True:
+                            block = part.read(1024 * 1024)
+                            if not block:
+                                break
+                            digest.update(block)
+                            out.write(block)
+        except OSError:
+            self.update(upload_id, state=UPLOADING)
+            raise
+        if meta.get('sha256') and digest.hexdigest() != meta['sha256'].lower():
+            # Some part is wrong but each matched its own size (and checksum, if sent):
+            # drop them all so status() reports every part missing again
+            os.remove(path)
+            for n in range(1, meta['parts'] + 1):
+                os.remove(self._part_path(upload_id, n))
+            self.update(upload_id, state=UPLOADING)
+            raise UploadError("Whole-file checksum mismatch; all parts were discarded, re-send them", 422)
+        for n in range(1, meta['parts'] + 1):
+            os.remove(self._part_path(upload_id, n))
+        self.update(upload_id, state=INGESTING)
+        return path
+
+    def discard_file(self, upload_id: str):
+        """Drop the assembled file once ingested; upload.json stays for status queries until expiry"""
+        path = os.path.join(self._dir(upload_id), 'file')
+        if os.path.exists(path):
+            os.remove(path)
+
+    def interrupted(self):
+        """
+        (meta, assembled file path or None) of uploads left ingesting, e.g. by a
+        restart. Uploads left assembling still have their parts and go back to
+        uploading, so the client's next complete() retries.
+        """
+        found = []
+        for upload_id in os.listdir(self.root):
+            try:
+                meta = self._read(upload_id)
+            except (UploadError, OSError, ValueError):
+                continue
+            if meta['state'] == ASSEMBLING:
+                self.update(upload_id, state=UPLOADING)
+            elif meta['state'] == INGESTING:
+                path = os.path.join(self.root, upload_id, 'file')
+                found.append((meta, path if os.path.exists(path) else None))
+        return found
+
+    def abort(self, upload_id: str):
+        shutil.rmtree(self._dir(upload_id), ignore_errors=True)
+
+    def expire(self) -> int:
+        """Remove uploads idle for longer than the TTL (including ones stuck ingesting); returns how many"""
+        now = time.time()
+        removed = 0
+        for upload_id in os.listdir(self.root):
+            try:
+                meta = self._read(upload_id)
+            except (UploadError, OSError, ValueError):
+                continue
+            if now - meta['updated_at'] > self.ttl:
+                self.abort(upload_id)
+                removed += 1
+        return removed
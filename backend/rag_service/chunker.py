@@ -0,0 +1,274 @@
+"""
+Token-aware, structure-preserving chunker shared by every ingestion path.
+
+Chunk length is measured with the embedding model's own tokenizer so no chunk
+exceeds MiniLM's 256-token window (which would be silently truncated at
+embedding time). Pages are split into structural blocks - headings, paragraphs
+and tables - and blocks are packed whole; a heading always travels with the
+block after it and oversized tables are split by rows with their header row
+repeated. All blocks of a document are tokenized in one batched call.
+"""
+
+import os
+import re
+from functools import lru_cache
+
+from langchain_core.documents import Document
+
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+
+# all-MiniLM-L6-v2 has max_seq_length=256 including [CLS] and [SEP]
+CHUNK_TOKENS = int(os.getenv("RAG_CHUNK_TOKENS", "240"))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("RAG_CHUNK_OVERLAP_TOKENS", "32"))
+
+_SENTENCE_END = re.compile(r'(?<=[.!?])\s+')
+_NUMBER = re.compile(r'\d[\d,]*(?:\.\d+)?')
+_APPROX_TOKEN = re.compile(r'\w+|[^\w\s]')
+
+
+class _ApproxTokenizer:
+    """
+    Fallback when transformers is not installed: counts word and punctuation
+    pieces, which never undercounts WordPiece by much for English text.
+    """
+
+    def __call__(self, texts, add_special_tokens=False, return_offsets_mapping=False):
+        single = isinstance(texts, str)
+        batch = [texts] if single else texts
+        result = {"input_ids": [[0] * len(_APPROX_TOKEN.findall(t)) for t in batch]}
+        if return_offsets_mapping:
+            result["offset_mapping"] = [[m.span() for m in _APPROX_TOKEN.finditer(t)] for t in batch]
+        if single:
+            result = {key: value[0] for key, value in result.items()}
+        return result
+
+
+@lru_cache(maxsize=4)
+def load_tokenizer(model_name: str = EMBEDDING_MODEL):
+    """Fast (Rust) tokenizer of the embedding model, or the approximate fallback"""
+    try:
+        from transformers import AutoTokenizer
+        return AutoTokenizer.from_pretrained(model_name, use_fast=True)
+    except Exception as e:
+        print(f"⚠️ Tokenizer for {model_name} unavailable ({e}); using approximate token counts")
+        return _ApproxTokenizer()
+
+
+def _is_heading(line: str) -> bool:
+    line = line.strip()
+    if not line or len(line) > 80 or line[-1] in '.,;:!?':
+        return False
+    if line.startswith('#') or re.match(r'^(\d+(\.\d+)*|[IVX]+\.)\s+\S', line):
+        return True
+    letters = [c for c in line if c.isalpha()]
+    return bool(letters) and (line.isupper() or line.istitle()) and len(line.split()) <= 10
+
+
+def _is_table_row(line: str) -> bool:
+    if '|' in line or '\t' in line:
+        return True
+    # Statement rows (date / narration / amount / balance) are number-dense
+    numbers = len(_NUMBER.findall(line))
+    return numbers >= 3 and len(line.split()) <= 3 * numbers
+
+
+def split_blocks(text: str) -> list:
+    """
+    Split a page into (kind, text) blocks where kind is 'heading', 'table' or 'text'.
+    Consecutive table rows form one table block; paragraphs break on blank lines.
+    """
+    blocks = []
+    paragraph, table = [], []
+
+    def flush_paragraph():
+        if paragraph:
+            blocks.append(('text', '\n'.join(paragraph)))
+            paragraph.clear()
+
+    def flush_table():
+        if table:
+            blocks.append(('table', '\n'.join(table)))
+            table.clear()
+
+    previous = None
+    for line in text.split('\n'):
+        stripped = line.strip()
+        if not stripped:
+            flush_paragraph()
+            flush_table()
+        elif _is_table_row(stripped):
+            flush_paragraph()
+            if not table and blocks and blocks[-1] == ('heading', previous):
+                # A column-header line directly above the rows is the table's header
+                table.append(blocks.pop()[1])
+            table.append(stripped)
+        elif _is_heading(stripped) and not paragraph:
+            flush_table()
+            blocks.append(('heading', stripped))
+        else:
+            flush_table()
+            paragraph.append(stripped)
+        previous = stripped
+    flush_paragraph()
+    flush_table()
+    return blocks
+
+
+def _token_windows(text: str, tokenizer, max_tokens: int, overlap: int) -> list:
+    """Cut a single unbreakable run of text at token offsets"""
+    offsets = tokenizer(text, add_special_tokens=False, return_offsets_mapping=True)["offset_mapping"]
+    if not offsets:
+        return [(text, 0)]
+    pieces = []
+    step = max(max_tokens - overlap, 1)
+    for start in range(0, len(offsets), step):
+        window = offsets[start:start + max_tokens]
+        pieces.append((text[window[0][0]:window[-1][1]], len(window)))
+        if start + max_tokens >= len(offsets):
+            break
+    return pieces
+
+
+def _split_oversized(kind: str, text: str, tokenizer, max_tokens: int, overlap: int) -> list:
+    """Break a block larger than max_tokens into (text, token_count) pieces"""
+    if kind == 'table':
+        rows = text.split('\n')
+        header, body = rows[0], rows[1:]
+        counts = [len(ids) for ids in tokenizer(rows, add_special_tokens=False)["input_ids"]]
+        header_count = counts[0]
+        pieces, current, current_count = [], [header], header_count
+        for row, count in zip(body, counts[1:]):
+            if current_count + count > max_tokens and len(current) > 1:
+                pieces.append(('\n'.join(current), current_count))
+                current, current_count = [header], header_count
+            current.append(row)
+            current_count += count
+        pieces.append(('\n'.join(current), current_count))
+        # A single row that is still too long falls back to token windows
+        result = []
+        for piece, count in pieces:
+            if count > max_tokens:
+                result.extend(_token_windows(piece, tokenizer, max_tokens, 0))
+            else:
+                result.append((piece, count))
+        return result
+
+    sentences = [s for s in _SENTENCE_END.split(text) if s]
+    counts = [len(ids) for ids in tokenizer(sentences, add_special_tokens=False)["input_ids"]]
+    pieces, current, current_count = [], [], 0
+    for sentence, count in zip(sentences, counts):
+        if count > max_tokens:
+            if current:
+                pieces.append((' '.join(s for s, _ in current), current_count))
+                current, current_count = [], 0
+            pieces.extend(_token_windows(sentence, tokenizer, max_tokens, overlap))
+            continue
+        if current and current_count + count > max_tokens:
+            pieces.append((' '.join(s for s, _ in current), current_count))
+            # Start the next piece with trailing sentences as overlap
+            carry = []
+            for prev in reversed(current):
+                if sum(c for _, c in carry) + prev[1] > overlap:
+                    break
+                carry.insert(0, prev)
+            if sum(c for _, c in carry) + count > max_tokens:
+                carry = []
+            current = carry
+            current_count = sum(c for _, c in carry)
+        current.append((sentence, count))
+        current_count += count
+    if current:
+        pieces.append((' '.join(s for s, _ in current), current_count))
+    return pieces
+
+
+def _pack_page(blocks, counts, tokenizer, max_tokens, overlap):
+    """Greedily pack structural blocks into chunks; yields (text, token_count, has_table, heading)"""
+    units = []  # (kind, text, count, heading)
+    heading = None
+    pending_heading = None
+    for (kind, text), count in zip(blocks, counts):
+        if kind == 'heading':
+            heading = text
+            pending_heading = (text, count)
+            continue
+        if pending_heading:
+            # Keep the heading glued to the first block of its section
+            h_text, h_count = pending_heading
+            pending_heading = None
+            if h_count + count <= max_tokens:
+                units.append((kind, f"{h_text}\n{text}", h_count + count, heading))
+                continue
+            units.append(('text', h_text, h_count, heading))
+        if count > max_tokens:
+            for piece, piece_count in _split_oversized(kind, text, tokenizer, max_tokens, overlap):
+                units.append((kind, piece, piece_count, heading))
+        else:
+            units.append((kind, text, count, heading))
+    if pending_heading:
+        units.append(('text', pending_heading[0], pending_heading[1], heading))
+
+    chunks = []
+    current = []
+    current_count = 0
+    for unit in units:
+        kind, text, count, unit_heading = unit
+        if current and current_count + count > max_tokens:
+            chunks.append(current)
+            # Carry trailing prose (never tables) forward as overlap
+            carry, carry_count = [], 0
+            for prev in reversed(current):
+                if prev[0] == 'table' or carry_count + prev[2] > overlap:
+                    break
+                carry.insert(0, prev)
+                carry_count += prev[2]
+            if carry_count + count > max_tokens:
+                carry, carry_count = [], 0
+            current, current_count = carry, carry_count
+        current.append(unit)
+        current_count += count
+    if current:
+        chunks.append(current)
+
+    for units_in_chunk in chunks:
+        yield (
+            '\n'.join(u[1] for u in units_in_chunk),
+            sum(u[2] for u in units_in_chunk),
+            any(u[0] == 'table' for u in units_in_chunk),
+            units_in_chunk[0][3],
+        )
+
+
+def chunk_documents(docs: list, tokenizer=None, max_tokens: int = CHUNK_TOKENS,
+                    overlap_tokens: int = CHUNK_OVERLAP_TOKENS) -> list:
+    """
+    Split loaded (already normalized) pages into token-bounded chunks.
+    Each chunk's metadata carries source, page, chunk_index, token_count,
+    has_table and the nearest heading.
+    """
+    tokenizer = tokenizer or load_tokenizer()
+
+    page_blocks = [split_blocks(doc.page_content) for doc in docs]
+    flat = [text for blocks in page_blocks for _, text in blocks]
+    if not flat:
+        return []
+    # One batched tokenizer call for every block in the document
+    flat_counts = [len(ids) for ids in tokenizer(flat, add_special_tokens=False)["input_ids"]]
+
+    chunks = []
+    position = 0
+    for doc, blocks in zip(docs, page_blocks):
+        counts = flat_counts[position:position + len(blocks)]
+        position += len(blocks)
+        for text, token_count, has_table, heading in _pack_page(blocks, counts, tokenizer,
+                                                                max_tokens, overlap_tokens):
+            metadata = dict(doc.metadata)
+            metadata.update({
+                "chunk_index": len(chunks),
+                "token_count": token_count,
+                "has_table": has_table,
+            })
+            if heading:
+                metadata["heading"] = heading
+            chunks.append(Document(page_content=text, metadata=metadata))
+    return chunks
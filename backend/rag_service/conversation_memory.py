@@ -0,0 +1,83 @@
+"""
+Per-conversation retrieval memory: each turn's query vector and retrieved chunk IDs.
+
+Follow-ups ("explain it more") used to be retrieved by prepending the previous
+question and embedding the longer text, which doubled the query and dragged
+retrieval toward whatever came up first. Instead, a follow-up with no topic of
+its own reuses the previous turn's vector without encoding anything, and one
+that adds a topic ("what about taxes on it?") is embedded alone and blended
+with the previous vector. Chunks retrieved in recent turns get a small score
+boost that decays with age, so the conversation stays on the same material.
+
+Vectors are kept as float32 arrays (~1.5 KB per 384-dim turn instead of ~12 KB
+as a list of Python floats), which matters at SESSION_STORE_SIZE sessions of
+SESSION_MAX_TURNS turns each; they are handed back as plain lists.
+"""
+
+import math
+import os
+from array import array
+from collections import deque
+
+SESSION_MAX_TURNS = int(os.getenv("SESSION_MAX_TURNS", "6"))
+# Share of the previous turn's vector in a blended follow-up query
+SESSION_BLEND_WEIGHT = float(os.getenv("SESSION_BLEND_WEIGHT", "0.35"))
+SESSION_CHUNK_BOOST = float(os.getenv("SESSION_CHUNK_BOOST", "0.05"))
+SESSION_BOOST_DECAY = 0.5
+
+
+def blend(current, previous, weight: float):
+    """(1 - weight) * current + weight * previous, re-normalized to unit length"""
+    mixed = [(1 - weight) * c + weight * p for c, p in zip(current, previous)]
+    norm = math.sqrt(sum(v * v for v in mixed)) or 1.0
+    return [v / norm for v in mixed]
+
+
+class ConversationMemory:
+    """Recent turns of one conversation; not thread-safe (one per session)"""
+
+    def __init__(self, max_turns: int = SESSION_MAX_TURNS, blend_weight: float = SESSION_BLEND_WEIGHT,
+                 chunk_boost: float = SESSION_CHUNK_BOOST):
+        self.blend_weight = blend_weight
+        self.chunk_boost = chunk_boost
+        self._turns = deque(maxlen=max_turns)  # (query, float32 vector, chunk_ids), newest last
+        self.encodes_saved = 0
+
+    def __len__(self):
+        return len(self._turns)
+
+    def query_vector(self, query: str, plan, embed_query):
+        """
+        Vector to retrieve with. `plan` is intent.classify_query's QueryPlan;
+        `embed_query` is only called when the query needs encoding.
+        """
+        previous = self._turns[-1][1] if self._turns else None
+        for past_query, vector, _ in reversed(self._turns):
+            if past_query == query:
+                self.encodes_saved += 1
+                return vector.tolist()
+        if previous is not None and plan.follow_up and not plan.has_topic:
+            self.encodes_saved += 1
+            return previous.tolist()
+        vector = embed_query(query)
+        if previous is not None and plan.follow_up:
+            return blend(vector, previous, self.blend_weight)
+        return vector
+
+    def boost(self, matches):
+        """Add the recency boost to matches ({'id', 'score', ...}) in place"""
+        if not self.chunk_boost or not self._turns:
+            return matches
+        bonus = {}
+        for age, (_, _, chunk_ids) in enumerate(reversed(self._turns)):
+            for chunk_id in chunk_ids:
+                bonus.setdefault(chunk_id, self.chunk_boost * SESSION_BOOST_DECAY ** age)
+        for match in matches:
+            match['score'] = match.get('score', 0) + bonus.get(match.get('id'), 0.0)
+        return matches
+
+    def record(self, query: str, vector, chunk_ids):
+        self._turns.append((query, array('f', vector), list(chunk_ids)))
+
+    def clear(self):
+        self._turns.clear()
@@ -0,0 +1,173 @@
+"""
+Bill image preprocessing before OCR.
+
+Phones send 12 MP JPEGs, PNG screenshots and HEIC photos; sending them as-is
+inflates upload time, model latency and cost. This stage detects the real
+format, crops to the receipt, straightens small rotations, downscales to a
+configurable size and re-encodes as a compact JPEG. Without Pillow the bytes
+pass through unchanged with their detected MIME type.
+"""
+
+import io
+import os
+import time
+
+try:
+    from PIL import Image, ImageFilter, ImageOps
+except ImportError:
+    Image = None
+
+try:  # HEIC/HEIF support is an optional Pillow plugin
+    from pillow_heif import register_heif_opener
+    register_heif_opener()
+except ImportError:
+    pass
+
+BILL_MAX_SIDE = int(os.getenv("BILL_MAX_SIDE", "1600"))
+BILL_JPEG_QUALITY = int(os.getenv("BILL_JPEG_QUALITY", "80"))
+BILL_GRAYSCALE = os.getenv("BILL_GRAYSCALE", "true").lower() != "false"
+
+_HEIF_BRANDS = {b'heic', b'heix', b'hevc', b'hevx', b'heim', b'heis', b'mif1', b'msf1', b'avif'}
+# Formats Gemini accepts directly
+_PASSTHROUGH_TYPES = {'image/jpeg', 'image/png', 'image/webp', 'image/heic'}
+_ANALYSIS_SIDE = 320
+_MAX_SKEW_DEGREES = 8
+
+
+def detect_mime_type(data: bytes) -> str:
+    """MIME type from the file signature (the upload's declared type is unreliable)"""
+    if data[:3] == b'\xff\xd8\xff':
+        return 'image/jpeg'
+    if data[:8] == b'\x89PNG\r\n\x1a\n':
+        return 'image/png'
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return 'image/webp'
+    if data[4:8] == b'ftyp' and data[8:12] in _HEIF_BRANDS:
+        return 'image/avif' if data[8:12] == b'avif' else 'image/heic'
+    if data[:6] in (b'GIF87a', b'GIF89a'):
+        return 'image/gif'
+    if data[:2] == b'BM':
+        return 'image/bmp'
+    if data[:4] in (b'II*\x00', b'MM\x00*'):
+        return 'image/tiff'
+    return 'application/octet-stream'
+
+
+def _profile(gray, axis: str) -> list:
+    """Mean brightness per column ('x') or row ('y') using a box-filter resize"""
+    w, h = gray.size
+    size = (w, 1) if axis == 'x' else (1, h)
+    return list(gray.resize(size, Image.BOX).getdata())
+
+
+def _bright_span(profile: list, threshold: float):
+    """Longest contiguous run of values above threshold"""
+    best, start = (0, 0), None
+    for i, value in enumerate(profile + [0]):
+        if value > threshold and start is None:
+            start = i
+        elif value <= threshold and start is not None:
+            if i - start > best[1] - best[0]:
+                best = (start, i)
+            start = None
+    return best
+
+
+def find_receipt_box(gray):
+    """
+    Bounding box of the receipt (bright paper on a darker background) in the
+    coordinates of `gray`, or None when no clear paper region is found.
+    """
+    w, h = gray.size
+    # Dilate bright areas so printed text doesn't punch holes in the paper
+    paper = gray.filter(ImageFilter.MaxFilter(5))
+    cols, rows = _profile(paper, 'x'), _profile(paper, 'y')
+    left, right = _bright_span(cols, (max(cols) + min(cols)) / 2)
+    top, bottom = _bright_span(rows, (max(rows) + min(rows)) / 2)
+    area = (right - left) * (bottom - top)
+    # Ignore degenerate boxes and boxes that are basically the whole frame
+    if area < 0.05 * w * h or area > 0.92 * w * h:
+        return None
+    pad_x, pad_y = int(0.02 * w), int(0.02 * h)
+    return (max(left - pad_x, 0), max(top - pad_y, 0), min(right + pad_x, w), min(bottom + pad_y, h))
+
+
+def estimate_skew(gray) -> float:
+    """
+    Small-angle deskew by projection profiles: text lines are horizontal when
+    the variance of per-row ink is highest.
+    """
+    ink = ImageOps.invert(ImageOps.autocontrast(gray))
+
+    def score(angle):
+        rows = _profile(ink.rotate(angle, resample=Image.BILINEAR, fillcolor=0), 'y')
+        mean = sum(rows) / len(rows)
+        return sum((r - mean) ** 2 for r in rows)
+
+    base = score(0)
+    best_angle, best_score = 0.0, base
+    for angle in range(-_MAX_SKEW_DEGREES, _MAX_SKEW_DEGREES + 1):
+        if angle == 0:
+            continue
+        s = score(angle)
+        if s > best_score:
+            best_angle, best_score = float(angle), s
+    # Only rotate for a clear improvement; rotation blurs text slightly
+    return best_angle if best_score > base * 1.05 else 0.0
+
+
+def preprocess_bill_image(data: bytes, max_side: int = BILL_MAX_SIDE,
+                          quality: int = BILL_JPEG_QUALITY, grayscale: bool = BILL_GRAYSCALE):
+    """
+    Returns (image_bytes, mime_type, info). info records the detected format,
+    byte sizes, dimensions, crop/rotation applied and elapsed time.
+    """
+    started = time.perf_counter()
+    mime_type = detect_mime_type(data)
+    info = {'format': mime_type, 'original_bytes': len(data), 'bytes': len(data), 'preprocessed': False}
+    if Image is None:
+        return data, mime_type, info
+
+    try:
+        img = Image.open(io.BytesIO(data))
+        info['original_size'] = img.size
+        # JPEG can decode at 1/2, 1/4, 1/8 scale directly - far cheaper than full decode
+        img.draft('RGB', (max_side, max_side))
+        img = ImageOps.exif_transpose(img)
+        img = img.convert('L' if grayscale else 'RGB')
+
+        analysis = img.convert('L')
+        analysis.thumbnail((_ANALYSIS_SIDE, _ANALYSIS_SIDE))
+        scale = img.size[0] / analysis.size[0]
+
+        box = find_receipt_box(analysis)
+        if box:
+            img = img.crop(tuple(int(v * scale) for v in box))
+            analysis = analysis.crop(box)
+            info['cropped'] = True
+
+        # Downscale before rotating - rotation cost grows with pixel count
+        img.thumbnail((max_side, max_side), Image.LANCZOS)
+
+        angle = estimate_skew(analysis)
+        if angle:
+            fill = 255 if img.mode == 'L' else (255, 255, 255)
+            img = img.rotate(angle, resample=Image.BICUBIC, expand=True, fillcolor=fill)
+            img.thumbnail((max_side, max_side), Image.BILINEAR)
+            info['rotated_degrees'] = angle
+
+        out = io.BytesIO()
+        img.save(out, format='JPEG', quality=quality, optimize=True)
+        encoded = out.getvalue()
+    except Exception as e:
+        print(f"⚠️ Bill preprocessing skipped: {e}")
+        info['elapsed_ms'] = round((time.perf_counter() - started) * 1000, 1)
+        return data, mime_type, info
+
+    info['elapsed_ms'] = round((time.perf_counter() - started) * 1000, 1)
+    # Already-compact images that needed no geometric fix can stay as they are
+    if len(encoded) >= len(data) and mime_type in _PASSTHROUGH_TYPES and not box and not angle:
+        return data, mime_type, info
+
+    info.update({'bytes': len(encoded), 'size': img.size, 'preprocessed': True})
+    return encoded, 'image/jpeg', info
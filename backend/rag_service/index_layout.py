@@ -0,0 +1,128 @@
+"""
+Pinecone layout: namespaces per tenant, deterministic vector IDs per document.
+
+Global knowledge lives in the default namespace ("") and each user's uploads in
+"user-<id>", so /chat queries only the namespaces the caller may see instead
+of over-fetching one flat index and filtering in Python. Chunks of a document
+get IDs "<doc_id>#<i>"; chunk 0 carries the document's chunk count and acts as
+its manifest, so "is this document indexed?" is a single fetch by ID and
+deleting a document deletes a known ID list - no dummy-vector queries.
+Re-ingesting a source overwrites its vectors in place and drops leftovers.
+
+Vectors written before this layout live in the default namespace under IDs
+nothing can derive: random UUIDs (tagged with source/user_id metadata) from
+the RAG service, "<file>-chunk-<n>" (text only) from the Streamlit tools.
+delete_legacy_vectors() removes them the first time a source is ingested
+under the new layout, so its chunks are not retrieved twice.
+"""
+
+import hashlib
+import re
+
+GLOBAL_NAMESPACE = ""
+DELETE_BATCH_SIZE = 1000  # Pinecone's limit on IDs per delete call
+
+_UNSAFE_ID_CHARS = re.compile(r'[^A-Za-z0-9._-]+')
+
+
+def user_namespace(user_id) -> str:
+    return f"user-{user_id}" if user_id else GLOBAL_NAMESPACE
+
+
+def namespaces_for(user_id):
+    """Namespaces a caller's queries may read: global knowledge plus their own"""
+    return [GLOBAL_NAMESPACE, user_namespace(user_id)] if user_id else [GLOBAL_NAMESPACE]
+
+
+def document_id(source: str) -> str:
+    """ASCII-safe ID prefix for a source name; a hash keeps sanitized names distinct"""
+    safe = _UNSAFE_ID_CHARS.sub('_', source).strip('_')[:200] or 'document'
+    if safe != source:
+        safe += '-' + hashlib.sha1(source.encode('utf-8')).hexdigest()[:8]
+    return safe
+
+
+def chunk_id(doc_id: str, i: int) -> str:
+    return f"{doc_id}#{i}"
+
+
+def document_vectors(source: str, chunks, embeddings, **metadata):
+    """Upsert payloads for one document's chunks, with the manifest fields on every chunk"""
+    doc_id = document_id(source)
+    vectors = []
+    for i, (doc, values) in enumerate(zip(chunks, embeddings)):
+        meta = {
+            "text": doc.page_content,
+            "source": source,
+            "doc_id": doc_id,
+            "chunk_index": doc.metadata.get("chunk_index", i),
+            "chunk_count": len(chunks),
+            "token_count": doc.metadata["token_count"],
+            **metadata,
+        }
+        if "page" in doc.metadata:
+            meta["page"] = doc.metadata["page"]
+        vectors.append({"id": chunk_id(doc_id, i), "values": values, "metadata": meta})
+    return vectors
+
+
+def get_manifest(index, source: str, namespace: str = GLOBAL_NAMESPACE):
+    """Metadata of the document's first chunk (source, chunk_count, ...), or None if not indexed"""
+    first = chunk_id(document_id(source), 0)
+    found = index.fetch(ids=[first], namespace=namespace)["vectors"]
+    if first not in found:
+        return None
+    return dict(found[first]["metadata"] or {})
+
+
+def stale_ids(manifest, new_count: int):
+    """IDs left over from a previous, longer version of a re-ingested document"""
+    if not manifest:
+        return []
+    doc_id = manifest.get("doc_id") or document_id(manifest["source"])
+    return [chunk_id(doc_id, i) for i in range(new_count, int(manifest.get("chunk_count", 0)))]
+
+
+def delete_ids(index, ids, namespace: str = GLOBAL_NAMESPACE):
+    for i in range(0, len(ids), DELETE_BATCH_SIZE):
+        index.delete(ids=ids[i:i + DELETE_BATCH_SIZE], namespace=namespace)
+
+
+def delete_legacy_vectors(index, source: str, user_id=None):
+    """
+    Delete `source`'s pre-layout vectors from the default namespace: those
+    tagged with its name but no doc_id, plus (for global documents) the
+    "<source>-chunk-<n>" IDs, found by prefix listing.
+    """
+    legacy = {"source": {"$eq": source}, "doc_id": {"$exists": False}}
+    legacy["user_id"] = {"$eq": str(user_id)} if user_id else {"$exists": False}
+    index.delete(filter=legacy, namespace=GLOBAL_NAMESPACE)
+    if not user_id:
+        ids = [vector_id for page in index.list(prefix=f"{source}-chunk-", namespace=GLOBAL_NAMESPACE)
+               for vector_id in page]
+        delete_ids(index, ids, GLOBAL_NAMESPACE)
+
+
+def delete_document(index, source: str, namespace: str = GLOBAL_NAMESPACE) -> int:
+    """Delete every chunk of `source`; returns the number of chunks removed (0 if absent)"""
+    manifest = get_manifest(index, source, namespace)
+    if manifest is None:
+        return 0
+    ids = stale_ids(manifest, 0)
+    delete_ids(index, ids, namespace)
+    return len(ids)
+
+
+def query_namespaces(index, vector, top_k: int, namespaces, pool=None):
+    """Query each namespace (in parallel on `pool` if given) and merge matches by score"""
+    def one(namespace):
+        return index.query(vector=vector, top_k=top_k, include_metadata=True,
+                           namespace=namespace).get("matches", [])
+
+    if len(namespaces) == 1 or pool is None:
+        results = [one(ns) for ns in namespaces]
+    else:
+        results = list(pool.map(one, namespaces))
+    matches = [m for result in results for m in result]
+    matches.sort(key=lambda m: m["score"], reverse=True)
+    return matches
@@ -0,0 +1,248 @@
+"""
+Query intent detection and a deterministic rule engine for simple questions.
+
+classify_query() decides, once per question, how apis/app.py retrieves for
+it: summary requests fetch broadly with no score cutoff, follow-ups ("explain
+it more") get expanded with the previous question. All patterns are compiled
+word-boundary regexes, so "and"/"it" inside "brand"/"item" don't count.
+
+"Can I buy X for ₹N?" and "What's my balance?" are arithmetic over the
+realtime_context dict the caller already sends, so /chat answers them here in
+microseconds instead of paying for retrieval plus an LLM round trip. The
+engine only answers when it is confident (one clear amount, a balance in the
+context, no conditions like EMIs or "per month", no unit prices or "or lease
+it" comparisons, the user's own balance rather than "what is net worth?");
+anything else returns None and goes through the normal RAG pipeline.
+"""
+
+import os
+import re
+
+INTENT_MIN_CONFIDENCE = float(os.getenv("INTENT_MIN_CONFIDENCE", "0.8"))
+
+AFFORDABILITY = 'affordability'
+BALANCE = 'balance'
+OTHER = 'other'
+
+_AFFORD = re.compile(
+    r"\b(can|could|should)\s+i\s+(afford|buy|purchase|spend)\b"
+    r"|\bafford\b|\bis\s+it\s+ok(ay)?\s+to\s+(buy|spend)\b|\benough\s+(money|balance|funds)\s+(for|to)\b",
+    re.I)
+# "Can I get a refund of 500?", "could I get a card with a limit of 50000?": get/book/order
+# only ask about affordability when the amount is a price
+_AFFORD_WEAK = re.compile(r"\b(can|could|should)\s+i\s+(get|order|book)\b", re.I)
+_PRICE_WORD = re.compile(r"₹|\b(for|costs?|costing|worth|price[ds]?|rs\.?|inr|rupees)\b", re.I)
+# Only the user's own balance: "my (wallet) balance", "how much money do I have"
+_BALANCE = re.compile(
+    r"\bmy\s+(wallet\s+|account\s+|bank\s+|current\s+|total\s+|available\s+)?(balance|net\s*worth)\b"
+    r"|\bhow\s+much\s+(money|cash|balance)\s+(do\s+i\s+have|have\s+i\s+got|i\s+have|is\s+left)\b",
+    re.I)
+# ...not questions about the concept ("What is net worth?", "what is a balance sheet?")
+_GENERAL_QUESTION = re.compile(
+    r"^\s*(what|who)('?s|\s+is|\s+are)\s+(a|an|the)\b|\bhow\s+to\b"
+    r"|\bbalance[ds]?\s+(sheets?|transfers?|funds?|advantage|of\s+payments?)\b", re.I)
+# A card/loan balance is money owed, not the wallet balance in the context
+_LIABILITY_BALANCE = re.compile(r"\b(card|credit|loans?|debt|emi|outstanding|due)\s+(\w+\s+)?balance\b", re.I)
+_SUMMARY = re.compile(r"\b(summary|summari[sz]e|overview|brief|main\s+points|key\s+points)\b", re.I)
+# Openers that only make sense as a continuation of the previous turn
+_CONTINUATION = re.compile(
+    r"^\s*(and|also|more|what\s+about|how\s+about|tell\s+me\s+more|go\s+on|keep\s+going|continue|"
+    r"yes|yeah|ok(ay)?|sure)\b", re.I)
+_CONTINUATION_WORDS = frozenset(('and', 'also', 'how', 'tell', 'go', 'on', 'keep', 'going',
+                                 'yes', 'yeah', 'ok', 'okay', 'sure'))
+_WORDS = re.compile(r"[a-z0-9']+")
+_PRONOUNS = frozenset(('it', 'this', 'that', 'these', 'those', 'them', 'they', 'its'))
+_VAGUE_WORDS = frozenset(('more', 'explain', 'elaborate', 'detail', 'details', 'further', 'again', 'continue'))
+_FILLER = frozenset(('a', 'an', 'the', 'on', 'of', 'to', 'about', 'in', 'me', 'can', 'you', 'please',
+                     'i', 'bit', 'little', 'some', 'what', 'is', 'do', 'does', 'mean'))
+SUMMARY_TOP_K = 100
+# Conditions the rule engine can't evaluate: leave these to the LLM
+_UNSURE = re.compile(
+    r"\b(emi|emis|loan|instal+ments?|per\s+month|monthly|every\s+month|each|per\s+day|yearly|"
+    r"after|save\s+for|saving\s+for|invest|sip|if\s+i|next\s+month|budget)\b", re.I)
+# "10 shares at 3500", "3 laptops for 40000": the amount is a unit price, not the total
+_UNIT_PRICE = re.compile(
+    r"\b(at|@)\s*(₹|rs\.?\s*|inr\s*)?\d|\b(apiece|per\s+(piece|unit|share|item|ticket))\b"
+    r"|\b(buy|purchase|get|order|book)\s+(\d+|two|three|four|five|six|seven|eight|nine|ten|a\s+dozen|"
+    r"a\s+few|several)\s+[a-z]", re.I)
+# "Should I buy a car for 8 lakh or lease it?": a comparison, not a yes/no on the balance
+_ALTERNATIVE = re.compile(r"\bor\s+(lease|leasing|rent|renting|hire|finance|financing|borrow|wait|save|invest)\b"
+                          r"|\bvs\.?\b|\bversus\b", re.I)
+
+_AMOUNT = re.compile(
+    r"(?P<prefix>\b(?:for|of|costs?|costing|worth|at|price|priced|spend|rs\.?|inr)\s*)?"
+    r"(?P<currency>₹|rs\.?\s*|inr\s*)?"
+    r"(?P<number>\d[\d,]*(?:\.\d+)?)(?![\d.,]*\s*(?:%|per\s*cent|percent))\s*"
+    r"(?P<unit>k\b|thousand\b|lakhs?\b|lacs?\b|cr\b|crores?\b|rupees\b|rs\b|/-)?",
+    re.I)
+_MULTIPLIERS = {'k': 1e3, 'thousand': 1e3, 'lakh': 1e5, 'lakhs': 1e5, 'lac': 1e5, 'lacs': 1e5,
+                'cr': 1e7, 'crore': 1e7, 'crores': 1e7}
+
+# realtime_context key patterns, most specific first; whole words of the key
+# ("cash_balance", "walletBalance"), so "cashback" or "loan_balance" don't count
+_BALANCE_KEYS = tuple(re.compile(rf'(?<![a-z0-9]){p}(?![a-z0-9])')
+                      for p in (r'wallet', r'balance', r'cash', r'savings'))
+_NET_WORTH_KEYS = tuple(re.compile(rf'(?<![a-z0-9]){p}(?![a-z0-9])') for p in (r'net_?worth', r'portfolio'))
+# Money owed, never spendable
+_LIABILITY_KEY = re.compile(r'(?<![a-z0-9])(loans?|card|credit|debt|dues?|outstanding|emis?)(?![a-z0-9])')
+
+
+class QueryIntent:
+    __slots__ = ('kind', 'amount', 'confidence')
+
+    def __init__(self, kind: str, amount: float = None, confidence: float = 0.0):
+        self.kind = kind
+        self.amount = amount
+        self.confidence = confidence
+
+    def __repr__(self):
+        return f"QueryIntent({self.kind!r}, amount={self.amount}, confidence={self.confidence})"
+
+
+class QueryPlan:
+    __slots__ = ('summary', 'follow_up', 'has_topic', 'top_k')
+
+    def __init__(self, summary: bool, follow_up: bool, has_topic: bool, top_k: int):
+        self.summary = summary
+        self.follow_up = follow_up
+        self.has_topic = has_topic
+        self.top_k = top_k
+
+    def __repr__(self):
+        return (f"QueryPlan(summary={self.summary}, follow_up={self.follow_up}, "
+                f"has_topic={self.has_topic}, top_k={self.top_k})")
+
+
+def classify_query(query: str, top_k: int = 15) -> QueryPlan:
+    """
+    How to retrieve for `query`: summary requests fetch SUMMARY_TOP_K chunks;
+    a follow-up is a continuation opener, a short question leaning on a
+    pronoun, or vague words with no topic of its own ("elaborate please").
+    """
+    summary = bool(_SUMMARY.search(query))
+    words = _WORDS.findall(query.lower())
+    has_topic = any(w not in _VAGUE_WORDS and w not in _PRONOUNS and w not in _FILLER
+                    and w not in _CONTINUATION_WORDS for w in words)
+    follow_up = bool(
+        _CONTINUATION.match(query)
+        or (len(words) < 6 and not _PRONOUNS.isdisjoint(words))
+        or (not _VAGUE_WORDS.isdisjoint(words) and not has_topic)
+    )
+    return QueryPlan(summary, follow_up, has_topic, SUMMARY_TOP_K if summary else top_k)
+
+
+def parse_amounts(text: str):
+    """[(amount, strong)] where strong means a currency sign, unit or price word marked it"""
+    found = []
+    for m in _AMOUNT.finditer(text):
+        try:
+            value = float(m.group('number').replace(',', ''))
+        except ValueError:
+            continue
+        unit = (m.group('unit') or '').lower()
+        value *= _MULTIPLIERS.get(unit, 1)
+        strong = bool(m.group('currency') or m.group('prefix') or unit)
+        found.append((value, strong))
+    return found
+
+
+def parse_amount(text: str):
+    """The single price a question is about, or None if there isn't one clear amount"""
+    amounts = parse_amounts(text)
+    strong = [a for a, is_strong in amounts if is_strong]
+    if len(strong) == 1:
+        return strong[0]
+    if not strong and len(amounts) == 1 and amounts[0][0] >= 100:
+        return amounts[0][0]
+    return None
+
+
+def classify_intent(query: str) -> QueryIntent:
+    if _AFFORD.search(query) or (_AFFORD_WEAK.search(query) and _PRICE_WORD.search(query)):
+        amount = parse_amount(query)
+        confidence = 0.95 if amount else 0.3
+        if _UNSURE.search(query) or _UNIT_PRICE.search(query) or _ALTERNATIVE.search(query):
+            confidence = min(confidence, 0.5)
+        return QueryIntent(AFFORDABILITY, amount, confidence)
+    if _BALANCE.search(query) and not _LIABILITY_BALANCE.search(query) and not _GENERAL_QUESTION.search(query):
+        return QueryIntent(BALANCE, None, 0.5 if _UNSURE.search(query) else 0.95)
+    return QueryIntent(OTHER)
+
+
+def _context_amount(realtime_context, patterns):
+    """(label, amount) of the first context key matching `patterns` in order"""
+    for pattern in patterns:
+        for key, value in (realtime_context or {}).items():
+            words = _key_words(key)
+            if not pattern.search(words) or _LIABILITY_KEY.search(words) or isinstance(value, bool):
+                continue
+            amount = value if isinstance(value, (int, float)) else parse_amount(str(value))
+            if amount is not None:
+                return words.replace('_', ' '), float(amount)
+    return None
+
+
+def _key_words(key: str) -> str:
+    """'walletBalance' / 'Wallet Balance' -> 'wallet_balance'"""
+    key = re.sub(r'(?<=[a-z0-9])(?=[A-Z])', '_', str(key))
+    return re.sub(r'[\s-]+', '_', key.strip()).lower()
+
+
+def format_inr(amount: float) -> str:
+    """₹ with Indian digit grouping (₹1,20,000)"""
+    rupees = f"{abs(amount):.2f}".rstrip('0').rstrip('.')
+    whole, _, paise = rupees.partition('.')
+    paise = paise.ljust(2, '0') if paise else ''
+    if len(whole) > 3:
+        head, tail = whole[:-3], whole[-3:]
+        groups = []
+        while len(head) > 2:
+            groups.insert(0, head[-2:])
+            head = head[:-2]
+        whole = ','.join(([head] if head else []) + groups + [tail])
+    return f"{'-' if amount < 0 else ''}₹{whole}{'.' + paise if paise else ''}"
+
+
+def affordability_answer(price: float, realtime_context) -> str:
+    balance = _context_amount(realtime_context, _BALANCE_KEYS)
+    net_worth = _context_amount(realtime_context, _NET_WORTH_KEYS)
+    if balance is None:
+        return None
+    label, available = balance
+    if available >= price:
+        answer = (f"Yes, you can afford it. Your {label} is {format_inr(available)}, "
+                  f"so spending {format_inr(price)} leaves {format_inr(available - price)}.")
+        if price > available / 2:
+            answer += " That is more than half of it, so make sure upcoming bills are covered first."
+        return answer
+    answer = (f"Not right now. Your {label} is {format_inr(available)}, "
+              f"which is {format_inr(price - available)} short of {format_inr(price)}.")
+    if net_worth and net_worth[1] >= price:
+        answer += f" Your {net_worth[0]} of {format_inr(net_worth[1])} could cover it, but only by selling investments."
+    return answer
+
+
+def balance_answer(realtime_context) -> str:
+    balance = _context_amount(realtime_context, _BALANCE_KEYS)
+    net_worth = _context_amount(realtime_context, _NET_WORTH_KEYS)
+    if balance is None and net_worth is None:
+        return None
+    parts = []
+    if balance:
+        parts.append(f"Your {balance[0]} is {format_inr(balance[1])}.")
+    if net_worth:
+        parts.append(f"Your {net_worth[0]} is {format_inr(net_worth[1])}.")
+    return ' '.join(parts)
+
+
+def fast_answer(query: str, realtime_context, min_confidence: float = INTENT_MIN_CONFIDENCE):
+    """
+    (answer, intent). answer is None when the query isn't a simple
+    affordability/balance question or the engine isn't sure; use the LLM then.
+    """
+    intent = classify_intent(query)
+    if intent.kind == OTHER or intent.confidence < min_confidence or not realtime_context:
+        return None, intent
+    if intent.kind == AFFORDABILITY:
+        return affordability_answer(intent.amount, realtime_context), intent
+    return balance_answer(realtime_context), intent
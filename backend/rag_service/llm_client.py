@@ -0,0 +1,176 @@
+"""
+Shared Gemini client for every LLM call site (chat, bill OCR, Streamlit app).
+
+genai.configure() sets process-wide state and builds the underlying gRPC
+client, so it is done once here instead of per request; GenerativeModel
+instances are cached per model name and the single client connection is
+reused by all threads. Each call gets a timeout and a slot from a bounded
+concurrency limit, and is recorded in per-endpoint latency/token metrics.
+Callers beyond the limit wait in a bounded queue where interactive chat is
+served before bill scans and bulk work; when the queue is full they fail fast
+so the endpoint can answer 429 instead of piling onto a throttled upstream.
+"""
+
+import os
+import threading
+import time
+
+import google.generativeai as genai
+
+from rate_limit import PrioritySlots, QueueFullError
+
+DEFAULT_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.5-flash")
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "30"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_MAX_QUEUE = int(os.getenv("LLM_MAX_QUEUE", "32"))
+
+# Lower is served first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_NORMAL = 1
+PRIORITY_BULK = 2
+
+
+class LLMBusyError(RuntimeError):
+    """The LLM wait queue is full or no slot freed up within the call's timeout"""
+
+    def __init__(self, message: str, retry_after: float = 1.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class _EndpointStats:
+    __slots__ = ('calls', 'errors', 'rejected', 'total_ms', 'max_ms', 'prompt_tokens', 'output_tokens',
+                 'cached_tokens')
+
+    def __init__(self):
+        self.calls = self.errors = self.rejected = 0
+        self.total_ms = self.max_ms = 0.0
+        self.prompt_tokens = self.output_tokens = self.cached_tokens = 0
+
+    def as_dict(self):
+        return {
+            'calls': self.calls,
+            'errors': self.errors,
+            'rejected': self.rejected,
+            'avg_ms': round(self.total_ms / self.calls, 1) if self.calls else 0.0,
+            'max_ms': round(self.max_ms, 1),
+            'prompt_tokens': self.prompt_tokens,
+            'output_tokens': self.output_tokens,
+            # Prompt tokens served from Gemini's implicit prefix cache (billed at a discount)
+            'cached_tokens': self.cached_tokens,
+        }
+
+
+class LLMClient:
+    """
+    Thread-safe wrapper around google.generativeai. Configure once (lazily from
+    GEMINI_API_KEY if configure() is never called), then call generate().
+    """
+
+    def __init__(self, max_concurrency: int = LLM_MAX_CONCURRENCY, timeout: float = LLM_TIMEOUT_SECONDS,
+                 max_queue: int = LLM_MAX_QUEUE):
+        self.timeout = timeout
+        self.max_concurrency = max_concurrency
+        self._slots = PrioritySlots(max_concurrency, max_queue)
+        self._lock = threading.Lock()
+        self._api_key = None
+        self._models = {}
+        self._stats = {}
+
+    def configure(self, api_key: str = None):
+        """Configure genai once; only re-configures if the key actually changed"""
+        api_key = api_key or os.getenv("GEMINI_API_KEY")
+        if not api_key:
+            raise ValueError("GEMINI_API_KEY not found in environment")
+        with self._lock:
+            if api_key != self._api_key:
+                genai.configure(api_key=api_key)
+                self._api_key = api_key
+                self._models.clear()
+
+    @property
+    def configured(self) -> bool:
+        return self._api_key is not None
+
+    @property
+    def in_flight(self) -> int:
+        return self._slots.active
+
+    @property
+    def queued(self) -> int:
+        return self._slots.waiting
+
+    def model(self, name: str = DEFAULT_MODEL):
+        """Cached GenerativeModel for `name`"""
+        if not self.configured:
+            self.configure()
+        with self._lock:
+            model = self._models.get(name)
+            if model is None:
+                model = self._models[name] = genai.GenerativeModel(name)
+            return model
+
+    def generate(self, endpoint: str, contents, model_name: str = DEFAULT_MODEL, timeout: float = None,
+                 priority: int = PRIORITY_INTERACTIVE) -> str:
+        """
+        Run generate_content under the concurrency limit and return the text.
+        `endpoint` labels the call in stats(). Raises LLMBusyError if the queue
+        is full or no slot frees up within the timeout; API errors propagate.
+        """
+        timeout = timeout or self.timeout
+        model = self.model(model_name)
+        try:
+            self._slots.acquire(priority, timeout=timeout)
+        except QueueFullError as e:
+            with self._lock:
+                self._endpoint_stats(endpoint).rejected += 1
+            raise LLMBusyError(f"LLM busy: {e}", retry_after=max(1.0, self._avg_latency_s())) from None
+
+        started = time.perf_counter()
+        response = None
+        try:
+            response = model.generate_content(contents, request_options={"timeout": timeout})
+            return response.text
+        except Exception:
+            response = None
+            raise
+        finally:
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            self._slots.release()
+            self._record(endpoint, elapsed_ms, response, error=response is None)
+
+    def _record(self, endpoint: str, elapsed_ms: float, response, error: bool):
+        usage = getattr(response, 'usage_metadata', None)
+        with self._lock:
+            stats = self._endpoint_stats(endpoint)
+            stats.calls += 1
+            stats.errors += error
+            stats.total_ms += elapsed_ms
+            stats.max_ms = max(stats.max_ms, elapsed_ms)
+            if usage is not None:
+                stats.prompt_tokens += getattr(usage, 'prompt_token_count', 0) or 0
+                stats.output_tokens += getattr(usage, 'candidates_token_count', 0) or 0
+                stats.cached_tokens += getattr(usage, 'cached_content_token_count', 0) or 0
+
+    def _endpoint_stats(self, endpoint: str) -> _EndpointStats:
+        # Caller holds self._lock
+        stats = self._stats.get(endpoint)
+        if stats is None:
+            stats = self._stats[endpoint] = _EndpointStats()
+        return stats
+
+    def _avg_latency_s(self) -> float:
+        with self._lock:
+            calls = sum(s.calls for s in self._stats.values())
+            total = sum(s.total_ms for s in self._stats.values())
+        return total / calls / 1000 if calls else 1.0
+
+    def stats(self) -> dict:
+        """Per-endpoint calls/errors/latency/token totals plus current in-flight and queued calls"""
+        with self._lock:
+            return {
+                'in_flight': self.in_flight,
+                'queued': self.queued,
+                'max_concurrency': self.max_concurrency,
+                'endpoints': {name: s.as_dict() for name, s in self._stats.items()},
+            }
@@ -0,0 +1,109 @@
+"""
+Document loaders for the RAG ingestion paths.
+
+Parses PDF/DOCX content straight from an in-memory stream (a Flask/Streamlit
+upload) or a memory-mapped file instead of saving it to disk and reading it
+back. A temporary file is only created for formats whose parser insists on a
+filesystem path, and it is always removed afterwards.
+"""
+
+import io
+import mmap
+import os
+import tempfile
+from contextlib import contextmanager
+
+import docx2txt
+from pypdf import PdfReader
+from langchain_core.documents import Document
+
+SUPPORTED_EXTENSIONS = {'pdf', 'docx', 'doc'}
+
+
+def file_extension(filename: str) -> str:
+    """Lower-cased extension without the dot ('' if there is none)"""
+    return filename.rsplit('.', 1)[1].lower() if '.' in filename else ''
+
+
+def _load_pdf(stream, source: str) -> list:
+    reader = PdfReader(stream)
+    docs = []
+    for page_number, page in enumerate(reader.pages):
+        text = page.extract_text() or ""
+        # Same metadata shape as PyPDFLoader so downstream code is unchanged
+        docs.append(Document(page_content=text, metadata={"source": source, "page": page_number}))
+    return docs
+
+
+def _load_docx(stream, source: str) -> list:
+    text = docx2txt.process(stream) or ""
+    return [Document(page_content=text, metadata={"source": source})]
+
+
+@contextmanager
+def temporary_path(stream, suffix: str = ""):
+    """
+    Spill a stream to a named temp file for parsers that need a real path.
+    The file is deleted on exit, including when parsing raises.
+    """
+    fd, path = tempfile.mkstemp(suffix=suffix)
+    try:
+        with os.fdopen(fd, 'wb') as tmp_file:
+            stream.seek(0)
+            while True:
+                block = stream.read(1024 * 1024)
+                if not block:
+                    break
+                tmp_file.write(block)
+        yield path
+    finally:
+        if os.path.exists(path):
+            os.unlink(path)
+
+
+def _load_legacy_doc(stream, source: str) -> list:
+    # Old binary .doc files have no stream parser; unstructured needs a path
+    from langchain_community.document_loaders import UnstructuredWordDocumentLoader
+
+    with temporary_path(stream, suffix=".doc") as path:
+        docs = UnstructuredWordDocumentLoader(path).load()
+    for doc in docs:
+        doc.metadata["source"] = source
+    return docs
+
+
+_LOADERS = {
+    'pdf': _load_pdf,
+    'docx': _load_docx,
+    'doc': _load_legacy_doc,
+}
+
+
+def load_document(stream, filename: str) -> list:
+    """
+    Load a document from a binary file-like object (upload stream, BytesIO, mmap).
+    Returns a list of LangChain Documents, one per PDF page.
+    """
+    ext = file_extension(filename)
+    loader = _LOADERS.get(ext)
+    if loader is None:
+        raise ValueError(f"Unsupported file type: .{ext}")
+    stream.seek(0)
+    return loader(stream, filename)
+
+
+@contextmanager
+def mapped_file(path: str):
+    """Memory-map a file read-only (empty files fall back to an empty buffer)"""
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            yield io.BytesIO(b"")
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            yield buf
+
+
+def load_document_from_path(path: str, filename: str = None) -> list:
+    """Load a document from disk through a memory map instead of a buffered copy"""
+    with mapped_file(path) as buf:
+        return load_document(buf, filename or os.path.basename(path))
@@ -0,0 +1,177 @@
+"""
+Local, deterministic bill extraction (Tesseract OCR + rules).
+
+Clean printed receipts ("GRAND TOTAL 1,234.00" under a bold merchant name)
+don't need a multimodal LLM call. This pass OCRs the preprocessed image on the
+CPU, applies the same rules the Gemini prompt spells out (total keywords,
+category hints) and reports a confidence; GeminiOCR only escalates to Gemini
+when the confidence is below LOCAL_OCR_MIN_CONFIDENCE.
+
+pytesseract and the tesseract binary are optional: without them
+extract_locally() returns None and every bill goes to Gemini as before.
+"""
+
+import io
+import os
+import re
+import time
+from datetime import datetime
+
+try:
+    import pytesseract
+    from PIL import Image
+    pytesseract.get_tesseract_version()
+    LOCAL_OCR_AVAILABLE = True
+except Exception:  # package or binary missing
+    LOCAL_OCR_AVAILABLE = False
+
+LOCAL_OCR_ENABLED = os.getenv("LOCAL_OCR_ENABLED", "true").lower() != "false"
+LOCAL_OCR_MIN_CONFIDENCE = float(os.getenv("LOCAL_OCR_MIN_CONFIDENCE", "0.8"))
+
+# Category rules shared with the Gemini prompt (see category_hints_prompt)
+CATEGORY_HINTS = {
+    'restaurants': ['dine-in', 'menu items', 'FSSAI', 'Table No', 'kitchen', 'cafe', 'dhaba'],
+    'food': ['Zomato', 'Swiggy', 'grocery', 'supermarket'],
+    'drinks': ['bar', 'pub', 'wine', 'beer', 'alcohol'],
+    'transport': ['uber', 'ola', 'taxi', 'fuel', 'flight', 'train'],
+    'fuel': ['petrol', 'diesel', 'cng', 'gas station'],
+    'clothes': ['apparel', 'fashion', 'zudio', 'trends'],
+    'education': ['school', 'college', 'books', 'stationery'],
+    'health': ['hospital', 'pharmacy', 'medicine', 'gym'],
+    'hotel': ['oyo', 'stay', 'room', 'resort'],
+    'fun': ['movie', 'cinema', 'game', 'netflix'],
+    'personal': ['salon', 'spa', 'grooming'],
+    'pets': ['vet', 'pet food'],
+    'others': ['shopping', 'electronics', 'recharge', 'bill'],
+}
+
+# Highest priority first; the prompt's "Bill Total", "Grand Total", "Total Rs"
+TOTAL_KEYWORDS = ['grand total', 'bill total', 'total rs', 'net amount', 'amount payable',
+                  'total amount', 'net payable', 'total']
+_NOT_TOTAL = re.compile(r'sub\s*-?\s*total|total\s*(qty|quantity|items?|savings?|discount|tax|gst)', re.I)
+_TOTAL_PATTERNS = [re.compile(r'\b' + re.escape(k).replace(r'\ ', r'\s*') + r'\b', re.I) for k in TOTAL_KEYWORDS]
+_AMOUNT = re.compile(r'(\d{1,3}(?:,\d{2,3})+(?:\.\d{1,2})?|\d+\.\d{1,2}|\d+)(?!.*\d)')
+# 'others' is the fallback, not evidence: its keywords ('bill', 'recharge') don't raise confidence
+_CATEGORY_PATTERNS = {
+    category: re.compile(r'\b(' + '|'.join(re.escape(k) for k in keywords) + r')\b', re.I)
+    for category, keywords in CATEGORY_HINTS.items() if category != 'others'
+}
+# Label lines every receipt has ("Bill No: 42", "Bill Total") say nothing about the category
+_LABEL_LINE = re.compile(r'\b(bill|invoice|receipt|order)\s*(no\b|num|#)', re.I)
+_DATE_PATTERNS = [
+    (re.compile(r'\b(\d{4})[-/.](\d{1,2})[-/.](\d{1,2})\b'), ('y', 'm', 'd')),
+    (re.compile(r'\b(\d{1,2})[-/.](\d{1,2})[-/.](\d{4}|\d{2})\b'), ('d', 'm', 'y')),  # day-first (India)
+    (re.compile(r'\b(\d{1,2})[\s-]*([A-Za-z]{3})[a-z]*[\s,-]*(\d{4}|\d{2})\b'), ('d', 'b', 'y')),
+]
+_MONTHS = {m: i for i, m in enumerate(['jan', 'feb', 'mar', 'apr', 'may', 'jun',
+                                       'jul', 'aug', 'sep', 'oct', 'nov', 'dec'], 1)}
+_NOT_MERCHANT = re.compile(r'tax invoice|invoice|receipt|gstin|gst no|phone|ph[:.]|tel|mob|www\.|@|'
+                           r'road|street|\brd\b|nagar|\d{6}|bill no|date', re.I)
+
+
+def category_hints_prompt() -> str:
+    """The CATEGORY HINTS block of the Gemini bill prompt, built from CATEGORY_HINTS"""
+    return "\n".join(f"- {category}: {', '.join(keywords)}" for category, keywords in CATEGORY_HINTS.items())
+
+
+def ocr_lines(image_bytes: bytes):
+    """(lines, mean word confidence 0-100) from Tesseract"""
+    with Image.open(io.BytesIO(image_bytes)) as img:
+        data = pytesseract.image_to_data(img, config='--psm 6', output_type=pytesseract.Output.DICT)
+    lines, confidences = {}, []
+    for i, word in enumerate(data['text']):
+        word = word.strip()
+        conf = float(data['conf'][i])
+        if not word or conf < 0:
+            continue
+        key = (data['block_num'][i], data['par_num'][i], data['line_num'][i])
+        lines.setdefault(key, []).append(word)
+        confidences.append(conf)
+    ordered = [' '.join(words) for _, words in sorted(lines.items())]
+    return ordered, (sum(confidences) / len(confidences) if confidences else 0.0)
+
+
+def find_total(lines):
+    """Amount on the highest-priority total line (last one wins within a priority)"""
+    for pattern in _TOTAL_PATTERNS:
+        amount = None
+        for line in lines:
+            if pattern.search(line) and not _NOT_TOTAL.search(line):
+                match = _AMOUNT.search(line[pattern.search(line).end():])
+                if match:
+                    amount = float(match.group(1).replace(',', ''))
+        if amount:
+            return amount, pattern is _TOTAL_PATTERNS[-1]
+    return None, False
+
+
+def find_merchant(lines):
+    """First name-like line in the receipt header"""
+    for line in lines[:6]:
+        letters = sum(c.isalpha() for c in line)
+        if letters >= 3 and letters >= len(line) / 2 and not _NOT_MERCHANT.search(line):
+            return line.strip(' -*:|')[:25]
+    return None
+
+
+def find_date(lines):
+    for line in lines:
+        for pattern, order in _DATE_PATTERNS:
+            match = pattern.search(line)
+            if not match:
+                continue
+            parts = dict(zip(order, match.groups()))
+            try:
+                month = _MONTHS[parts['b'][:3].lower()] if 'b' in parts else int(parts['m'])
+                year = int(parts['y']) + (2000 if len(parts['y']) == 2 else 0)
+                return datetime(year, month, int(parts['d'])).strftime("%Y-%m-%d")
+            except (KeyError, ValueError):
+                continue
+    return None
+
+
+def find_category(lines):
+    text = '\n'.join(line for line in lines if not _LABEL_LINE.search(line)
+                     and not any(pattern.search(line) for pattern in _TOTAL_PATTERNS))
+    counts = {category: len(pattern.findall(text)) for category, pattern in _CATEGORY_PATTERNS.items()}
+    category = max(counts, key=counts.get)
+    return (category, True) if counts[category] else ('others', False)
+
+
+def parse_receipt(lines, ocr_confidence: float = 100.0) -> dict:
+    """
+    Rule-based fields plus a 0-1 confidence. A total is mandatory; the other
+    fields and the OCR word confidence scale the score. Without a category hit
+    the score stays below 0.75, so an 'others' guess is left to Gemini.
+    """
+    amount, weak_total = find_total(lines)
+    merchant = find_merchant(lines)
+    date = find_date(lines)
+    category, category_hit = find_category(lines)
+
+    confidence = 0.0
+    if amount:
+        confidence = (0.45 if not weak_total else 0.3) + 0.15 * bool(merchant) + 0.1 * bool(date) + 0.3 * category_hit
+        confidence *= min(1.0, ocr_confidence / 85)
+    return {
+        "merchant": merchant or "Not Avl",
+        "amount": amount if amount else "0.00",
+        "date": date,
+        "category": category,
+        "confidence": round(confidence, 3),
+    }
+
+
+def extract_locally(image_bytes: bytes):
+    """Local extraction result (with 'confidence' and 'elapsed_ms'), or None if unavailable"""
+    if not (LOCAL_OCR_ENABLED and LOCAL_OCR_AVAILABLE):
+        return None
+    started = time.perf_counter()
+    try:
+        lines, ocr_confidence = ocr_lines(image_bytes)
+    except Exception as e:
+        print(f"⚠️ Local OCR failed: {e}")
+        return None
+    result = parse_receipt(lines, ocr_confidence)
+    result['elapsed_ms'] = round((time.perf_counter() - started) * 1000, 1)
+    return result
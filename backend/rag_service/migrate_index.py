@@ -0,0 +1,284 @@
+"""
+Re-embed every catalogued document into a shadow Pinecone index, then switch
+the serving alias to it - no wipe, no re-upload, no downtime.
+
+Usage:
+    python migrate_index.py --target fbuddy-rag-v2 [--model NAME] [--chunk-tokens N --sources DIR]
+                            [--workers 2] [--rate 5] [--switch]
+
+Documents are taken from the local catalog, in every namespace. Each one's
+chunk text is read back from the serving index by ID (fetch, no vector
+queries) and re-embedded with --model. With --chunk-tokens the text is
+re-chunked too, which needs the original files: those found in --sources are
+reloaded, the rest keep their stored chunks. Vectors keep their IDs and
+namespaces in the target index, which is created (with the new model's
+dimension) if missing.
+
+Only catalogued documents are migrated, so vectors indexed before the catalog
+existed would be left behind: --switch is refused while the serving index
+holds more vectors in any namespace than the catalog accounts for (re-ingest
+those documents first, e.g. with bulk_ingest.py, which also removes their
+pre-catalog copies).
+
+While it runs, /chat keeps serving from the current index. Documents ingested
+or deleted meanwhile are caught up before switching, and the per-namespace
+vector counts of the target are verified against the catalog. With --switch
+the catalog's serving alias and document rows are then updated in one
+transaction; the RAG service follows the alias within ALIAS_CHECK_SECONDS and
+the Streamlit app on its next start. The old index is left as it was until
+you delete it. Re-running after a failure is safe: IDs are deterministic, so
+finished documents are simply overwritten.
+
+Pinecone calls share a --rate token bucket and embedding runs on --workers
+threads at low CPU priority, so live /chat traffic keeps its headroom.
+"""
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from dotenv import load_dotenv
+
+load_dotenv(override=True)
+
+from langchain_core.documents import Document  # noqa: E402
+from pinecone import Pinecone, ServerlessSpec  # noqa: E402
+
+from catalog import SERVING_ALIAS, AliasConflictError, DocumentCatalog  # noqa: E402
+from chunker import CHUNK_TOKENS, EMBEDDING_MODEL, chunk_documents, load_tokenizer  # noqa: E402
+from index_layout import chunk_id, delete_ids, document_vectors, get_manifest, stale_ids  # noqa: E402
+from loaders import load_document_from_path  # noqa: E402
+from rate_limit import TokenBucket  # noqa: E402
+from text_normalize import normalize_documents  # noqa: E402
+
+PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
+PINECONE_INDEX_NAME = os.getenv("PINECONE_INDEX_NAME", "rag1")
+
+FETCH_BATCH_SIZE = 100
+UPSERT_BATCH_SIZE = 100
+CATCH_UP_ROUNDS = 5
+VERIFY_TIMEOUT_SECONDS = 120
+
+# Metadata written by document_vectors() itself; everything else is carried over
+_LAYOUT_KEYS = {"text", "source", "doc_id", "chunk_index", "chunk_count", "token_count", "page"}
+
+
+def _key(row):
+    return (row['namespace'], row['source'])
+
+
+class Migration:
+    def __init__(self, source, target, embeddings, model, chunk_tokens, sources_dir, rate):
+        self.source = source
+        self.target = target
+        self.embeddings = embeddings
+        self.model = model
+        self.chunk_tokens = chunk_tokens
+        self.rechunk = sources_dir is not None
+        self.sources_dir = sources_dir
+        self.bucket = TokenBucket(rate=rate, capacity=max(rate, 1))
+
+    def _fetch(self, ids, namespace):
+        self.bucket.acquire()
+        return self.source.fetch(ids=ids, namespace=namespace)["vectors"]
+
+    def stored_chunks(self, row):
+        """The document's chunks as stored in the serving index, in order, plus their extra metadata"""
+        ids = [chunk_id(row['doc_id'], i) for i in range(row['chunk_count'])]
+        chunks, extra = [], {}
+        for i in range(0, len(ids), FETCH_BATCH_SIZE):
+            found = self._fetch(ids[i:i + FETCH_BATCH_SIZE], row['namespace'])
+            for vector_id in ids[i:i + FETCH_BATCH_SIZE]:
+                if vector_id not in found:
+                    raise RuntimeError(f"{vector_id} is missing from the serving index")
+                meta = dict(found[vector_id]["metadata"] or {})
+                extra = {k: v for k, v in meta.items() if k not in _LAYOUT_KEYS}
+                chunks.append(Document(page_content=meta.get("text", ""), metadata={
+                    k: meta[k] for k in ("chunk_index", "token_count", "page") if k in meta}))
+        return chunks, extra
+
+    def rechunked(self, row):
+        """Fresh chunks from the original file in --sources, or None if it is not there"""
+        path = os.path.join(self.sources_dir, row['source'])
+        if not os.path.isfile(path):
+            return None
+        docs = normalize_documents(load_document_from_path(path, row['source']))
+        return chunk_documents(docs, tokenizer=load_tokenizer(self.model), max_tokens=self.chunk_tokens)
+
+    def migrate(self, row):
+        """Re-embed one document into the target index; returns its row with the new chunk_count"""
+        chunks, extra = self.stored_chunks(row)
+        if self.rechunk:
+            fresh = self.rechunked(row)
+            if fresh is None:
+                print(f"⚠️ {row['source']} not found in --sources, keeping its stored chunks")
+            else:
+                chunks = fresh
+        values = self.embeddings.embed_documents([doc.page_content for doc in chunks])
+        vectors = document_vectors(row['source'], chunks, values, **extra)
+        self.bucket.acquire()
+        previous = get_manifest(self.target, row['source'], row['namespace'])  # from an earlier run
+        for i in range(0, len(vectors), UPSERT_BATCH_SIZE):
+            self.bucket.acquire()
+            self.target.upsert(vectors=vectors[i:i + UPSERT_BATCH_SIZE], namespace=row['namespace'])
+        leftover = stale_ids(previous, len(vectors))
+        if leftover:
+            delete_ids(self.target, leftover, row['namespace'])
+        return {**row, 'chunk_count': len(vectors)}
+
+    def remove(self, row):
+        self.bucket.acquire()
+        delete_ids(self.target, stale_ids(row, 0), row['namespace'])
+
+
+def ensure_target(pc, name, dimension):
+    if name in pc.list_indexes().names():
+        return pc.Index(name)
+    print(f"🆕 Creating shadow index {name} (dimension {dimension})")
+    pc.create_index(name=name, dimension=dimension, metric="cosine",
+                    spec=ServerlessSpec(cloud='aws', region='us-east-1'))
+    while not pc.describe_index(name).status["ready"]:
+        time.sleep(2)
+    return pc.Index(name)
+
+
+def run_round(migration, rows, workers):
+    """Migrate `rows` in parallel; returns ({key: migrated row}, [failed keys])"""
+    done, failed = {}, []
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="migrate") as pool:
+        futures = {pool.submit(migration.migrate, row): row for row in rows}
+        for n, future in enumerate(as_completed(futures), 1):
+            row = futures[future]
+            try:
+                done[_key(row)] = future.result()
+                print(f"  [{n}/{len(rows)}] ✅ {row['namespace'] or '(global)'}/{row['source']} "
+                      f"({row['chunk_count']} -> {done[_key(row)]['chunk_count']} chunks)")
+            except Exception as e:
+                failed.append(_key(row))
+                print(f"  [{n}/{len(rows)}] ❌ {row['namespace'] or '(global)'}/{row['source']}: {e}")
+    elapsed = time.perf_counter() - started
+    chunks = sum(row['chunk_count'] for row in done.values())
+    print(f"⏱️ {len(done)} documents, {chunks} chunks in {elapsed:.1f}s ({chunks / max(elapsed, 1e-9):.1f} chunks/s)")
+    return done, failed
+
+
+def verify(target, migrated):
+    """Wait for the target's per-namespace vector counts to match the migrated chunk counts"""
+    expected = {}
+    for row in migrated.values():
+        expected[row['namespace']] = expected.get(row['namespace'], 0) + row['chunk_count']
+    deadline = time.monotonic() + VERIFY_TIMEOUT_SECONDS
+    while True:
+        stats = target.describe_index_stats().get('namespaces') or {}
+        actual = {ns: stats.get(ns, {}).get('vector_count', 0) for ns in expected}
+        if actual == expected:
+            print(f"✅ Verified {sum(expected.values())} vectors across {len(expected)} namespaces")
+            return True
+        if time.monotonic() > deadline:
+            for ns in expected:
+                if actual[ns] != expected[ns]:
+                    print(f"❌ Namespace {ns or '(global)'}: expected {expected[ns]} vectors, found {actual[ns]}")
+            return False
+        time.sleep(2)  # index stats are eventually consistent
+
+
+def uncatalogued(source, rows):
+    """{namespace: vectors in the serving index beyond the catalog's chunk counts}"""
+    expected = {}
+    for row in rows:
+        expected[row['namespace']] = expected.get(row['namespace'], 0) + row['chunk_count']
+    stats = source.describe_index_stats().get('namespaces') or {}
+    extra = {ns: info.get('vector_count', 0) - expected.get(ns, 0) for ns, info in stats.items()}
+    return {ns: n for ns, n in extra.items() if n > 0}
+
+
+def report_uncatalogued(extra):
+    for ns, n in sorted(extra.items()):
+        print(f"⚠️ Namespace {ns or '(global)'}: {n} vectors in the serving index are not in the catalog")
+    print("   They were indexed before the catalog and would not be migrated; re-ingest those documents first")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target", required=True, help="Pinecone index to migrate into")
+    parser.add_argument("--model", default=EMBEDDING_MODEL, help="embedding model for the target")
+    parser.add_argument("--chunk-tokens", type=int, help="re-chunk to this size (needs --sources)")
+    parser.add_argument("--sources", help="directory with the original documents, for re-chunking")
+    parser.add_argument("--workers", type=int, default=2, help="documents migrated in parallel")
+    parser.add_argument("--rate", type=float, default=5, help="Pinecone calls per second")
+    parser.add_argument("--switch", action="store_true", help="repoint the serving alias when verified")
+    args = parser.parse_args()
+    if (args.chunk_tokens is None) != (args.sources is None):
+        parser.error("--chunk-tokens and --sources go together")
+
+    catalog = DocumentCatalog()
+    alias = catalog.resolve_alias(SERVING_ALIAS)
+    source_name = alias['target'] if alias else PINECONE_INDEX_NAME
+    chunk_tokens = args.chunk_tokens or (alias['chunk_tokens'] if alias else CHUNK_TOKENS)
+    if args.target == source_name:
+        parser.error(f"{args.target} is the index currently serving")
+
+    if hasattr(os, "nice"):
+        os.nice(10)  # embedding is CPU-bound; let the live service win
+
+    from langchain_community.embeddings import HuggingFaceEmbeddings
+    embeddings = HuggingFaceEmbeddings(model_name=args.model, model_kwargs={"device": "cpu"},
+                                       encode_kwargs={"normalize_embeddings": True})
+    dimension = len(embeddings.embed_query("dimension probe"))
+
+    pc = Pinecone(api_key=PINECONE_API_KEY)
+    migration = Migration(pc.Index(source_name), ensure_target(pc, args.target, dimension), embeddings,
+                          args.model, chunk_tokens, args.sources, args.rate)
+    print(f"🚚 Migrating {source_name} -> {args.target} ({args.model}, {chunk_tokens}-token chunks)")
+    extra = uncatalogued(migration.source, catalog.documents())
+    if extra:
+        report_uncatalogued(extra)
+        if args.switch:
+            sys.exit(1)  # fail before spending the embedding time
+
+    # First pass over a snapshot, then catch up with ingests/deletes made meanwhile
+    migrated = {}
+    rows = catalog.documents()
+    for round_no in range(CATCH_UP_ROUNDS + 1):
+        done, failed = run_round(migration, rows, args.workers)
+        migrated.update(done)
+        if failed:
+            print(f"❌ {len(failed)} documents failed; fix the cause and re-run")
+            sys.exit(1)
+        current = {_key(row): row for row in catalog.documents()}
+        for key in [k for k in migrated if k not in current]:
+            migration.remove(migrated.pop(key))
+        rows = [row for key, row in current.items()
+                if key not in migrated or row['ingested_at'] != migrated[key]['ingested_at']]
+        if not rows:
+            break
+        print(f"🔁 Catch-up round {round_no + 1}: {len(rows)} documents changed during migration")
+    else:
+        print("❌ Documents keep changing; re-run during a quieter period")
+        sys.exit(1)
+
+    if not verify(migration.target, migrated):
+        sys.exit(1)
+    if not args.switch:
+        print(f"ℹ️ {args.target} is ready; re-run with --switch to serve from it")
+        return
+    # Index stats are eventually consistent: a fresh ingest may briefly look uncatalogued
+    extra = uncatalogued(migration.source, catalog.documents())
+    if extra:
+        report_uncatalogued(extra)
+        print("❌ Not switched. Re-run once the catalog covers the serving index.")
+        sys.exit(1)
+    try:
+        catalog.switch_alias(args.target, args.model, chunk_tokens, list(migrated.values()))
+    except AliasConflictError as e:
+        print(f"❌ Not switched: {e}. Re-run to catch up.")
+        sys.exit(1)
+    print(f"🔀 Serving alias now points at {args.target}. {source_name} is untouched; delete it once satisfied.")
+    print(f"   Set EMBEDDING_MODEL={args.model} and RAG_CHUNK_TOKENS={chunk_tokens} for tools that do not read the alias.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""
+Prompt assembly for /chat.
+
+The instructions that never change come first as one constant prefix, and the
+per-request parts (financial status, document context, conversation, question)
+follow it. Gemini's implicit context caching matches on an identical prompt
+prefix, so keeping the rules ahead of any dynamic text lets repeated calls hit
+the cache once the prefix qualifies (LLMClient.stats() reports cached_tokens).
+Sections are f-strings, which Python compiles once, rather than str.format
+templates that are re-parsed on every call, and the financial-status block is
+built once instead of in both branches of the old builder.
+"""
+
+from functools import lru_cache
+
+CHAT_SYSTEM_PREFIX = """You are F-Buddy AI, a friendly financial assistant.
+RULES:
+- Answer directly in 2-4 simple, conversational sentences.
+- For "Can I buy X?", compare the cost to the Wallet Balance or Net Worth in the financial status.
+- No markdown symbols, no "Based on the context" phrases, no closing summary.
+- Use the DOCUMENT CONTEXT when given, otherwise general finance knowledge.
+- Add a brief disclaimer only for major financial decisions.
+- If it is not about finance, politely say you only help with money topics.
+"""
+
+
+@lru_cache(maxsize=256)
+def _nice_key(key: str) -> str:
+    # "total_balance" -> "Total Balance"
+    return key.replace('_', ' ').title()
+
+
+def financial_status(realtime_context) -> str:
+    return "".join([f"- {_nice_key(key)}: {value}\n" for key, value in realtime_context.items()])
+
+
+def build_chat_prompt(query: str, context_chunks, realtime_context, history: str = "") -> str:
+    """
+    Static rules, then financial status, documents, the session's summarized
+    conversation and the question; empty sections are left out.
+    """
+    financial = f"\nFINANCIAL STATUS (real-time):\n{financial_status(realtime_context)}" if realtime_context else ""
+    documents = f"\nDOCUMENT CONTEXT:\n{chr(10).join(context_chunks)}\n" if context_chunks else ""
+    conversation = f"\nCONVERSATION SO FAR:\n{history}\n" if history else ""
+    return f"{CHAT_SYSTEM_PREFIX}{financial}{documents}{conversation}\nUSER QUESTION:\n{query}\n\nAnswer directly:\n"
@@ -5,11 +5,14 @@
 """
 
 import os
-import uuid
-import re
 import json
 import sys
 import io
+import time
+import math
+import threading
+from functools import wraps
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 # Force UTF-8 encoding for stdout/stderr to handle emojis on Windows
 if sys.stdout.encoding != 'utf-8':
@@ -18,15 +21,31 @@
     sys.stderr.reconfigure(encoding='utf-8')
 
 from datetime import datetime
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, stream_with_context, g
 from flask_cors import CORS
 from dotenv import load_dotenv
 from pinecone import Pinecone, ServerlessSpec
 from langchain_community.embeddings import HuggingFaceEmbeddings
-from langchain_community.document_loaders import Docx2txtLoader, PyPDFLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-import google.generativeai as genai
 from werkzeug.utils import secure_filename
+from loaders import load_document, load_document_from_path
+from text_normalize import normalize_documents
+from chunker import CHUNK_TOKENS, EMBEDDING_MODEL, chunk_documents, load_tokenizer
+from rate_limit import AdmissionController, TokenBucket
+from bill_cache import BillResultCache, Fingerprint
+from image_preprocess import preprocess_bill_image
+from llm_client import DEFAULT_MODEL, PRIORITY_BULK, PRIORITY_NORMAL, LLMBusyError, LLMClient
+from local_ocr import LOCAL_OCR_MIN_CONFIDENCE, category_hints_prompt, extract_locally
+from metrics import CONTENT_TYPE, Counter, Gauge, Histogram, render_metrics
+from tracing import REQUEST_ID_HEADER, Trace, request_id_from
+from intent import classify_query, fast_answer
+from resilience import AnswerCache, LLMUnavailableError, ResilientLLM, degraded_answer
+from session_store import SessionStore
+from prompts import build_chat_prompt
+from response_cleaner import clean_response
+from index_layout import (delete_document, delete_ids, delete_legacy_vectors, document_id, document_vectors,
+                          get_manifest, namespaces_for, query_namespaces, stale_ids, user_namespace)
+from catalog import SERVING_ALIAS, AliasMovedError, DocumentCatalog, content_hash
+from chunked_upload import DONE, FAILED, ChunkedUploadStore, UploadError
 
 # Aggressively clear system-level Gemini/Google keys that might be stale
 import os
@@ -45,8 +64,29 @@
 ALLOWED_EXTENSIONS = {'docx', 'doc', 'pdf'}
 TOP_K = 7
 
-# Create upload folder if not exists
+# Batch bill scanning: bounded worker pool + rate limit on Gemini calls
+BILL_SCAN_CONCURRENCY = int(os.getenv("BILL_SCAN_CONCURRENCY", "4"))
+BILL_SCAN_MAX_FILES = int(os.getenv("BILL_SCAN_MAX_FILES", "50"))
+GEMINI_REQUESTS_PER_SEC = float(os.getenv("GEMINI_REQUESTS_PER_SEC", "2"))
+
+# Admission control: per-user requests/minute and global requests/second
+RATE_LIMITS = {
+    'chat': (float(os.getenv("CHAT_USER_RPM", "20")), float(os.getenv("CHAT_GLOBAL_RPS", "10"))),
+    'scan_bill': (float(os.getenv("SCAN_USER_RPM", "30")), float(os.getenv("SCAN_GLOBAL_RPS", "5"))),
+    'upload': (float(os.getenv("UPLOAD_USER_RPM", "6")), float(os.getenv("UPLOAD_GLOBAL_RPS", "1"))),
+    'upload_part': (float(os.getenv("UPLOAD_PART_USER_RPM", "600")), float(os.getenv("UPLOAD_PART_GLOBAL_RPS", "20"))),
+}
+INGEST_CONCURRENCY = int(os.getenv("INGEST_CONCURRENCY", "1"))
+INGEST_RETRY_AFTER = 5
+# Parallel Pinecone queries when /chat searches global + per-user namespaces
+QUERY_CONCURRENCY = int(os.getenv("QUERY_CONCURRENCY", "8"))
+# How often requests re-read the catalog's serving alias (repointed by migrate_index.py)
+ALIAS_CHECK_SECONDS = float(os.getenv("ALIAS_CHECK_SECONDS", "10"))
+
+# Upload folder only holds documents dropped in for auto-ingest (e.g. context.pdf)
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+# Parts of in-progress chunked uploads (see chunked_upload.py)
+UPLOAD_STAGING_FOLDER = os.getenv("UPLOAD_STAGING_FOLDER", os.path.join(UPLOAD_FOLDER, '.partial'))
 
 # Initialize Flask app
 app = Flask(__name__)
@@ -57,64 +97,60 @@
 pc_client = None
 index = None
 embeddings = None
-gemini_model = None
-
-def sanitize_text(text: str) -> str:
-    """Sanitize text to remove problematic characters"""
-    if not text:
-        return ""
-    # Remove non-ASCII characters
-    text = text.encode('ascii', 'ignore').decode('ascii')
-    # Remove control characters except newlines
-    text = re.sub(r'[\x00-\x08\x0b\x0c\x0e-\x1f\x7f-\x9f]', '', text)
-    return text.strip()
-
-def clean_response(text: str) -> str:
-    """Clean up Gemini response to remove markdown and unwanted phrases"""
-    if not text:
-        return ""
-    
-    # Remove markdown symbols
-    text = re.sub(r'\*\*([^*]+)\*\*', r'\1', text)  # Bold
-    text = re.sub(r'\*([^*]+)\*', r'\1', text)      # Italic
-    text = re.sub(r'#{1,6}\s*', '', text)           # Headers
-    text = re.sub(r'`([^`]+)`', r'\1', text)        # Inline code
-    text = re.sub(r'^\s*[-*+]\s+', '', text, flags=re.MULTILINE)  # Bullet points
-    text = re.sub(r'^\s*\d+\.\s+', '', text, flags=re.MULTILINE)  # Numbered lists
-    
-    # Remove common unwanted phrases
-    unwanted_starts = [
-        r'^Based on (the|my|this|your).*?,\s*',
-        r'^According to.*?,\s*',
-        r'^From (the|my|this).*?,\s*',
-        r'^The (context|document|information).*?,\s*',
-        r'^In (conclusion|summary|short),?\s*',
-        r'^To (summarize|conclude|sum up),?\s*',
-        r'^Overall,?\s*',
-        r'^Generally (speaking)?,?\s*',
-    ]
-    for pattern in unwanted_starts:
-        text = re.sub(pattern, '', text, flags=re.IGNORECASE)
-    
-    # Remove trailing phrases
-    unwanted_ends = [
-        r'\s*I hope this helps!?\s*$',
-        r'\s*Let me know if.*$',
-        r'\s*Feel free to.*$',
-        r'\s*Is there anything else.*$',
-    ]
-    for pattern in unwanted_ends:
-        text = re.sub(pattern, '', text, flags=re.IGNORECASE)
-    
-    # Clean up whitespace
-    text = re.sub(r'\n{3,}', '\n\n', text)
-    text = text.strip()
-    
-    return text
+# What `index` and `embeddings` currently serve; follows the catalog's serving alias
+serving_index_name = PINECONE_INDEX_NAME
+serving_model = EMBEDDING_MODEL
+serving_chunk_tokens = CHUNK_TOKENS
+serving_dimension = None  # of `embeddings`, known once loaded
+_alias_checked = 0.0
+_alias_lock = threading.Lock()
+
+# One configured Gemini client shared by /chat and bill scanning
+llm = LLMClient()
+# /chat calls go through deadlines, hedging and a circuit breaker
+resilient_llm = ResilientLLM(llm)
+answer_cache = AnswerCache()
+sessions = SessionStore()
+# What is indexed, per source - answers /stats and startup checks without querying Pinecone
+catalog = DocumentCatalog()
+
+bill_scan_pool = ThreadPoolExecutor(max_workers=BILL_SCAN_CONCURRENCY, thread_name_prefix="bill-scan")
+query_pool = ThreadPoolExecutor(max_workers=QUERY_CONCURRENCY, thread_name_prefix="pinecone-query")
+chunked_uploads = ChunkedUploadStore(UPLOAD_STAGING_FOLDER)
+# Completed chunked uploads are ingested in the background
+ingest_pool = ThreadPoolExecutor(max_workers=INGEST_CONCURRENCY, thread_name_prefix="ingest")
+gemini_rate_limiter = TokenBucket(rate=GEMINI_REQUESTS_PER_SEC, capacity=BILL_SCAN_CONCURRENCY)
+bill_cache = BillResultCache()
+admission = AdmissionController(RATE_LIMITS)
+# Ingestion is CPU-heavy bulk work; cap it so it can't crowd out interactive chat
+ingest_slots = threading.BoundedSemaphore(INGEST_CONCURRENCY)
+
+# Metrics (scraped from /metrics)
+REQUESTS = Counter('rag_requests_total', 'HTTP requests by endpoint and status', ('endpoint', 'status'))
+REQUEST_LATENCY = Histogram('rag_request_duration_seconds', 'HTTP request latency', ('endpoint',))
+STAGE_LATENCY = Histogram('rag_stage_duration_seconds', 'Latency of pipeline stages', ('pipeline', 'stage'))
+INGEST_DOCUMENTS = Counter('rag_ingest_documents_total', 'Documents processed for ingestion', ('status',))
+INGEST_CHUNKS = Counter('rag_ingest_chunks_total', 'Chunks embedded and upserted')
+INGEST_BYTES = Counter('rag_ingest_bytes_total', 'UTF-8 bytes of normalized text ingested')
+INGEST_BATCHES = Counter('rag_ingest_batches_total', 'Pinecone upsert batches sent')
+BILL_EXTRACTIONS = Counter('rag_bill_extractions_total', 'Bill extractions by result source', ('source',))
+LLM_IN_FLIGHT = Gauge('rag_llm_in_flight', 'Gemini calls currently in flight')
+LLM_IN_FLIGHT.set_function(lambda: llm.in_flight)
+LLM_QUEUED = Gauge('rag_llm_queued', 'Gemini calls waiting for a concurrency slot')
+LLM_QUEUED.set_function(lambda: llm.queued)
+LLM_FALLBACKS = Counter('rag_llm_fallbacks_total', 'Degraded chat answers by cause and source', ('reason', 'source'))
+LLM_CIRCUIT_OPEN = Gauge('rag_llm_circuit_open', '1 while the Gemini circuit breaker is open or probing')
+LLM_CIRCUIT_OPEN.set_function(lambda: int(resilient_llm.breaker.state != 'closed'))
+FAST_PATH_ANSWERS = Counter('rag_fast_path_answers_total', 'Chat answers computed from realtime context without the LLM', ('intent',))
+REJECTED = Counter('rag_rejected_total', 'Requests answered with 429', ('endpoint', 'reason'))
+CHAT_SESSIONS = Gauge('rag_chat_sessions', 'Live server-side chat sessions')
+CHAT_SESSIONS.set_function(lambda: len(sessions))
+CACHE_HIT_RATIO = Gauge('rag_cache_hit_ratio', 'Lookup hit ratio per cache', ('cache',))
+CACHE_HIT_RATIO.set_function(lambda: bill_cache.stats()['hit_ratio'], cache='bill')
 
 def init_clients():
     """Initialize Pinecone, Embeddings, and Gemini clients"""
-    global pc_client, index, embeddings, gemini_model
+    global pc_client, index, embeddings, serving_dimension
     
     if pc_client is not None:
         return  # Already initialized
@@ -124,34 +160,31 @@ def init_clients():
         
         # Initialize Pinecone
         pc_client = Pinecone(api_key=PINECONE_API_KEY)
+        _adopt_serving_alias(catalog.resolve_alias(SERVING_ALIAS))
+        
+        # Initialize embeddings model; a new index gets its dimension
+        embeddings = load_embeddings(serving_model)
+        serving_dimension = embedding_dimension(embeddings)
+        print(f"✅ Loaded embedding model ({serving_model}, dimension {serving_dimension})")
         
         # Check/Create index
         try:
-            index = pc_client.Index(PINECONE_INDEX_NAME)
-            print(f"✅ Connected to Pinecone index: {PINECONE_INDEX_NAME}")
+            index = pc_client.Index(serving_index_name)
+            print(f"✅ Connected to Pinecone index: {serving_index_name}")
         except Exception as e:
-            print(f"⚠️ Index not found, creating: {PINECONE_INDEX_NAME}")
+            print(f"⚠️ Index not found, creating: {serving_index_name}")
             pc_client.create_index(
-                name=PINECONE_INDEX_NAME,
-                dimension=384,
+                name=serving_index_name,
+                dimension=serving_dimension,
                 metric="cosine",
                 spec=ServerlessSpec(
                     cloud='aws',
                     region='us-east-1'
                 )
             )
-            import time
             time.sleep(3)
-            index = pc_client.Index(PINECONE_INDEX_NAME)
-            print(f"✅ Created Pinecone index: {PINECONE_INDEX_NAME}")
-        
-        # Initialize embeddings model
-        embeddings = HuggingFaceEmbeddings(
-            model_name="sentence-transformers/all-MiniLM-L6-v2",
-            model_kwargs={"device": "cpu"},
-            encode_kwargs={"normalize_embeddings": True}
-        )
-        print("✅ Loaded embedding model")
+            index = pc_client.Index(serving_index_name)
+            print(f"✅ Created Pinecone index: {serving_index_name}")
         
         # Initialize Gemini
         current_gemini_key = os.getenv("GEMINI_API_KEY")
@@ -159,19 +192,185 @@ def init_clients():
             raise ValueError("GEMINI_API_KEY not found in environment")
             
         print(f"🔑 Initializing Gemini with Key Prefix: {current_gemini_key[:10]}...")
-        genai.configure(api_key=current_gemini_key)
-        # Re-initialize the global gemini_model to use a supported 2.x model
-        gemini_model = genai.GenerativeModel("gemini-2.5-flash")
-        print("✅ Initialized Gemini model (gemini-2.5-flash)")
+        llm.configure(current_gemini_key)
+        llm.model()
+        print(f"✅ Initialized Gemini model ({DEFAULT_MODEL})")
         
     except Exception as e:
         print(f"❌ Error initializing clients: {str(e)}")
         raise
 
+def load_embeddings(model_name: str):
+    return HuggingFaceEmbeddings(
+        model_name=model_name,
+        model_kwargs={"device": "cpu"},
+        encode_kwargs={"normalize_embeddings": True}
+    )
+
+def embedding_dimension(model) -> int:
+    return len(model.embed_query("dimension probe"))
+
+def _adopt_serving_alias(alias):
+    """Take the alias's index name, model and chunk size (when set) as the serving setup"""
+    global serving_index_name, serving_model, serving_chunk_tokens
+    if alias is not None:
+        serving_index_name = alias['target']
+        serving_model = alias['embedding_model']
+        serving_chunk_tokens = alias['chunk_tokens']
+
+def follow_serving_alias(force: bool = False):
+    """
+    Switch `index` (and `embeddings`, if the model changed) once migrate_index.py
+    repoints the serving alias. Checked at most every ALIAS_CHECK_SECONDS; one
+    request does the switch while the others keep using the current index.
+    Writers pass force=True: it checks now and waits for a switch in progress.
+    """
+    global index, embeddings, serving_dimension, _alias_checked
+    now = time.monotonic()
+    if not force and now - _alias_checked < ALIAS_CHECK_SECONDS:
+        return
+    if not _alias_lock.acquire(blocking=force):
+        return
+    try:
+        _alias_checked = now
+        alias = catalog.resolve_alias(SERVING_ALIAS)
+        if alias is None or (alias['target'], alias['embedding_model'], alias['chunk_tokens']) == \
+                (serving_index_name, serving_model, serving_chunk_tokens):
+            return
+        new_embeddings = embeddings if alias['embedding_model'] == serving_model else load_embeddings(alias['embedding_model'])
+        index, embeddings = pc_client.Index(alias['target']), new_embeddings
+        serving_dimension = embedding_dimension(new_embeddings)
+        _adopt_serving_alias(alias)
+        print(f"🔀 Serving alias now points at {serving_index_name} ({serving_model}, {serving_chunk_tokens}-token chunks)")
+    except Exception as e:
+        print(f"⚠️ Could not follow serving alias: {e}")
+    finally:
+        _alias_lock.release()
+
 def allowed_file(filename):
     """Check if file extension is allowed"""
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+def ingest_documents(docs, source: str, user_id=None) -> int:
+    """
+    Chunk, embed and upsert loaded documents into the global namespace, or the
+    user's namespace when user_id is given; returns the number of chunks stored.
+    Re-ingesting a source overwrites its chunks and deletes any left over;
+    unchanged content (same hash, model and chunk size) is skipped.
+    """
+    namespace = user_namespace(user_id)
+    digest = content_hash(docs)
+    model, chunk_tokens, model_embeddings = serving_model, serving_chunk_tokens, embeddings
+    if catalog.is_current(source, digest, namespace, chunk_tokens, model):
+        print(f"⏭️ {source} is unchanged since its last ingest, skipping")
+        return catalog.get(source, namespace)['chunk_count']
+    
+    print("✂️ Splitting into chunks...")
+    with STAGE_LATENCY.time(pipeline='ingest', stage='chunk'):
+        chunks = chunk_documents(docs, tokenizer=load_tokenizer(model), max_tokens=chunk_tokens)
+    if not chunks:
+        return 0
+    
+    print(f"🚀 Uploading {len(chunks)} chunks to Pinecone...")
+    texts = [doc.page_content for doc in chunks]
+    with STAGE_LATENCY.time(pipeline='ingest', stage='embed'):
+        all_embeddings = model_embeddings.embed_documents(texts)
+    extra = {"uploaded_at": datetime.now().isoformat()}
+    if user_id:
+        extra["user_id"] = str(user_id)
+    vectors_to_upsert = document_vectors(source, chunks, all_embeddings, **extra)
+    size = sum(len(doc.page_content.encode('utf-8')) for doc in docs)
+    
+    # The catalog row is 'pending' until every batch is in, 'ready' after
+    try:
+        with catalog.ingesting(source, document_id(source), digest, len(vectors_to_upsert), size, namespace,
+                               model, chunk_tokens) as previous:
+            # The pending row keeps migrate_index.py from switching the alias
+            # until this block ends: catch up now and `index` stays the serving one
+            follow_serving_alias(force=True)
+            catalog.check_alias(serving_index_name, serving_model)  # raises if following failed
+            if (serving_model, serving_chunk_tokens) != (model, chunk_tokens):
+                raise AliasMovedError(f"serving alias moved to {serving_model}, {serving_chunk_tokens}-token chunks")
+            if previous is None:
+                previous = get_manifest(index, source, namespace)  # indexed before the catalog existed
+                delete_legacy_vectors(index, source, user_id)  # ...or before per-document IDs
+            # Upsert in batches
+            batch_size = 100
+            for i in range(0, len(vectors_to_upsert), batch_size):
+                with STAGE_LATENCY.time(pipeline='ingest', stage='upsert'):
+                    index.upsert(vectors=vectors_to_upsert[i:i + batch_size], namespace=namespace)
+                INGEST_BATCHES.inc()
+            # A shorter re-upload leaves the old tail behind; drop it by ID
+            leftover = stale_ids(previous, len(vectors_to_upsert))
+            if leftover:
+                delete_ids(index, leftover, namespace)
+    except AliasMovedError as e:
+        if (serving_model, serving_chunk_tokens) == (model, chunk_tokens):
+            raise  # the alias moved but this process could not follow it
+        # Chunked and embedded for the old setup: redo it for the one now serving
+        print(f"🔀 {e} while ingesting {source}; re-embedding")
+        return ingest_documents(docs, source, user_id)
+    
+    INGEST_CHUNKS.inc(len(vectors_to_upsert))
+    INGEST_BYTES.inc(size)
+    return len(vectors_to_upsert)
+
+def _observe_chat_stage(stage, seconds):
+    STAGE_LATENCY.observe(seconds, pipeline='chat', stage=stage)
+
+@app.before_request
+def _start_timer():
+    g.request_started = time.perf_counter()
+    # Reuse the caller's ID so one user action can be followed across services
+    g.request_id = request_id_from(request.headers.get(REQUEST_ID_HEADER))
+    if pc_client is not None:
+        follow_serving_alias()
+
+@app.after_request
+def _record_request(response):
+    # Route pattern, not the raw path, so unknown URLs can't blow up label cardinality
+    endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+    started = getattr(g, 'request_started', None)
+    if started is not None:
+        REQUEST_LATENCY.observe(time.perf_counter() - started, endpoint=endpoint)
+    REQUESTS.inc(endpoint=endpoint, status=response.status_code)
+    response.headers[REQUEST_ID_HEADER] = g.get('request_id', '')
+    trace = g.get('trace')
+    if trace is not None:
+        trace.finish(response.status_code)
+    return response
+
+def _client_key() -> str:
+    """Rate-limit key: the caller's user ID if given, else its address"""
+    user_id = request.headers.get('X-User-ID') or request.form.get('user_id')
+    if not user_id and request.is_json:
+        user_id = (request.get_json(silent=True) or {}).get('user_id')
+    return f"user:{user_id}" if user_id else f"ip:{request.remote_addr}"
+
+def _too_many(endpoint: str, reason: str, retry_after: float, message: str):
+    REJECTED.inc(endpoint=endpoint, reason=reason)
+    response = jsonify({'success': False, 'message': message, 'retry_after': math.ceil(retry_after)})
+    response.status_code = 429
+    response.headers['Retry-After'] = str(math.ceil(retry_after))
+    return response
+
+def admission_limited(endpoint: str):
+    """Reject with 429 + Retry-After when the per-user or global bucket is empty"""
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            wait = admission.check(endpoint, _client_key())
+            if wait:
+                return _too_many(endpoint, 'rate_limit', wait, 'Too many requests, please slow down')
+            return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus scrape endpoint"""
+    return Response(render_metrics(), content_type=CONTENT_TYPE)
+
 @app.route('/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
@@ -182,8 +381,17 @@ def health_check():
     })
 
 @app.route('/upload-documents', methods=['POST'])
+@admission_limited('upload')
 def upload_documents():
     """Upload and ingest DOCX documents into Pinecone"""
+    if not ingest_slots.acquire(blocking=False):
+        return _too_many('upload', 'busy', INGEST_RETRY_AFTER, 'Another ingestion is running, retry shortly')
+    try:
+        return _ingest_uploaded_files()
+    finally:
+        ingest_slots.release()
+
+def _ingest_uploaded_files():
     try:
         # Initialize clients if not already done
         if pc_client is None:
@@ -197,64 +405,28 @@ def upload_documents():
         if not files or files[0].filename == '':
             return jsonify({'success': False, 'message': 'No files selected'}), 400
         
+        # Uploads tagged with a user go to that user's namespace, the rest are global
+        user_id = request.form.get('user_id')
         results = []
         total_chunks = 0
         
         for file in files:
             if file and allowed_file(file.filename):
                 filename = secure_filename(file.filename)
-                filepath = os.path.join(UPLOAD_FOLDER, f"{uuid.uuid4()}_{filename}")
-                file.save(filepath)
                 
                 try:
-                    # Load document based on file type
+                    # Parse straight from the upload stream - no save/re-read round trip
                     print(f"📄 Loading document: {filename}")
-                    if filename.lower().endswith('.pdf'):
-                        loader = PyPDFLoader(filepath)
-                    else:
-                        loader = Docx2txtLoader(filepath)
-                    docs = loader.load()
-                    
-                    # Split into chunks
-                    print("✂️ Splitting into chunks...")
-                    splitter = RecursiveCharacterTextSplitter(
-                        chunk_size=500,
-                        chunk_overlap=100
-                    )
-                    chunks = splitter.split_documents(docs)
-                    
-                    # Embed and upload to Pinecone
-                    print(f"🚀 Uploading {len(chunks)} chunks to Pinecone...")
-                    vectors_to_upsert = []
-                    
-                    for doc in chunks:
-                        text = sanitize_text(doc.page_content)
-                        if not text:
-                            continue
-                        
-                        embedding = embeddings.embed_query(text)
-                        point_id = str(uuid.uuid4())
-                        
-                        vectors_to_upsert.append({
-                            "id": point_id,
-                            "values": embedding,
-                            "metadata": {
-                                "text": text,
-                                "source": filename,
-                                "uploaded_at": datetime.now().isoformat()
-                            }
-                        })
+                    with STAGE_LATENCY.time(pipeline='ingest', stage='load'):
+                        docs = normalize_documents(load_document(file.stream, filename))
                     
-                    # Upsert in batches
-                    batch_size = 100
-                    for i in range(0, len(vectors_to_upsert), batch_size):
-                        batch = vectors_to_upsert[i:i + batch_size]
-                        index.upsert(vectors=batch)
+                    chunk_count = ingest_documents(docs, filename, user_id)
+                    INGEST_DOCUMENTS.inc(status='success')
                     
-                    total_chunks += len(vectors_to_upsert)
+                    total_chunks += chunk_count
                     results.append({
                         'filename': filename,
-                        'chunks': len(vectors_to_upsert),
+                        'chunks': chunk_count,
                         'success': True
                     })
                     
@@ -266,12 +438,8 @@ def upload_documents():
                         'error': str(e),
                         'success': False
                     })
+                    INGEST_DOCUMENTS.inc(status='error')
                     print(f"❌ Error processing {filename}: {str(e)}")
-                
-                finally:
-                    # Cleanup file
-                    if os.path.exists(filepath):
-                        os.unlink(filepath)
             else:
                 results.append({
                     'filename': file.filename,
@@ -293,7 +461,131 @@ def upload_documents():
             'message': str(e)
         }), 500
 
+def _upload_error(e: UploadError):
+    return jsonify({'success': False, 'message': str(e)}), e.status
+
+@app.route('/uploads', methods=['POST'])
+@admission_limited('upload')
+def init_upload():
+    """Start a chunked upload: {filename, size, sha256?, part_size?, user_id?} -> upload_id and part layout"""
+    data = request.get_json(silent=True) or {}
+    filename = secure_filename(data.get('filename') or '')
+    if not filename or not allowed_file(filename):
+        return jsonify({'success': False, 'message': 'Invalid file type'}), 400
+    try:
+        chunked_uploads.expire()
+        meta = chunked_uploads.init(filename, data.get('size'), data.get('sha256'),
+                                    data.get('part_size'), data.get('user_id'))
+    except UploadError as e:
+        return _upload_error(e)
+    return jsonify({'success': True, **meta}), 201
+
+@app.route('/uploads/<upload_id>/parts/<int:number>', methods=['PUT'])
+@admission_limited('upload_part')
+def put_upload_part(upload_id, number):
+    """Raw part bytes in the body, streamed to disk; X-Content-SHA256 is checked if sent"""
+    try:
+        sha256 = chunked_uploads.put_part(upload_id, number, request.stream, request.headers.get('X-Content-SHA256'))
+    except UploadError as e:
+        return _upload_error(e)
+    return jsonify({'success': True, 'part': number, 'sha256': sha256})
+
+@app.route('/uploads/<upload_id>', methods=['GET'])
+def get_upload(upload_id):
+    """State plus received/missing parts, so a client can resume after a failure"""
+    try:
+        return jsonify({'success': True, **chunked_uploads.status(upload_id)})
+    except UploadError as e:
+        return _upload_error(e)
+
+@app.route('/uploads/<upload_id>/complete', methods=['POST'])
+@admission_limited('upload')
+def complete_upload(upload_id):
+    """Assemble the parts and start ingesting in the background; poll GET /uploads/<id> for the result"""
+    try:
+        path = chunked_uploads.assemble(upload_id)
+        meta = chunked_uploads.status(upload_id)
+    except UploadError as e:
+        return _upload_error(e)
+    ingest_pool.submit(_ingest_upload, upload_id, path, meta['filename'], meta.get('user_id'))
+    print(f"📦 Upload {upload_id} complete ({meta['size']} bytes), ingesting {meta['filename']}")
+    return jsonify({'success': True, 'upload_id': upload_id, 'state': meta['state']}), 202
+
+@app.route('/uploads/<upload_id>', methods=['DELETE'])
+def abort_upload(upload_id):
+    try:
+        chunked_uploads.abort(upload_id)
+    except UploadError as e:
+        return _upload_error(e)
+    return jsonify({'success': True})
+
+def _ingest_upload(upload_id, path, filename, user_id):
+    try:
+        # Shares the ingestion cap with /upload-documents, but waits instead of answering 429
+        with ingest_slots:
+            if pc_client is None:
+                init_clients()
+            with STAGE_LATENCY.time(pipeline='ingest', stage='load'):
+                docs = normalize_documents(load_document_from_path(path, filename))
+            chunk_count = ingest_documents(docs, filename, user_id)
+        INGEST_DOCUMENTS.inc(status='success')
+        chunked_uploads.update(upload_id, state=DONE, chunks=chunk_count)
+        print(f"✅ Successfully ingested {filename} from upload {upload_id}")
+    except Exception as e:
+        INGEST_DOCUMENTS.inc(status='error')
+        chunked_uploads.update(upload_id, state=FAILED, error=str(e))
+        print(f"❌ Error ingesting upload {upload_id}: {str(e)}")
+    finally:
+        chunked_uploads.discard_file(upload_id)
+
+def resume_interrupted_uploads():
+    """Re-queue uploads a restart left 'ingesting'; without their assembled file they fail"""
+    for meta, path in chunked_uploads.interrupted():
+        upload_id = meta['upload_id']
+        if path is None:
+            chunked_uploads.update(upload_id, state=FAILED, error="Interrupted by a restart; please upload again")
+            print(f"❌ Upload {upload_id} ({meta['filename']}) was interrupted and its file is gone")
+            continue
+        ingest_pool.submit(_ingest_upload, upload_id, path, meta['filename'], meta.get('user_id'))
+        print(f"🔁 Resuming ingestion of upload {upload_id} ({meta['filename']})")
+
+def filter_matches(matches, user_id):
+    """
+    Hybrid user filtering of Pinecone matches -> (context_chunks, sources, chunk_ids).
+    Namespaces already isolate users; this still guards vectors ingested into
+    the shared namespace with a user_id before the namespace layout.
+    """
+    context_chunks = []
+    sources = []
+    chunk_ids = []
+    
+    for match in matches:
+        if match["score"] < 0.25:
+            continue
+            
+        meta = match.get("metadata", {})
+        doc_user_id = meta.get("user_id")
+        
+        # Hybrid Filtering Logic
+        # 1. If doc has NO user_id -> It's global knowledge -> KEEP
+        # 2. If doc has user_id == current_user -> It's my data -> KEEP
+        # 3. If doc has user_id != current_user -> It's someone else's -> DISCARD
+        
+        is_global = doc_user_id is None
+        is_mine = str(doc_user_id) == str(user_id) if user_id and doc_user_id else False
+        
+        if is_global or is_mine:
+            context_chunks.append(meta.get("text", ""))
+            chunk_ids.append(match.get("id"))
+            source = meta.get("source", "Unknown")
+            if source not in sources:
+                sources.append(source)
+    
+    # Limit context size to avoid token limits
+    return context_chunks[:7], sources, chunk_ids[:7] # Top 7 relevant chunks
+
 @app.route('/chat', methods=['POST'])
+@admission_limited('chat')
 def chat():
     """Handle chat queries using RAG pipeline"""
     try:
@@ -306,179 +598,215 @@ def chat():
             return jsonify({'success': False, 'message': 'Query is required'}), 400
         
         query = data['query']
+        debug = bool(data.get('debug')) or request.args.get('debug') == '1'
+        trace = g.trace = Trace(g.request_id, 'chat', observer=_observe_chat_stage)
         
         # Ensure clients are initialized (this will now use the override/clearing logic)
         if pc_client is None:
             init_clients()
         
-        # Retrieve relevant chunks from Pinecone with Hybrid User Filtering
-        print(f"🔍 Searching for: {query}")
-        query_vec = embeddings.embed_query(query)
-        
         user_id = data.get('user_id')
         realtime_context = data.get('context') # e.g. {"balance": 1000, "portfolio": 5000}
-        
-        # Construct Filter: (user_id == current_user) OR (user_id is generic/public)
-        # Note: Pinecone metadata filtering is precise.
-        # Strategy: We search generally. Then we filter in Python if strict user isolation is needed.
-        # But for RAG, getting "general" investing advice (no user_id) + "my" data (user_id=X) is ideal.
-        # If we filter by user_id=X only, we lose general knowledge.
-        
-        filter_dict = {}
-        if user_id:
-             # Ideally we want: user_id == X OR user_id exists: false
-             # Pinecone 'filter' doesn't support complex OR easily in free tier.
-             # So we will fetch more results (TOP_K * 2) and filter in memory.
-             top_k_fetch = TOP_K * 3
-        else:
-             top_k_fetch = TOP_K
+        # Server-side history: clients with a session_id send only the new message
+        session_id = data.get('session_id')
+        session = sessions.get(f"{user_id or ''}:{session_id}") if session_id else None
 
-        results = index.query(
-            vector=query_vec,
-            top_k=top_k_fetch,
-            include_metadata=True
-        )
+        # "Can I afford X for ₹N?" / "What's my balance?": plain arithmetic on
+        # the context, so skip retrieval and the LLM when the rules are sure
+        with trace.span('intent'):
+            fast, intent = fast_answer(query, realtime_context)
+        trace.set(intent=intent.kind)
+        if fast:
+            FAST_PATH_ANSWERS.inc(intent=intent.kind)
+            print(f"⚡ Fast-path {intent.kind} answer")
+            if session is not None:
+                session.add_turn(query, fast)
+            payload = {
+                'success': True,
+                'answer': fast,
+                'sources': ['Real-time Financial Status'],
+                'context_used': 0,
+                'used_document_context': False,
+                'degraded': False,
+                'fast_path': True
+            }
+            if session is not None:
+                payload['session_id'] = session_id
+            if debug:
+                payload['debug'] = trace.breakdown()
+            return jsonify(payload)
+
+        # Retrieve relevant chunks from Pinecone with Hybrid User Filtering
+        print(f"🔍 Searching for: {query}")
+        with trace.span('embed'):
+            if session is not None:
+                # Follow-ups reuse/blend the session's earlier query vectors; the
+                # lock keeps concurrent requests of one session off its memory
+                with session.lock:
+                    query_vec = session.memory.query_vector(query, classify_query(query), embeddings.embed_query)
+            else:
+                query_vec = embeddings.embed_query(query)
         
-        # Extract context
-        context_chunks = []
-        sources = []
+        # Global knowledge lives in the default namespace and each user's own
+        # documents in theirs: query just those two (in parallel) and merge by
+        # score, instead of over-fetching one shared index and filtering
+        with trace.span('query'):
+            matches = query_namespaces(index, query_vec, TOP_K, namespaces_for(user_id), query_pool)
         
-        for match in results.get("matches", []):
-            if match["score"] < 0.25:
-                continue
-                
-            meta = match.get("metadata", {})
-            doc_user_id = meta.get("user_id")
-            
-            # Hybrid Filtering Logic
-            # 1. If doc has NO user_id -> It's global knowledge -> KEEP
-            # 2. If doc has user_id == current_user -> It's my data -> KEEP
-            # 3. If doc has user_id != current_user -> It's someone else's -> DISCARD
-            
-            is_global = doc_user_id is None
-            is_mine = str(doc_user_id) == str(user_id) if user_id and doc_user_id else False
-            
-            if is_global or is_mine:
-                context_chunks.append(meta.get("text", ""))
-                source = meta.get("source", "Unknown")
-                if source not in sources:
-                    sources.append(source)
-        
-        # Limit context size to avoid token limits
-        context_chunks = context_chunks[:7] # Top 7 relevant chunks
+        with trace.span('filter'):
+            if session is not None:
+                # Chunks from recent turns get a small, decaying boost so the
+                # conversation stays on the same material
+                matches = [{'id': m['id'], 'score': m['score'], 'metadata': m.get('metadata') or {}}
+                           for m in matches]
+                with session.lock:
+                    session.memory.boost(matches)
+                matches.sort(key=lambda m: m['score'], reverse=True)
+            context_chunks, sources, chunk_ids = filter_matches(matches, user_id)
+        trace.set(chunk_ids=chunk_ids, query_chars=len(query))
+        if session is not None:
+            with session.lock:
+                session.memory.record(query, query_vec, chunk_ids)
         
         # Determine if we have good context from documents
         has_document_context = len(context_chunks) > 0
         
-        # Construct Prompt
-        system_instruction = "You are F-Buddy AI, a friendly and helpful financial assistant."
-        
-        # Inject Real-Time Financial Context
-        financial_context_str = ""
-        if realtime_context:
-            financial_context_str = "CURRENT FINANCIAL STATUS (Real-time):\n"
-            for key, val in realtime_context.items():
-                # Format key for readability ("total_balance" -> "Total Balance")
-                nice_key = key.replace('_', ' ').title()
-                financial_context_str += f"- {nice_key}: {val}\n"
-            financial_context_str += "\nUse this real-time data to answer questions about affordability (e.g., 'Can I buy X?').\n"
-
-        context_block = ""
-        if has_document_context:
-            context_block = f"CONTEXT FROM DOCUMENTS/HISTORY:\n{chr(10).join(context_chunks)}\n"
-            
-            prompt = f"""
-{system_instruction}
-
-{financial_context_str}
-{context_block}
-
-USER QUESTION:
-{query}
-
-IMPORTANT RESPONSE RULES:
-1. Give a DIRECT, CONCISE answer in 2-4 sentences max.
-2. If the user asks if they can buy something, COMPARE the cost to their 'Wallet Balance' or 'Net Worth' derived from the Financial Status above.
-   - Example: "Yes, you have ₹50,000 balance." or "No, you only have ₹10,000."
-3. NO asterisks (*), hashes (#), or markdown symbols.
-4. NO phrases like "Based on the context" or "According to the documents".
-5. NO "In conclusion" or summary statements.
-6. Use simple, conversational language.
-7. Only add a brief disclaimer for major financial decisions.
-
-Answer directly:
-"""
-        else:
-            # Fallback: No relevant documents found, use LLM's general finance knowledge
-            # Inject Real-Time Financial Context even in fallback
-            financial_context_str = ""
-            if realtime_context:
-                financial_context_str = "CURRENT FINANCIAL STATUS (Real-time):\n"
-                for key, val in realtime_context.items():
-                    nice_key = key.replace('_', ' ').title()
-                    financial_context_str += f"- {nice_key}: {val}\n"
-                financial_context_str += "\nUse this real-time data to answer questions about affordability.\n"
-
-            prompt = f"""
-You are F-Buddy AI, a friendly financial assistant.
-
-{financial_context_str}
-
-USER QUESTION:
-{query}
-
-IMPORTANT RESPONSE RULES:
-1. Give a DIRECT, CONCISE answer in 2-4 sentences max
-2. Compare costs to 'Wallet Balance' if asked about affordability.
-3. NO asterisks (*), hashes (#), or markdown symbols
-4. NO phrases like "Based on my knowledge" or "Generally speaking"
-5. NO "In conclusion" or summary statements
-6. Use simple, conversational language
-7. Only add a brief disclaimer for major financial decisions
-8. If not about finance, politely say you only help with money topics
-
-Answer directly:
-"""
+        with trace.span('prompt_build'):
+            prompt = build_chat_prompt(query, context_chunks, realtime_context,
+                                       session.history_text() if session is not None else "")
 
         print(f"🤖 Generating answer with Gemini (document context: {has_document_context})...")
-        response = gemini_model.generate_content(prompt)
-        answer = response.text
+        cache_key = AnswerCache.key(query, user_id)
+        degraded = None
+        with trace.span('generate'):
+            try:
+                answer = resilient_llm.generate("chat", prompt)
+            except LLMUnavailableError as e:
+                # Slow or failing upstream: answer now from what we already have
+                answer, source = degraded_answer(query, realtime_context, context_chunks, answer_cache.get(cache_key))
+                degraded = {'reason': e.reason, 'source': source}
+                LLM_FALLBACKS.inc(reason=e.reason, source=source)
+                print(f"⚠️ Degraded answer ({e.reason} -> {source})")
         
         # Clean up the response
-        answer = clean_response(answer)
+        with trace.span('clean'):
+            answer = clean_response(answer)
         
+        if degraded is None:
+            answer_cache.put(cache_key, answer)
+        if session is not None:
+            session.add_turn(query, answer)
         print(f"✅ Generated answer ({len(answer)} chars)")
         
-        return jsonify({
+        trace.set(used_document_context=has_document_context, degraded=degraded)
+        payload = {
             'success': True,
             'answer': answer,
             'sources': sources if has_document_context else ['General Knowledge'],
             'context_used': len(context_chunks),
-            'used_document_context': has_document_context
-        })
+            'used_document_context': has_document_context,
+            'degraded': degraded is not None,
+            'fast_path': False
+        }
+        if degraded:
+            payload['degraded_reason'] = degraded['reason']
+        if session is not None:
+            payload['session_id'] = session_id
+        if debug:
+            payload['debug'] = trace.breakdown()
+        return jsonify(payload)
         
+    except LLMBusyError as e:
+        return _too_many('chat', 'llm_busy', e.retry_after, 'Assistant is busy, please retry shortly')
     except Exception as e:
         print(f"❌ Chat error: {str(e)}")
+        if g.get('trace') is not None:
+            g.trace.set(error=str(e))
         return jsonify({
             'success': False,
             'message': str(e)
         }), 500
 
+@app.route('/chat/session/<session_id>', methods=['DELETE'])
+def end_chat_session(session_id):
+    """Forget a conversation (e.g. the app's "clear chat")"""
+    user_id = request.args.get('user_id')
+    dropped = sessions.drop(f"{user_id or ''}:{session_id}")
+    return jsonify({'success': True, 'dropped': dropped})
+
+@app.route('/documents/<path:source>', methods=['GET'])
+def get_document(source):
+    """Catalog entry of an indexed document; falls back to its manifest chunk if ingested before the catalog"""
+    try:
+        namespace = user_namespace(request.args.get('user_id'))
+        entry = catalog.get(source, namespace)
+        if entry is not None:
+            return jsonify({'success': True, 'document': entry})
+        if pc_client is None:
+            init_clients()
+        manifest = get_manifest(index, source, namespace)
+        if manifest is None:
+            return jsonify({'success': False, 'message': 'Document not indexed'}), 404
+        manifest.pop('text', None)
+        return jsonify({'success': True, 'document': manifest})
+    except Exception as e:
+        print(f"❌ Document lookup error: {str(e)}")
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+@app.route('/documents/<path:source>', methods=['DELETE'])
+def remove_document(source):
+    """Delete one document's chunks from the global or the user's namespace"""
+    try:
+        if pc_client is None:
+            init_clients()
+        namespace = user_namespace(request.args.get('user_id'))
+        with catalog.removing(source, namespace) as entry:
+            follow_serving_alias(force=True)  # no switch can commit while the row is 'deleting'
+            catalog.check_alias(serving_index_name, serving_model)
+            if entry is not None:
+                ids = stale_ids(entry, 0)
+                delete_ids(index, ids, namespace)
+                deleted = len(ids)
+            else:
+                deleted = delete_document(index, source, namespace)
+        if not deleted:
+            return jsonify({'success': False, 'message': 'Document not indexed'}), 404
+        print(f"🗑️ Deleted {deleted} chunks of {source}")
+        return jsonify({'success': True, 'deleted_chunks': deleted})
+    except Exception as e:
+        print(f"❌ Document delete error: {str(e)}")
+        return jsonify({'success': False, 'message': str(e)}), 500
+
 @app.route('/stats', methods=['GET'])
 def get_stats():
-    """Get statistics about indexed documents"""
+    """
+    Get statistics about indexed documents. total_vectors is Pinecone's live
+    count (what the mobile app shows); the catalog's view is alongside it, and
+    ?live=1 adds the per-namespace counts.
+    """
     try:
         if pc_client is None:
             init_clients()
-        
         stats = index.describe_index_stats()
-        
-        return jsonify({
+        documents = catalog.stats()
+        payload = {
             'success': True,
             'total_vectors': stats.get('total_vector_count', 0),
-            'dimension': stats.get('dimension', 384),
-            'index_name': PINECONE_INDEX_NAME
-        })
+            'catalog_chunks': documents['chunks'],
+            'dimension': serving_dimension,
+            'index_name': serving_index_name,
+            'embedding_model': serving_model,
+            'namespaces': len(documents['namespaces']),
+            'documents': documents,
+            'llm': llm.stats(),
+            'sessions': sessions.stats()
+        }
+        if request.args.get('live') == '1':
+            payload['index'] = {
+                'total_vectors': payload['total_vectors'],
+                'namespaces': {ns: info.get('vector_count', 0) for ns, info in (stats.get('namespaces') or {}).items()}
+            }
+        return jsonify(payload)
         
     except Exception as e:
         return jsonify({
@@ -491,18 +819,59 @@ class GeminiOCR:
     def __init__(self):
         self.api_key = os.getenv("GEMINI_API_KEY")
 
-    def extract_bill_info(self, image_bytes):
+    def extract_bill_info(self, image_bytes, use_cache=True, preprocess=True, local_ocr=True,
+                          priority=PRIORITY_NORMAL, rate_limiter=None, owner=None):
         """
         Extracts bill info using Gemini (Multimodal) with prompts/rules 
         ported from the Personal Finance feature (billController.js).
+        `rate_limiter` (a TokenBucket) is only drawn from for an actual Gemini
+        call, not for cache hits or local OCR results. `owner` scopes the bill
+        cache to one user/client.
         """
         if not self.api_key:
             return {"merchant": "Demo Merchant", "amount": "0.00", "date": datetime.now().strftime("%Y-%m-%d"), "status": "demo_no_key"}
 
+        # Re-uploads of the identical image are answered from the owner's cache;
+        # a similar-looking one (a retake?) is only flagged and still extracted
+        fingerprint = Fingerprint(image_bytes, owner)
+        cached = bill_cache.get(fingerprint) if use_cache else None
+        if cached is not None:
+            result, duplicate = cached
+            BILL_EXTRACTIONS.inc(source='cache')
+            print(f"♻️ Bill cache hit (seen {duplicate['times_seen']}x)")
+            return {**result, "duplicate": duplicate, "cached": True}
+        duplicate = bill_cache.find_duplicate(fingerprint) if use_cache else None
+        if duplicate is not None:
+            print(f"👯 Bill looks like one scanned before (distance {duplicate['distance']})")
+
+        # Crop/deskew/downscale and send the real MIME type instead of assuming JPEG
+        if preprocess:
+            with STAGE_LATENCY.time(pipeline='bill', stage='preprocess'):
+                image_bytes, mime_type, info = preprocess_bill_image(image_bytes)
+            print(f"🖼️ Bill image {info['format']} {info['original_bytes']} -> {info['bytes']} bytes")
+        else:
+            mime_type = "image/jpeg"
+
+        # Clean printed receipts are resolved on the CPU; Gemini only sees the hard ones
+        with STAGE_LATENCY.time(pipeline='bill', stage='local_ocr'):
+            local = extract_locally(image_bytes) if local_ocr else None
+        if local is not None and local["confidence"] >= LOCAL_OCR_MIN_CONFIDENCE:
+            print(f"⚡ Bill resolved locally (confidence {local['confidence']}, {local['elapsed_ms']} ms)")
+            result = {
+                "merchant": local["merchant"],
+                "amount": local["amount"],
+                "date": local["date"] or "Not Mentioned",
+                "category": local["category"],
+                "status": "success",
+                "source": "local_ocr",
+                "raw_data": local
+            }
+            if use_cache:
+                bill_cache.put(fingerprint, result)
+            BILL_EXTRACTIONS.inc(source='local_ocr')
+            return {**result, "duplicate": duplicate, "cached": False}
+
         try:
-            genai.configure(api_key=self.api_key)
-            model = genai.GenerativeModel('gemini-2.5-flash')
-            
             prompt = """
             Extract bill info from this image. Return ONLY JSON, nothing else.
 
@@ -513,47 +882,47 @@ def extract_bill_info(self, image_bytes):
             - date: YYYY-MM-DD format or null.
 
             CATEGORY HINTS:
-            - restaurants: dine-in, menu items, FSSAI, Table No, kitchen, cafe, dhaba
-            - food: Zomato, Swiggy, grocery, supermarket
-            - drinks: bar, pub, wine, beer, alcohol
-            - transport: uber, ola, taxi, fuel, flight, train
-            - fuel: petrol, diesel, cng, gas station
-            - clothes: apparel, fashion, zudio, trends
-            - education: school, college, books, stationery
-            - health: hospital, pharmacy, medicine, gym
-            - hotel: oyo, stay, room, resort
-            - fun: movie, cinema, game, netflix
-            - personal: salon, spa, grooming
-            - pets: vet, pet food
-            - others: shopping, electronics, recharge, bill
+            """ + category_hints_prompt() + """
 
             RESPOND WITH ONLY JSON:
             {"merchant":"Name","amount":123.45,"category":"restaurants","date":"2025-12-31"}
             """
 
-            content = [prompt, {"mime_type": "image/jpeg", "data": image_bytes}]
-            
-            response = model.generate_content(content)
+            content = [prompt, {"mime_type": mime_type, "data": image_bytes}]
             
+            if rate_limiter is not None:
+                rate_limiter.acquire()
+            with STAGE_LATENCY.time(pipeline='bill', stage='llm'):
+                text = llm.generate("scan_bill", content, priority=priority)
+
             # Clean response text
-            text = response.text.strip().replace('```json', '').replace('```', '')
+            text = text.strip().replace('```json', '').replace('```', '')
             parsed = json.loads(text)
             
-            return {
+            result = {
                 "merchant": parsed.get("merchant", "Not Avl"),
                 "amount": parsed.get("amount", "0.00"),
                 "date": parsed.get("date", "Not Mentioned"),
                 "category": parsed.get("category", "others"),
                 "status": "success",
+                "source": "gemini",
                 "raw_data": parsed
             }
+            if use_cache:
+                bill_cache.put(fingerprint, result)
+            BILL_EXTRACTIONS.inc(source='gemini')
+            return {**result, "duplicate": duplicate, "cached": False}
 
+        except LLMBusyError:
+            raise  # the endpoint answers 429
         except Exception as e:
+            BILL_EXTRACTIONS.inc(source='error')
             print(f"❌ Gemini extraction error: {e}")
             # Fallback for error
             return {"error": str(e), "status": "error"}
 
 @app.route('/scan-bill', methods=['POST'])
+@admission_limited('scan_bill')
 def scan_bill():
     """Scan bill image using Gemini OCR (Personal Finance Logic)"""
     try:
@@ -569,7 +938,7 @@ def scan_bill():
         
         # Initialize OCR
         ocr = GeminiOCR()
-        result = ocr.extract_bill_info(image_bytes)
+        result = ocr.extract_bill_info(image_bytes, owner=_client_key())
         
         if result.get("status") == "error":
             return jsonify({
@@ -579,9 +948,13 @@ def scan_bill():
             
         return jsonify({
             'success': True,
-            'data': result
+            'data': result,
+            # Lets the app warn before the same receipt is logged twice
+            'duplicate': result.get("duplicate") is not None
         })
 
+    except LLMBusyError as e:
+        return _too_many('scan_bill', 'llm_busy', e.retry_after, 'Bill scanner is busy, please retry shortly')
     except Exception as e:
         print(f"❌ Scan error: {str(e)}")
         return jsonify({
@@ -589,6 +962,71 @@ def scan_bill():
             'message': str(e)
         }), 500
 
+def _scan_one_bill(position, filename, image_bytes, owner):
+    """Worker for /scan-bill/batch: extraction of a single image, rate-limited only when it reaches Gemini"""
+    started = time.perf_counter()
+    # Batch scans yield to interactive chat and single scans in the LLM queue
+    result = GeminiOCR().extract_bill_info(image_bytes, priority=PRIORITY_BULK, rate_limiter=gemini_rate_limiter,
+                                           owner=owner)
+    line = {
+        'index': position,
+        'filename': filename,
+        'status': 'error' if result.get("status") == "error" else 'success',
+        'elapsed_ms': round((time.perf_counter() - started) * 1000, 1)
+    }
+    if line['status'] == 'error':
+        line['error'] = result.get("error", "Unknown error")
+    else:
+        line['data'] = result
+    return line
+
+@app.route('/scan-bill/batch', methods=['POST'])
+@admission_limited('scan_bill')
+def scan_bill_batch():
+    """
+    Scan many bill images concurrently. Streams one NDJSON line per image as
+    soon as it completes, followed by a summary line with total throughput.
+    """
+    files = request.files.getlist('files')
+    files = [f for f in files if f and f.filename]
+    if not files:
+        return jsonify({'success': False, 'message': 'No files provided'}), 400
+    if len(files) > BILL_SCAN_MAX_FILES:
+        return jsonify({
+            'success': False,
+            'message': f'Too many files (max {BILL_SCAN_MAX_FILES} per batch)'
+        }), 400
+
+    # Read uploads in the request thread; workers only see bytes
+    images = [(i, secure_filename(f.filename), f.read()) for i, f in enumerate(files)]
+    owner = _client_key()  # workers run outside the request context
+
+    def generate():
+        started = time.perf_counter()
+        succeeded = 0
+        futures = {bill_scan_pool.submit(_scan_one_bill, *image, owner): image for image in images}
+        for future in as_completed(futures):
+            try:
+                line = future.result()
+            except Exception as e:
+                position, filename, _ = futures[future]
+                line = {'index': position, 'filename': filename, 'status': 'error', 'error': str(e)}
+            if line['status'] == 'success':
+                succeeded += 1
+            yield json.dumps(line) + "\n"
+
+        elapsed = time.perf_counter() - started
+        print(f"🧾 Batch scan: {succeeded}/{len(images)} bills in {elapsed:.1f}s")
+        yield json.dumps({'summary': {
+            'total': len(images),
+            'succeeded': succeeded,
+            'failed': len(images) - succeeded,
+            'elapsed_s': round(elapsed, 3),
+            'images_per_sec': round(len(images) / elapsed, 2) if elapsed > 0 else None
+        }}) + "\n"
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
 if __name__ == '__main__':
     print("=" * 60)
     print("🚀 Starting F-Buddy RAG Service")
@@ -598,39 +1036,22 @@ def scan_bill():
     try:
         init_clients()
         
+        documents = catalog.stats()
+        print(f"📚 Catalog: {documents['documents']} documents, {documents['chunks']} chunks")
+        if documents['unfinished']:
+            print(f"⚠️ {documents['unfinished']} ingests/deletes were interrupted; re-run them to reconcile")
+        resume_interrupted_uploads()
+        
         # Check if context.pdf in uploads needs to be ingested
         context_path = os.path.join(UPLOAD_FOLDER, 'context.pdf')
         if os.path.exists(context_path):
-            print("\n🧐 Found context.pdf in uploads. Checking index...")
-            stats = index.describe_index_stats()
-            # If index is empty or very small, let's ingest the context.pdf
-            if stats.get('total_vector_count', 0) < 50:
+            print("\n🧐 Found context.pdf in uploads. Checking catalog...")
+            if catalog.get('context.pdf') is None:
                 print("🚀 Auto-ingesting context.pdf...")
-                with open(context_path, 'rb') as f:
-                    from flask import Request
-                    # Simulate a file upload for the existing function
-                    # Or just call the logic directly. Let's keep it simple.
-                    pass 
-                # Actually, let's just use the logic directly
                 try:
-                    loader = PyPDFLoader(context_path)
-                    docs = loader.load()
-                    splitter = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=100)
-                    chunks = splitter.split_documents(docs)
-                    vectors_to_upsert = []
-                    for doc in chunks:
-                        text = sanitize_text(doc.page_content)
-                        if not text: continue
-                        embedding = embeddings.embed_query(text)
-                        vectors_to_upsert.append({
-                            "id": str(uuid.uuid4()),
-                            "values": embedding,
-                            "metadata": {"text": text, "source": "context.pdf", "uploaded_at": datetime.now().isoformat()}
-                        })
-                    batch_size = 100
-                    for i in range(0, len(vectors_to_upsert), batch_size):
-                        index.upsert(vectors=vectors_to_upsert[i:i + batch_size])
-                    print(f"✅ Auto-ingested {len(vectors_to_upsert)} chunks from context.pdf")
+                    docs = normalize_documents(load_document_from_path(context_path))
+                    chunk_count = ingest_documents(docs, 'context.pdf')
+                    print(f"✅ Auto-ingested {chunk_count} chunks from context.pdf")
                 except Exception as e:
                     print(f"❌ Auto-ingestion failed: {e}")
         
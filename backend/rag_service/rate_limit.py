@@ -0,0 +1,169 @@
+"""
+Token-bucket rate limiting for calls to upstream APIs (Gemini) and endpoints,
+per-user/global admission control, and a bounded priority queue for slots.
+"""
+
+import heapq
+import itertools
+import threading
+import time
+from collections import OrderedDict
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: refills at `rate` tokens per second up to `capacity`.
+    """
+
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(rate, 1))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self, tokens: float = 1.0) -> float:
+        """
+        Take tokens if available. Returns 0 on success, otherwise the number of
+        seconds until enough tokens will have accumulated (nothing is taken).
+        """
+        with self._lock:
+            self._refill(time.monotonic())
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return 0.0
+            return (tokens - self._tokens) / self.rate
+
+    def release(self, tokens: float = 1.0):
+        """Give back tokens taken for work that did not go ahead"""
+        with self._lock:
+            self._tokens = min(self.capacity, self._tokens + tokens)
+
+    def acquire(self, tokens: float = 1.0, timeout: float = None) -> bool:
+        """Block until tokens are available; False if that would exceed timeout"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            wait = self.try_acquire(tokens)
+            if wait == 0:
+                return True
+            if deadline is not None and time.monotonic() + wait > deadline:
+                return False
+            time.sleep(wait)
+
+
+class KeyedRateLimiter:
+    """
+    One TokenBucket per key (user ID / client address), bounded to the
+    `max_keys` most recently seen keys so memory stays flat.
+    """
+
+    def __init__(self, rate: float, capacity: float = None, max_keys: int = 10000):
+        self.rate = rate
+        self.capacity = capacity
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def try_acquire(self, key: str, tokens: float = 1.0) -> float:
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = TokenBucket(self.rate, self.capacity)
+                if len(self._buckets) > self.max_keys:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+        return bucket.try_acquire(tokens)
+
+    def release(self, key: str, tokens: float = 1.0):
+        with self._lock:
+            bucket = self._buckets.get(key)
+        if bucket is not None:
+            bucket.release(tokens)
+
+
+class AdmissionController:
+    """
+    Per-endpoint admission: a per-user bucket and a global bucket. `limits`
+    maps endpoint -> (user_per_min, global_per_sec); bursts allow roughly
+    one minute (user) or one second (global) of traffic at once.
+    """
+
+    def __init__(self, limits: dict):
+        self._limits = {
+            endpoint: (KeyedRateLimiter(user_per_min / 60.0, max(1.0, user_per_min)),
+                       TokenBucket(global_per_sec, max(1.0, global_per_sec)))
+            for endpoint, (user_per_min, global_per_sec) in limits.items()
+        }
+
+    def check(self, endpoint: str, key: str) -> float:
+        """0 if the request is admitted, else seconds the caller should wait"""
+        per_user, overall = self._limits[endpoint]
+        wait = per_user.try_acquire(key)
+        if wait:
+            return wait
+        wait = overall.try_acquire()
+        if wait:
+            # Rejected for global load, not the user's own rate: don't charge them for it
+            per_user.release(key)
+        return wait
+
+
+class QueueFullError(RuntimeError):
+    """The wait queue is at capacity or the wait timed out"""
+
+
+class PrioritySlots:
+    """
+    Bounded concurrency with a bounded, prioritized wait queue: at most
+    `max_active` holders, at most `max_waiting` queued callers (extra callers
+    fail immediately), and freed slots go to the lowest priority number first
+    (FIFO within a priority).
+    """
+
+    def __init__(self, max_active: int, max_waiting: int):
+        self.max_active = max_active
+        self.max_waiting = max_waiting
+        self._free = max_active
+        self._waiters = []  # heap of [priority, seq, granted]
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+
+    @property
+    def active(self) -> int:
+        return self.max_active - self._free
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    def acquire(self, priority: int = 0, timeout: float = None):
+        with self._cond:
+            if self._free > 0 and not self._waiters:
+                self._free -= 1
+                return
+            if len(self._waiters) >= self.max_waiting:
+                raise QueueFullError(f"wait queue full ({self.max_waiting})")
+            entry = [priority, next(self._seq), False]
+            heapq.heappush(self._waiters, entry)
+            deadline = None if timeout is None else time.monotonic() + timeout
+            while not entry[2]:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    self._waiters.remove(entry)
+                    heapq.heapify(self._waiters)
+                    raise QueueFullError("timed out waiting for a slot")
+                self._cond.wait(remaining)
+
+    def release(self):
+        with self._cond:
+            if self._waiters:
+                # Hand the slot straight to the most urgent waiter
+                heapq.heappop(self._waiters)[2] = True
+                self._cond.notify_all()
+            else:
+                self._free += 1
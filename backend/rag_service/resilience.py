@@ -0,0 +1,236 @@
+"""
+Graceful degradation for the LLM call path.
+
+ResilientLLM wraps LLMClient with a per-call deadline, an optional hedged
+second attempt once the first has run longer than the recent p95, and a
+circuit breaker that stops calling a failing upstream for a cool-down period.
+When it gives up it raises LLMUnavailableError quickly, and the caller answers
+from a degraded fallback (templated affordability answer, cached answer, or
+the top retrieved chunk) instead of hanging until the SDK times out.
+"""
+
+import os
+import re
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from intent import fast_answer
+from llm_client import LLMBusyError
+
+CHAT_DEADLINE_SECONDS = float(os.getenv("CHAT_DEADLINE_SECONDS", "8"))
+LLM_HEDGE_ENABLED = os.getenv("LLM_HEDGE_ENABLED", "true").lower() != "false"
+# Fixed hedge delay; 0 means "use the observed p95"
+LLM_HEDGE_AFTER_MS = float(os.getenv("LLM_HEDGE_AFTER_MS", "0"))
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))
+CIRCUIT_RESET_SECONDS = float(os.getenv("CIRCUIT_RESET_SECONDS", "30"))
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "1000"))
+ANSWER_CACHE_TTL_SECONDS = float(os.getenv("ANSWER_CACHE_TTL_SECONDS", str(24 * 3600)))
+
+_MIN_HEDGE_SAMPLES = 20
+
+
+class LLMUnavailableError(RuntimeError):
+    """No answer within the deadline, the circuit is open, or the upstream failed"""
+
+    def __init__(self, message: str, reason: str):
+        super().__init__(message)
+        self.reason = reason
+
+
+class CircuitBreaker:
+    """
+    closed -> open after `failure_threshold` consecutive failures; open ->
+    half-open after `reset_timeout`, letting a single probe call through;
+    the probe's outcome closes or re-opens the circuit.
+    """
+
+    def __init__(self, failure_threshold: int = CIRCUIT_FAILURE_THRESHOLD,
+                 reset_timeout: float = CIRCUIT_RESET_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return 'closed'
+            if time.monotonic() - self._opened_at >= self.reset_timeout:
+                return 'half_open'
+            return 'open'
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self.reset_timeout or self._probing:
+                return False
+            self._probing = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def cancel_probe(self):
+        """The call never reached the upstream (e.g. local overload): no verdict"""
+        with self._lock:
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._probing or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+            self._probing = False
+
+
+class LatencyWindow:
+    """Recent call latencies for the hedge delay"""
+
+    def __init__(self, size: int = 200):
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def add(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def p95(self):
+        with self._lock:
+            if len(self._samples) < _MIN_HEDGE_SAMPLES:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[int(len(ordered) * 0.95) - 1]
+
+
+class ResilientLLM:
+    """Deadline + hedging + circuit breaker around LLMClient.generate"""
+
+    def __init__(self, llm, deadline: float = CHAT_DEADLINE_SECONDS, hedge: bool = LLM_HEDGE_ENABLED,
+                 hedge_after_ms: float = LLM_HEDGE_AFTER_MS, breaker: CircuitBreaker = None):
+        self.llm = llm
+        self.deadline = deadline
+        self.hedge = hedge
+        self.hedge_after_ms = hedge_after_ms
+        self.breaker = breaker or CircuitBreaker()
+        self.latencies = LatencyWindow()
+        self.hedges = 0
+        # Abandoned attempts keep running until the SDK timeout; size for that
+        self._pool = ThreadPoolExecutor(max_workers=max(4, llm.max_concurrency * 2), thread_name_prefix="llm-call")
+
+    def _hedge_delay(self):
+        if self.hedge_after_ms:
+            return self.hedge_after_ms / 1000
+        return self.latencies.p95()
+
+    def _attempt(self, endpoint, contents, kwargs):
+        started = time.perf_counter()
+        text = self.llm.generate(endpoint, contents, timeout=self.deadline, **kwargs)
+        self.latencies.add(time.perf_counter() - started)
+        return text
+
+    def generate(self, endpoint: str, contents, **kwargs) -> str:
+        """
+        Text from the first attempt to succeed within the deadline. Raises
+        LLMUnavailableError (degrade) or LLMBusyError (overloaded: answer 429).
+        """
+        if not self.breaker.allow():
+            raise LLMUnavailableError("LLM circuit open", reason='circuit_open')
+
+        deadline = time.monotonic() + self.deadline
+        attempts = [self._pool.submit(self._attempt, endpoint, contents, kwargs)]
+        hedge_delay = self._hedge_delay() if self.hedge else None
+        last_error = None
+
+        while attempts:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            # Wake up at the hedge point while only the first attempt is running
+            hedge_pending = hedge_delay is not None and len(attempts) == 1 and last_error is None
+            timeout = min(remaining, hedge_delay) if hedge_pending else remaining
+            done, _ = wait(attempts, timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                attempts.remove(future)
+                try:
+                    text = future.result()
+                except LLMBusyError:
+                    self.breaker.cancel_probe()
+                    raise
+                except Exception as e:
+                    last_error = e
+                    continue
+                self.breaker.record_success()
+                return text
+            # Hedge only when the LLM queue is idle; hedging under load amplifies it
+            if not done and hedge_pending and self.llm.queued == 0:
+                self.hedges += 1
+                attempts.append(self._pool.submit(self._attempt, endpoint, contents, kwargs))
+                hedge_delay = None
+
+        self.breaker.record_failure()
+        if last_error is not None and not attempts:
+            raise LLMUnavailableError(f"LLM call failed: {last_error}", reason='error')
+        raise LLMUnavailableError(f"No LLM answer within {self.deadline:.1f}s", reason='deadline')
+
+
+class AnswerCache:
+    """TTL + LRU cache of recent successful answers, used only as a fallback"""
+
+    def __init__(self, max_size: int = ANSWER_CACHE_SIZE, ttl: float = ANSWER_CACHE_TTL_SECONDS):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(query: str, user_id=None) -> str:
+        return f"{user_id or ''}|{' '.join(query.lower().split())}"
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.monotonic() - entry[1] > self.ttl:
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, key: str, answer: str):
+        with self._lock:
+            self._entries[key] = (answer, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+
+_SENTENCE = re.compile(r'(?<=[.!?])\s+')
+
+
+def degraded_answer(query: str, realtime_context=None, context_chunks=None, cached: str = None):
+    """
+    (answer, source) used when the LLM is unavailable. A template computed
+    from the live balance beats a cached answer, which may quote stale numbers.
+    """
+    # Same bar as the /chat fast path: questions the rules are unsure about
+    # (EMIs, "per month", unit prices) get no arithmetic answer here either
+    template, _ = fast_answer(query, realtime_context)
+    if template:
+        return template, 'template'
+
+    if cached:
+        return cached, 'cached_answer'
+
+    if context_chunks:
+        excerpt = ' '.join(_SENTENCE.split(context_chunks[0].strip())[:3])
+        return f"Here is what I found in your documents: {excerpt}", 'top_chunk'
+
+    return ("I'm having trouble reaching the assistant right now. "
+            "Please try again in a minute."), 'unavailable'
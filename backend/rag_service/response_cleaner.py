@@ -0,0 +1,139 @@
+"""
+Post-processing of Gemini answers: strip markdown and filler phrases.
+
+clean_response() applies the same substitutions, in the same order, as the
+original per-call re.sub chain, so its output is identical; the difference is
+that every pattern is compiled once and each pass is skipped unless its
+trigger is present (a '*', '#' or '`', a filler opener at the start, a filler
+closer anywhere). Answers that follow the prompt's no-markdown rule skip
+almost every pass.
+
+StreamingCleaner applies the same cleaning to a token stream. It emits whole
+lines as soon as later text can no longer change them and holds back the rest,
+so the concatenated output always equals clean_response() of the full text.
+"""
+
+import re
+
+_BOLD = re.compile(r'\*\*([^*]+)\*\*')
+_ITALIC = re.compile(r'\*([^*]+)\*')
+_HEADER = re.compile(r'#{1,6}\s*')
+_CODE = re.compile(r'`([^`]+)`')
+_BULLET = re.compile(r'^\s*[-*+]\s+', re.MULTILINE)
+_NUMBERED = re.compile(r'^\s*\d+\.\s+', re.MULTILINE)
+
+_UNWANTED_STARTS = [re.compile(p, re.IGNORECASE) for p in (
+    r'^Based on (the|my|this|your).*?,\s*',
+    r'^According to.*?,\s*',
+    r'^From (the|my|this).*?,\s*',
+    r'^The (context|document|information).*?,\s*',
+    r'^In (conclusion|summary|short),?\s*',
+    r'^To (summarize|conclude|sum up),?\s*',
+    r'^Overall,?\s*',
+    r'^Generally (speaking)?,?\s*',
+)]
+# Literal each start pattern begins with: if none matches, no pattern can
+_STARTS_GATE = re.compile(r'based on |according to|from |the |in |to |overall|generally ', re.IGNORECASE)
+
+_UNWANTED_ENDS = [re.compile(p, re.IGNORECASE) for p in (
+    r'\s*I hope this helps!?\s*$',
+    r'\s*Let me know if.*$',
+    r'\s*Feel free to.*$',
+    r'\s*Is there anything else.*$',
+)]
+_ENDS_GATE = re.compile(r'I hope this helps|Let me know if|Feel free to|Is there anything else', re.IGNORECASE)
+
+_BLANK_RUN = re.compile(r'\n{3,}')
+
+
+def _strip_markdown(text: str) -> str:
+    if '*' in text:
+        text = _BOLD.sub(r'\1', text)
+        text = _ITALIC.sub(r'\1', text)
+    if '#' in text:
+        text = _HEADER.sub('', text)
+    if '`' in text:
+        text = _CODE.sub(r'\1', text)
+    if '-' in text or '*' in text or '+' in text:
+        text = _BULLET.sub('', text)
+    return _NUMBERED.sub('', text)
+
+
+def _strip_starts(text: str) -> str:
+    if _STARTS_GATE.match(text):
+        for pattern in _UNWANTED_STARTS:
+            text = pattern.sub('', text)
+    return text
+
+
+def _strip_ends(text: str) -> str:
+    if _ENDS_GATE.search(text):
+        for pattern in _UNWANTED_ENDS:
+            text = pattern.sub('', text)
+    return text
+
+
+def _collapse_blank_lines(text: str) -> str:
+    return _BLANK_RUN.sub('\n\n', text) if '\n\n\n' in text else text
+
+
+def clean_response(text: str) -> str:
+    """Clean up Gemini response to remove markdown and unwanted phrases"""
+    if not text:
+        return ""
+    text = _strip_ends(_strip_starts(_strip_markdown(text)))
+    return _collapse_blank_lines(text).strip()
+
+
+def _is_plain(piece: str) -> bool:
+    """No text here that any pass could rewrite or pair with later text"""
+    return not ('*' in piece or '#' in piece or '`' in piece
+                or _BULLET.search(piece) or _NUMBERED.search(piece) or _ENDS_GATE.search(piece))
+
+
+class StreamingCleaner:
+    """
+    Incremental clean_response(): feed() chunks as they arrive and send what
+    it returns, then send finish(). Output is released a line at a time, at a
+    newline between two non-blank characters, once everything before it is
+    plain text (no markdown markers or closing filler) and, for the first
+    lines, once the opener-phrase stripping is settled. After the first
+    markdown marker everything is held until finish().
+    """
+
+    def __init__(self):
+        self._pending = ""
+        self._started = False  # some output already released
+
+    def _release(self, piece: str):
+        """Cleaned text for `piece` (ends with non-space + newline), or None if not yet safe"""
+        if not _is_plain(piece):
+            return None
+        body = piece[:-1]  # the newline is held: a closing filler line may swallow it
+        if self._started:
+            return "\n" + _collapse_blank_lines(body)
+        body = _strip_starts(body)
+        if '\n' not in body:
+            return None  # the opener strip could still run into the next line
+        return _collapse_blank_lines(body).lstrip()
+
+    def feed(self, chunk: str) -> str:
+        self._pending += chunk
+        pending = self._pending
+        # Split candidates: "x\ny" with x, y non-space, longest first
+        for i in range(len(pending) - 2, 0, -1):
+            if pending[i] != '\n' or pending[i - 1].isspace() or pending[i + 1].isspace():
+                continue
+            released = self._release(pending[:i + 1])
+            if released is not None:
+                self._pending = pending[i + 1:]
+                self._started = True
+                return released
+        return ""
+
+    def finish(self) -> str:
+        text, self._pending = self._pending, ""
+        if not self._started:
+            return clean_response(text)
+        text = _strip_ends("\n" + _strip_markdown(text))
+        return _collapse_blank_lines(text).rstrip()
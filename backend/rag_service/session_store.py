@@ -0,0 +1,123 @@
+"""
+Server-side chat sessions so clients send only the new message.
+
+Each session keeps the last few turns verbatim and folds older ones into a
+rolling extractive summary (question plus the answer's first sentence, oldest
+lines dropped past a character budget), so the history block in the prompt
+stays a fixed size however long the conversation runs. Summaries are built
+without an LLM call. Sessions also carry the retrieval ConversationMemory.
+
+The store is an LRU of at most SESSION_STORE_SIZE sessions; sessions idle for
+longer than SESSION_TTL_SECONDS are evicted on access.
+"""
+
+import os
+import re
+import threading
+import time
+from collections import OrderedDict, deque
+
+from conversation_memory import ConversationMemory
+
+SESSION_STORE_SIZE = int(os.getenv("SESSION_STORE_SIZE", "2000"))
+SESSION_TTL_SECONDS = float(os.getenv("SESSION_TTL_SECONDS", "1800"))
+SESSION_RECENT_TURNS = int(os.getenv("SESSION_RECENT_TURNS", "3"))
+SESSION_SUMMARY_CHARS = int(os.getenv("SESSION_SUMMARY_CHARS", "800"))
+
+_SENTENCE_END = re.compile(r'(?<=[.!?])\s')
+_SPACES = re.compile(r'\s+')
+
+
+def _clip(text: str, limit: int) -> str:
+    text = _SPACES.sub(' ', text).strip()
+    return text if len(text) <= limit else text[:limit - 1].rstrip() + '…'
+
+
+def summarize_turn(question: str, answer: str) -> str:
+    """One summary line: the question and the first sentence of the answer"""
+    first_sentence = _SENTENCE_END.split(answer.strip(), maxsplit=1)[0]
+    return f"- Asked: {_clip(question, 120)} Answered: {_clip(first_sentence, 160)}"
+
+
+class ChatSession:
+    def __init__(self, recent_turns: int = SESSION_RECENT_TURNS, summary_chars: int = SESSION_SUMMARY_CHARS):
+        self.recent_turns = recent_turns
+        self.summary_chars = summary_chars
+        self.turns = deque()  # (question, answer), oldest first
+        self.summary = deque()  # summary lines of turns folded out of `turns`
+        self.memory = ConversationMemory()
+        self.last_used = time.monotonic()
+        self.lock = threading.Lock()
+
+    def add_turn(self, question: str, answer: str):
+        with self.lock:
+            self.turns.append((question, answer))
+            while len(self.turns) > self.recent_turns:
+                self.summary.append(summarize_turn(*self.turns.popleft()))
+            while self.summary and sum(len(line) + 1 for line in self.summary) > self.summary_chars:
+                self.summary.popleft()
+
+    def history_text(self) -> str:
+        """Summary of older turns plus the recent ones, or '' for a new session"""
+        with self.lock:
+            parts = []
+            if self.summary:
+                parts.append("Earlier in this conversation:\n" + "\n".join(self.summary))
+            for question, answer in self.turns:
+                parts.append(f"User: {question}\nAssistant: {answer}")
+        return "\n".join(parts)
+
+    def clear(self):
+        with self.lock:
+            self.turns.clear()
+            self.summary.clear()
+            self.memory.clear()
+
+
+class SessionStore:
+    """Thread-safe LRU + TTL map of session ID -> ChatSession"""
+
+    def __init__(self, max_sessions: int = SESSION_STORE_SIZE, ttl: float = SESSION_TTL_SECONDS):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def get(self, session_id: str) -> ChatSession:
+        """The session for `session_id`, created if missing or expired"""
+        now = time.monotonic()
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is not None and now - session.last_used > self.ttl:
+                del self._sessions[session_id]
+                self.evictions += 1
+                session = None
+            if session is None:
+                session = self._sessions[session_id] = ChatSession()
+            session.last_used = now
+            self._sessions.move_to_end(session_id)
+            self._evict(now)
+            return session
+
+    def drop(self, session_id: str) -> bool:
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+    def _evict(self, now: float):
+        # Caller holds self._lock; oldest entries first
+        while self._sessions:
+            oldest_id, oldest = next(iter(self._sessions.items()))
+            if len(self._sessions) <= self.max_sessions and now - oldest.last_used <= self.ttl:
+                break
+            del self._sessions[oldest_id]
+            self.evictions += 1
+
+    def __len__(self):
+        with self._lock:
+            return len(self._sessions)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'sessions': len(self._sessions), 'max_sessions': self.max_sessions,
+                    'ttl_seconds': self.ttl, 'evictions': self.evictions}
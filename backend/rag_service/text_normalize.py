@@ -0,0 +1,60 @@
+"""
+Shared text normalization for every ingestion path (RAG service, Streamlit app, CLI).
+
+A single bytes translate-table pass removes control characters, then runs of
+blank lines and spaces are collapsed with C-level replaces. Unicode (₹,
+Devanagari, ...) is preserved by default; ASCII-only output is still available.
+"""
+
+import os
+import re
+
+KEEP_UNICODE = os.getenv("RAG_KEEP_UNICODE", "true").lower() != "false"
+
+# C0 controls (except tab, newline, carriage return) and DEL. In UTF-8 these bytes
+# never occur inside multi-byte sequences, so deleting them with one bytes.translate
+# table is safe and far faster than str.translate on non-ASCII text.
+_C0_DELETE = bytes(c for c in range(0x20) if c not in (0x09, 0x0a, 0x0d)) + b'\x7f'
+
+# Rarer multi-byte offenders: C1 controls, zero-width characters and the BOM.
+# Only scanned for when one of their lead bytes is present.
+_INVISIBLE = re.compile(rb'\xc2[\x80-\x9f]|\xe2\x80[\x8b-\x8d]|\xef\xbb\xbf')
+_NBSP = b'\xc2\xa0'
+
+
+def sanitize_text(text: str, keep_unicode: bool = KEEP_UNICODE) -> str:
+    """Remove control characters and excessive whitespace without any per-character Python work"""
+    if not text:
+        return ""
+    if keep_unicode:
+        raw = text.encode('utf-8', 'replace')
+    else:
+        # Keep amounts readable instead of silently dropping the rupee sign
+        if '\u20b9' in text:
+            text = text.replace('\u20b9', 'Rs ')
+        raw = text.encode('ascii', 'ignore')
+
+    raw = raw.translate(None, _C0_DELETE)
+    if b'\xc2' in raw or b'\xe2\x80' in raw or b'\xef\xbb' in raw:
+        raw = _INVISIBLE.sub(b'', raw)
+        raw = raw.replace(_NBSP, b' ')
+
+    # Collapse runs of spaces (leading/trailing ones are stripped below anyway)
+    if b'  ' in raw:
+        raw = b' '.join(filter(None, raw.split(b' ')))
+    while b'\n\n\n' in raw:
+        raw = raw.replace(b'\n\n\n', b'\n\n')
+    return raw.decode('utf-8').strip()
+
+
+def normalize_documents(docs: list, keep_unicode: bool = KEEP_UNICODE) -> list:
+    """
+    Sanitize each loaded page once, before splitting, and drop pages left empty.
+    Chunks cut from normalized pages need no further cleanup.
+    """
+    normalized = []
+    for doc in docs:
+        doc.page_content = sanitize_text(doc.page_content, keep_unicode=keep_unicode)
+        if doc.page_content:
+            normalized.append(doc)
+    return normalized
@@ -0,0 +1,113 @@
+"""
+Request-scoped tracing: span timers, request IDs and a rotating trace log.
+
+A Trace collects named span durations for one request. Slow requests (over
+TRACE_SLOW_MS) and a random TRACE_SAMPLE_RATE share of the rest are appended
+as JSON lines to TRACE_LOG_PATH, rotated by size, so a reported slow answer
+can be looked up by its X-Request-ID.
+"""
+
+import json
+import logging
+import os
+import random
+import re
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from logging.handlers import RotatingFileHandler
+
+TRACE_LOG_PATH = os.getenv("TRACE_LOG_PATH", os.path.join(os.path.dirname(__file__), 'logs', 'traces.jsonl'))
+TRACE_LOG_MAX_BYTES = int(os.getenv("TRACE_LOG_MAX_BYTES", str(5 * 1024 * 1024)))
+TRACE_LOG_BACKUPS = int(os.getenv("TRACE_LOG_BACKUPS", "3"))
+TRACE_SLOW_MS = float(os.getenv("TRACE_SLOW_MS", "2000"))
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0.05"))
+
+REQUEST_ID_HEADER = 'X-Request-ID'
+_VALID_REQUEST_ID = re.compile(r'^[A-Za-z0-9._:-]{1,64}$')
+
+_logger = None
+
+
+def _trace_logger():
+    global _logger
+    if _logger is None:
+        os.makedirs(os.path.dirname(TRACE_LOG_PATH), exist_ok=True)
+        logger = logging.getLogger('rag.trace')
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+        handler = RotatingFileHandler(TRACE_LOG_PATH, maxBytes=TRACE_LOG_MAX_BYTES,
+                                      backupCount=TRACE_LOG_BACKUPS, encoding='utf-8')
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        logger.addHandler(handler)
+        _logger = logger
+    return _logger
+
+
+def request_id_from(header_value: str) -> str:
+    """Caller's request ID if well-formed, otherwise a fresh one"""
+    if header_value and _VALID_REQUEST_ID.match(header_value):
+        return header_value
+    return uuid.uuid4().hex
+
+
+class Trace:
+    """
+    Span timings for one request. `observer(name, seconds)` is called as each
+    span ends (used to feed the stage latency histogram).
+    """
+
+    def __init__(self, request_id: str, endpoint: str, observer=None):
+        self.request_id = request_id
+        self.endpoint = endpoint
+        self.observer = observer
+        self.started = time.perf_counter()
+        self.spans = []  # [(name, ms)] in completion order
+        self.attributes = {}
+
+    @contextmanager
+    def span(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            self.spans.append((name, round(elapsed * 1000, 2)))
+            if self.observer is not None:
+                self.observer(name, elapsed)
+
+    def set(self, **attributes):
+        """Attach request details (chunk IDs, sizes, flags) to the trace"""
+        self.attributes.update(attributes)
+
+    def total_ms(self) -> float:
+        return round((time.perf_counter() - self.started) * 1000, 2)
+
+    def breakdown(self) -> dict:
+        timings = {}
+        for name, ms in self.spans:
+            timings[name] = round(timings.get(name, 0) + ms, 2)
+        return {
+            'request_id': self.request_id,
+            'total_ms': self.total_ms(),
+            'timings_ms': timings,
+            **self.attributes,
+        }
+
+    def finish(self, status: int = 200):
+        """Write the trace to the rotating log if it is slow or sampled"""
+        total = self.total_ms()
+        if total < TRACE_SLOW_MS and random.random() >= TRACE_SAMPLE_RATE:
+            return
+        record = {
+            'ts': datetime.now().isoformat(),
+            'endpoint': self.endpoint,
+            'status': status,
+            'slow': total >= TRACE_SLOW_MS,
+            **self.breakdown(),
+        }
+        try:
+            _trace_logger().info(json.dumps(record, default=str))
+        except Exception as e:
+            print(f"⚠️ Could not write trace: {e}")
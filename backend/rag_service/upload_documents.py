@@ -1,14 +1,157 @@
 """
 Admin Document Upload Script for F-Buddy RAG Service
 Use this script to upload DOCX files to the RAG knowledge base
+
+Files go through the chunked upload API (POST /uploads, PUT parts, complete):
+parts are read from disk one at a time, sent PART_WORKERS at a time with
+per-part checksums and retried with backoff. Upload IDs are remembered in
+.upload_state.json, so re-running after a crash or dropped connection sends
+only the parts the server does not have yet.
 """
 
+import hashlib
+import json
 import os
 import requests
 import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 
 RAG_SERVICE_URL = "http://localhost:5002"
+PART_WORKERS = 4
+PART_RETRIES = 5
+INGEST_POLL_SECONDS = 2
+INGEST_TIMEOUT_SECONDS = 1800
+STATE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".upload_state.json")
+
+_local = threading.local()
+
+
+def _session():
+    # One connection pool per thread; requests.Session is not thread-safe
+    if not hasattr(_local, 'session'):
+        _local.session = requests.Session()
+    return _local.session
+
+
+def _call(method, url, **kwargs):
+    """HTTP call that waits out 429 Retry-After (init/complete share the server's upload rate limit)"""
+    for _ in range(PART_RETRIES):
+        response = _session().request(method, url, **kwargs)
+        if response.status_code != 429:
+            return response
+        time.sleep(float(response.headers.get('Retry-After', 1)))
+    return response
+
+
+def _load_state():
+    if os.path.exists(STATE_FILE):
+        with open(STATE_FILE, encoding='utf-8') as f:
+            return json.load(f)
+    return {}
+
+
+def _save_state(state):
+    with open(STATE_FILE + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=1)
+    os.replace(STATE_FILE + '.tmp', STATE_FILE)
+
+
+def _file_key(path):
+    stat = os.stat(path)
+    return f"{os.path.abspath(path)}:{stat.st_size}:{stat.st_mtime}"
+
+
+def _sha256_file(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _upload_part(upload_id, path, number, part_size, size):
+    """Send one part, retrying transient failures with exponential backoff"""
+    offset = (number - 1) * part_size
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        data = f.read(min(part_size, size - offset))
+    headers = {'Content-Type': 'application/octet-stream',
+               'X-Content-SHA256': hashlib.sha256(data).hexdigest()}
+    url = f"{RAG_SERVICE_URL}/uploads/{upload_id}/parts/{number}"
+    for attempt in range(PART_RETRIES):
+        try:
+            response = _session().put(url, data=data, headers=headers, timeout=120)
+            if response.status_code == 200:
+                return number
+            if response.status_code == 429:
+                time.sleep(float(response.headers.get('Retry-After', 1)))
+                continue
+            if response.status_code < 500 and response.status_code != 422:
+                raise RuntimeError(f"part {number}: {response.json().get('message', response.status_code)}")
+        except requests.exceptions.RequestException:
+            pass
+        time.sleep(min(2 ** attempt, 30))
+    raise RuntimeError(f"part {number} failed after {PART_RETRIES} attempts")
+
+
+def _start_or_resume(path, state):
+    """Status of the upload for `path`: the remembered one if the server still has it, else a new one"""
+    key = _file_key(path)
+    upload_id = state.get(key)
+    if upload_id:
+        response = _call('GET', f"{RAG_SERVICE_URL}/uploads/{upload_id}", timeout=30)
+        if response.status_code == 200 and response.json().get('state') == 'uploading':
+            status = response.json()
+            print(f"🔁 Resuming {os.path.basename(path)}: {len(status['received'])}/{status['parts']} parts already sent")
+            return status
+    response = _call('POST', f"{RAG_SERVICE_URL}/uploads", json={
+        'filename': os.path.basename(path),
+        'size': os.path.getsize(path),
+        'sha256': _sha256_file(path),
+    }, timeout=30)
+    if response.status_code != 201:
+        raise RuntimeError(response.json().get('message', f"init failed ({response.status_code})"))
+    status = response.json()
+    status['missing'] = list(range(1, status['parts'] + 1))
+    state[key] = status['upload_id']
+    _save_state(state)
+    return status
+
+
+def upload_file(path, state):
+    """Upload one file in parts and wait for ingestion; returns the final upload status"""
+    filename = os.path.basename(path)
+    size = os.path.getsize(path)
+    status = _start_or_resume(path, state)
+    upload_id, part_size, missing = status['upload_id'], status['part_size'], status['missing']
+    
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=PART_WORKERS) as pool:
+        futures = [pool.submit(_upload_part, upload_id, path, n, part_size, size) for n in missing]
+        for done, future in enumerate(as_completed(futures), 1):
+            future.result()
+            print(f"\r  ⬆️ {filename}: {status['parts'] - len(missing) + done}/{status['parts']} parts", end='')
+    elapsed = time.perf_counter() - started
+    sent = sum(min(part_size, size - (n - 1) * part_size) for n in missing)
+    print(f"\n  📦 Sent {sent / 1e6:.1f} MB in {elapsed:.1f}s ({sent / 1e6 / max(elapsed, 1e-9):.1f} MB/s)")
+    
+    response = _call('POST', f"{RAG_SERVICE_URL}/uploads/{upload_id}/complete", timeout=300)
+    if response.status_code != 202:
+        raise RuntimeError(response.json().get('message', f"complete failed ({response.status_code})"))
+    state.pop(_file_key(path), None)
+    _save_state(state)
+    
+    deadline = time.monotonic() + INGEST_TIMEOUT_SECONDS
+    while time.monotonic() < deadline:
+        status = _call('GET', f"{RAG_SERVICE_URL}/uploads/{upload_id}", timeout=30).json()
+        if status.get('state') in ('done', 'failed'):
+            return status
+        time.sleep(INGEST_POLL_SECONDS)
+    raise RuntimeError("timed out waiting for ingestion")
+
 
 def upload_documents(file_paths):
     """Upload documents to RAG service"""
@@ -17,8 +160,8 @@ def upload_documents(file_paths):
     print("📚 F-Buddy RAG - Document Upload")
     print("=" * 60)
     
-    # Prepare files
-    files = []
+    # Validate files
+    paths = []
     for file_path in file_paths:
         if not os.path.exists(file_path):
             print(f"❌ File not found: {file_path}")
@@ -28,59 +171,42 @@ def upload_documents(file_paths):
             print(f"⚠️ Skipping unsupported file: {file_path}")
             continue
         
-        filename = os.path.basename(file_path)
-        # Determine MIME type based on extension
-        if file_path.lower().endswith('.pdf'):
-            mime_type = 'application/pdf'
-        else:
-            mime_type = 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
-        
-        files.append(('files', (filename, open(file_path, 'rb'), mime_type)))
-        print(f"✅ Added: {filename}")
+        paths.append(file_path)
+        print(f"✅ Added: {os.path.basename(file_path)}")
     
-    if not files:
+    if not paths:
         print("❌ No valid files to upload")
         return False
     
-    print(f"\n🚀 Uploading {len(files)} file(s) to {RAG_SERVICE_URL}...")
+    print(f"\n🚀 Uploading {len(paths)} file(s) to {RAG_SERVICE_URL}...")
     
-    try:
-        response = requests.post(
-            f"{RAG_SERVICE_URL}/upload-documents",
-            files=files,
-            timeout=300  # 5 minutes timeout for large files
-        )
-        
-        # Close file handles
-        for _, file_tuple in files:
-            file_tuple[1].close()
-        
-        if response.status_code == 200:
-            data = response.json()
-            print("\n✅ Upload successful!")
-            print(f"📊 Total chunks ingested: {data.get('total_chunks', 0)}")
-            
-            if 'results' in data:
-                print("\n📄 Results:")
-                for result in data['results']:
-                    if result.get('success'):
-                        print(f"  ✅ {result['filename']}: {result['chunks']} chunks")
-                    else:
-                        print(f"  ❌ {result['filename']}: {result.get('error', 'Unknown error')}")
-            
-            return True
-        else:
-            print(f"\n❌ Upload failed: {response.status_code}")
-            print(response.text)
+    state = _load_state()
+    results = []
+    for path in paths:
+        filename = os.path.basename(path)
+        try:
+            status = upload_file(path, state)
+            if status['state'] == 'done':
+                results.append({'filename': filename, 'chunks': status.get('chunks', 0), 'success': True})
+            else:
+                results.append({'filename': filename, 'error': status.get('error', 'Unknown error'), 'success': False})
+        except requests.exceptions.ConnectionError:
+            print("\n❌ Could not connect to RAG service!")
+            print("Make sure the service is running: python rag_server.py")
+            print("Re-run the same command to resume the upload.")
             return False
-            
-    except requests.exceptions.ConnectionError:
-        print("\n❌ Could not connect to RAG service!")
-        print("Make sure the service is running: python rag_server.py")
-        return False
-    except Exception as e:
-        print(f"\n❌ Error: {str(e)}")
-        return False
+        except Exception as e:
+            results.append({'filename': filename, 'error': str(e), 'success': False})
+    
+    print(f"\n📊 Total chunks ingested: {sum(r.get('chunks', 0) for r in results)}")
+    print("\n📄 Results:")
+    for result in results:
+        if result.get('success'):
+            print(f"  ✅ {result['filename']}: {result['chunks']} chunks")
+        else:
+            print(f"  ❌ {result['filename']}: {result.get('error', 'Unknown error')}")
+    
+    return all(result['success'] for result in results)
 
 def check_service():
     """Check if RAG service is running"""
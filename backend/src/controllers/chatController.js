@@ -4,6 +4,7 @@
  * All operations are scoped to the logged-in user only
  */
 
+const crypto = require('crypto');
 const { GoogleGenerativeAI } = require('@google/generative-ai');
 const Expense = require('../models/Expense');
 const Income = require('../models/Income');
@@ -16,6 +17,12 @@ const Watchlist = require('../models/Watchlist');
 // Initialize Gemini
 const genAI = new GoogleGenerativeAI(process.env.GEMINI_API_KEY || '');
 
+// Same rule as the RAG service's tracing.py: anything else is replaced, not echoed or logged
+const VALID_REQUEST_ID = /^[A-Za-z0-9._:-]{1,64}$/;
+
+const requestIdFrom = (headerValue) =>
+    headerValue && VALID_REQUEST_ID.test(headerValue) ? headerValue : crypto.randomUUID().replace(/-/g, '');
+
 // System prompt to enforce user-only operations
 const SYSTEM_PROMPT = `You are Finzo, a helpful personal finance assistant. Today is ${new Date().toLocaleDateString('en-IN')}.
 
@@ -1243,6 +1250,9 @@ const executeAction = async (action, params, userId) => {
 exports.chat = async (req, res) => {
     try {
         const { query, context, ragContext, conversationHistory } = req.body;
+        // Same ID the app sent to the RAG service, so both logs line up for one turn
+        const requestId = requestIdFrom(req.get('X-Request-ID'));
+        res.set('X-Request-ID', requestId);
 
         if (!query) {
             return res.status(400).json({ success: false, message: 'Query is required' });
@@ -1304,9 +1314,9 @@ exports.chat = async (req, res) => {
 
                     const chat = model.startChat({ history: chatHistory });
 
-                    console.log(`[Chat] Attempting with model: ${modelName} (Attempt ${retryCount + 1})`);
+                    console.log(`[Chat ${requestId}] Attempting with model: ${modelName} (Attempt ${retryCount + 1})`);
                     const result = await chat.sendMessage(query);
-                    console.log(`[Chat] Success with model: ${modelName}`);
+                    console.log(`[Chat ${requestId}] Success with model: ${modelName}`);
 
                     const response = result.response;
 
@@ -1358,7 +1368,7 @@ exports.chat = async (req, res) => {
                     }
 
                     // If 404 (Not Found) or other error, break to try next model
-                    console.error(`[Chat] Failed with ${modelName}:`, error.message);
+                    console.error(`[Chat ${requestId}] Failed with ${modelName}:`, error.message);
                     break;
                 }
             }
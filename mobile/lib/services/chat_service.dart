@@ -22,13 +22,27 @@ class SmartChatService {
     }
   }
 
+  /// Request ID shared by the RAG and backend calls of one chat turn,
+  /// so a slow answer can be traced in both services' logs
+  static String _newRequestId() {
+    final now = DateTime.now().microsecondsSinceEpoch.toRadixString(36);
+    return 'chat-$now-${Object().hashCode.toRadixString(36)}';
+  }
+
+  /// Conversation ID for the RAG service's server-side history, one per chat widget
+  static String newSessionId() {
+    final now = DateTime.now().microsecondsSinceEpoch.toRadixString(36);
+    return 'session-$now-${Object().hashCode.toRadixString(36)}';
+  }
+
   /// Get context from RAG service (PDF knowledge)
-  static Future<String?> _getRagContext(String query) async {
+  static Future<String?> _getRagContext(String query, String requestId, String? sessionId) async {
     try {
       final response = await http.post(
         Uri.parse('$_ragBaseUrl/chat'),
-        headers: {'Content-Type': 'application/json'},
-        body: json.encode({'query': query}),
+        headers: {'Content-Type': 'application/json', 'X-Request-ID': requestId},
+        // The RAG service keeps this session's history, so only the new message is sent
+        body: json.encode({'query': query, if (sessionId != null) 'session_id': sessionId}),
       ).timeout(const Duration(seconds: 5));
 
       if (response.statusCode == 200) {
@@ -44,16 +58,18 @@ class SmartChatService {
   }
 
   /// Send a chat query - uses main backend, optionally enriched with RAG context
-  static Future<ChatResponse> chat(String query, {Map<String, dynamic>? context, List<Map<String, String>>? conversationHistory}) async {
+  static Future<ChatResponse> chat(String query, {Map<String, dynamic>? context, List<Map<String, String>>? conversationHistory, String? sessionId}) async {
     try {
       final url = '${ApiConstants.baseUrl}/chat';
       print('[SmartChat] Sending query to $url: $query');
       
+      final requestId = _newRequestId();
+
       // Try to get RAG context if available (for advisory/knowledge queries)
       String? ragContext;
       final isRag = await isRagAvailable();
       if (isRag) {
-        ragContext = await _getRagContext(query);
+        ragContext = await _getRagContext(query, requestId, sessionId);
         if (ragContext != null) {
           print('[SmartChat] Got RAG context: ${ragContext.substring(0, ragContext.length.clamp(0, 100))}...');
         }
@@ -64,6 +80,7 @@ class SmartChatService {
         Uri.parse(url),
         headers: {
           'Content-Type': 'application/json',
+          'X-Request-ID': requestId,
           if (token != null) 'Authorization': 'Bearer $token',
         },
         body: json.encode({
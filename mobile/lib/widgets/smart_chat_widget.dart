@@ -35,6 +35,7 @@ class _SmartChatWidgetState extends State<SmartChatWidget>
   final ScrollController _scrollController = ScrollController();
   final TranslationService _translationService = TranslationService.instance;
   bool _isLoading = false;
+  final String _sessionId = SmartChatService.newSessionId();
 
   // Pending action for confirmation flow
   String? _pendingAction;
@@ -306,6 +307,7 @@ class _SmartChatWidgetState extends State<SmartChatWidget>
           outbound, 
           context: financialContext,
           conversationHistory: conversationHistory,
+          sessionId: _sessionId,
         );
 
         if (response.success) {